@@ -1,7 +1,17 @@
 import os
+import sys
+import json
 from dotenv import load_dotenv
-from litellm import completion
-from typing import List, Dict
+from litellm import acompletion
+from typing import Callable, List, Dict, Optional, Union
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from historyManager import HistoryManager
+from llmCache import cached_completion, cached_stream_completion
+from streaming import prefixed_printer, stream_enabled
+
+from faqCache import FAQCache
+from knowledgeBase import DEFAULT_KNOWLEDGE_FILE, DEFAULT_TOP_K, KnowledgeBase, KnowledgeWatcher
 
 # Lataa ympäristömuuttujat .env-tiedostosta
 load_dotenv()
@@ -17,85 +27,169 @@ if not api_key:
 os.environ["OPENAI_API_KEY"] = api_key
 
 
-def generate_response(messages: List[Dict]) -> str:
+def generate_response(messages: List[Dict], use_cache: Optional[bool] = None,
+                      on_token: Optional[Callable[[str], None]] = None) -> str:
     """
     Lähetä viestihistoria LLM:lle ja palauta sen vastaus.
 
     Args:
         messages (List[Dict]): Lista viesteistä, jotka sisältävät käyttäjän ja avustajan vuorovaikutuksen.
+        use_cache (Optional[bool]): False ohittaa LLM-vastausten välimuistin, None seuraa LLM_CACHE-muuttujaa.
+        on_token (Optional[Callable[[str], None]]): Jos annettu, vastaus striimataan ja
+            jokainen token annetaan tälle funktiolle heti sen saapuessa.
+
+    Returns:
+        str: LLM:n tuottama (koottu) vastaus viestihistorian perusteella.
+    """
+    if on_token is not None:
+        return cached_stream_completion(on_token, model="openai/gpt-4o", messages=messages, max_tokens=1024,
+                                        use_cache=use_cache)
+    response = cached_completion(model="openai/gpt-4o", messages=messages, max_tokens=1024, use_cache=use_cache)
+    return response.choices[0].message.content
+
+
+async def generate_response_async(messages: List[Dict], **llm_kwargs) -> str:
+    """
+    generate_response-funktion asynkroninen versio palvelintilaan.
+
+    Args:
+        messages (List[Dict]): Lista viesteistä, jotka sisältävät käyttäjän ja avustajan vuorovaikutuksen.
+        **llm_kwargs: Lisäparametrit acompletion-kutsulle, esim. api_base.
 
     Returns:
         str: LLM:n tuottama vastaus viestihistorian perusteella.
     """
-    response = completion(model="openai/gpt-4o", messages=messages, max_tokens=1024)
+    response = await acompletion(model="openai/gpt-4o", messages=messages, max_tokens=1024, **llm_kwargs)
     return response.choices[0].message.content
 
 
-def read_file(file_name: str) -> str:
+def build_summary_messages(previous_summary: str, messages: List[Dict]) -> List[Dict]:
+    """Muodosta tiivistyspyynnön viestit edellisestä tiivistelmästä ja uusista vuoroista."""
+    conversation = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    return [
+        {"role": "system", "content": "Tiivistä keskustelu muutamaan lauseeseen. Säilytä mainitut hahmot ja käyttäjän kiinnostuksen kohteet."},
+        {"role": "user", "content": f"Aiempi tiivistelmä: {previous_summary or '-'}\n\nUudet vuorot:\n{conversation}"},
+    ]
+
+
+def summarize_history(previous_summary: str, messages: List[Dict]) -> str:
     """
-    Lue tiedoston sisältö.
+    Tiivistä vanhat keskusteluvuorot yhdeksi lyhyeksi tiivistelmäksi.
 
     Args:
-        file_name (str): Tiedoston nimi, joka luetaan.
+        previous_summary (str): Edellinen tiivistelmä tai tyhjä merkkijono.
+        messages (List[Dict]): Tiivistelmään yhdistettävät kysymykset ja vastaukset.
 
     Returns:
-        str: Tiedoston sisältö tai virheilmoitus.
+        str: Päivitetty tiivistelmä.
     """
-    try:
-        with open(file_name, "r", encoding="utf-8") as file:
-            return file.read()
-    except FileNotFoundError:
-        return "Error: File not found."
-    except PermissionError:
-        return "Error: Permission denied."
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-
-# Alustetaan keskusteluhistoria, jossa määritellään avustajan rooli
-messages = [
-    {
-        "role": "system",
-        "content": (
-            "Olet pelisivuston Alpotti niminen tietopankki avustaja, kerrot kävijöille tietoja pelistä, sen sisällöstä ja hahmoista\n"
-            "Vastaa aina käyttäjän kysymyksiin tiedoston sisällön perusteella, mutta älä mainitse tiedostoa"
-        ),
-    }
-]
-
-# Lue automaattisesti alpotti.json-tiedoston sisältö
-selected_file = "alpotti.json"
-file_content = read_file(selected_file)
-
-if "Error" in file_content:
-    print(f"Tiedoston '{selected_file}' lukeminen epäonnistui: {file_content}")
-    exit()
-
-# Päivitä keskusteluhistoria tiedoston sisällöllä
-messages.append({"role": "user", "content": f"Lue tiedoston '{selected_file}' sisältö."})
-messages.append({"role": "assistant", "content": f"Tiedoston '{selected_file}' sisältö on tallennettu muistiin."})
-
-# Kysytään käyttäjältä, mitä hän haluaa tietää tiedostosta
-first_question = True  # Muuttuja, joka seuraa, onko kyseessä ensimmäinen kysymys
-
-while True:
-    if first_question:
-        print("\nAlpotti: Hei! Olen Alpotti, mitä tahtoisit tietää pelistämme?")
-        first_question = False  # Ensimmäinen kysymys on nyt esitetty
-    else:
-        print("\nAlpotti: Onko jotain muuta, mitä haluaisit tietää pelistämme?")
+    return generate_response(build_summary_messages(previous_summary, messages))
+
+
+# Avustajan rooli
+SYSTEM_PROMPT = {
+    "role": "system",
+    "content": (
+        "Olet pelisivuston Alpotti niminen tietopankki avustaja, kerrot kävijöille tietoja pelistä, sen sisällöstä ja hahmoista\n"
+        "Vastaa aina käyttäjän kysymyksiin annettujen tietojen perusteella, mutta älä mainitse tiedostoa"
+    ),
+}
 
-    question = input("\nKäyttäjä: ").strip()
-    if question.lower() == "exit":
-        print("Ohjelma lopetettu.")
-        break
 
-    # Lisää käyttäjän kysymys keskusteluhistoriaan
-    messages.append({"role": "user", "content": f"Tiedoston '{selected_file}' sisältö: {file_content}\nKysymys: {question}"})
+def build_messages(history: List[Dict], question: str, knowledge: Union[KnowledgeBase, KnowledgeWatcher],
+                   top_k: int = DEFAULT_TOP_K) -> List[Dict]:
+    """
+    Muodosta LLM:lle lähetettävät viestit yhdelle kysymykselle.
+
+    Koko tietopankin sijaan kysymykseen liitetään vain siihen parhaiten liittyvät
+    hahmotietueet, ja historiaan tallennetaan pelkät kysymykset ja vastaukset,
+    joten kehotteen koko ei kasva tietopankin mukana joka vuorolla.
+
+    Args:
+        history (List[Dict]): Aiemmat kysymykset ja vastaukset.
+        question (str): Käyttäjän kysymys.
+        knowledge (Union[KnowledgeBase, KnowledgeWatcher]): Hahmotietojen hakemisto.
+        top_k (int): Kuinka monta tietuetta kysymykseen liitetään.
+
+    Returns:
+        List[Dict]: Järjestelmäviesti, historia ja kysymys tietoineen.
+    """
+    context = knowledge.context_for(question, top_k) or "Tietopankista ei löytynyt tähän liittyvää tietoa."
+    return [SYSTEM_PROMPT] + history + [{"role": "user", "content": f"Tietoa pelistä:\n{context}\n\nKysymys: {question}"}]
+
+
+def answer_question(question: str, history: HistoryManager, knowledge: Union[KnowledgeBase, KnowledgeWatcher],
+                    faq: FAQCache, on_token: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Vastaa kysymykseen ja päivitä keskusteluhistoria.
+
+    Usein kysytyt kysymykset ("Kuka on Hannu Hodari?") palautetaan välimuistista
+    kirjoitusasusta riippumatta ilman LLM-kutsua. Pelkistä täytesanoista koostuvat
+    jatkokysymykset ("kerro lisää") riippuvat keskustelusta, joten ne ohittavat välimuistin.
+    Samasta syystä välimuistiin tallennetaan vain vastaukset, jotka on tuotettu ilman
+    aiempaa keskusteluhistoriaa.
 
-    # Lähetä kysymys LLM:lle ja tulosta vastaus
-    response = generate_response(messages)
-    print(f"\nAlpotti: {response}")
+    Args:
+        question (str): Käyttäjän kysymys.
+        history (HistoryManager): Istunnon keskusteluhistoria.
+        knowledge (Union[KnowledgeBase, KnowledgeWatcher]): Hahmotietojen hakemisto.
+        faq (FAQCache): Vastausvälimuisti.
+        on_token (Optional[Callable[[str], None]]): Striimattujen tokenien käsittelijä;
+            välimuistista tuleva vastaus annetaan sille kerralla.
 
-    # Päivitä keskusteluhistoria avustajan vastauksella
-    messages.append({"role": "assistant", "content": response})
\ No newline at end of file
+    Returns:
+        str: Vastaus kysymykseen.
+    """
+    response = faq.get(question)
+    if response is not None:
+        if on_token is not None:
+            on_token(response)
+    else:
+        previous = history.messages()
+        response = generate_response(build_messages(previous, question, knowledge), on_token=on_token)
+        if not previous:
+            faq.set(question, response)
+    history.add_turn(question, response)
+    return response
+
+
+if __name__ == "__main__":
+    # Tietopankki jäsennetään ja indeksoidaan käynnistyksessä, ja taustasäie vaihtaa uuden
+    # version käyttöön, kun alpotti.json muuttuu, joten sisältömuutokset eivät vaadi uudelleenkäynnistystä
+    try:
+        knowledge = KnowledgeWatcher(DEFAULT_KNOWLEDGE_FILE).start()
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Tiedoston '{DEFAULT_KNOWLEDGE_FILE}' lukeminen epäonnistui: {e}")
+        exit()
+
+    # Keskusteluhistoria: vain kysymykset ja vastaukset ilman liitettyjä tietoja. Vanhat
+    # vuorot tiivistetään taustalla, joten kehotteen koko pysyy rajattuna istunnon pituudesta riippumatta
+    history = HistoryManager(summarize_history)
+    # Vastausvälimuisti tyhjenee itsestään, kun alpotti.json muuttuu
+    faq = FAQCache(DEFAULT_KNOWLEDGE_FILE)
+
+    # Kysytään käyttäjältä, mitä hän haluaa tietää tiedostosta
+    first_question = True  # Muuttuja, joka seuraa, onko kyseessä ensimmäinen kysymys
+
+    while True:
+        if first_question:
+            print("\nAlpotti: Hei! Olen Alpotti, mitä tahtoisit tietää pelistämme?")
+            first_question = False  # Ensimmäinen kysymys on nyt esitetty
+        else:
+            print("\nAlpotti: Onko jotain muuta, mitä haluaisit tietää pelistämme?")
+
+        question = input("\nKäyttäjä: ").strip()
+        if question.lower() == "exit":
+            print("Ohjelma lopetettu.")
+            break
+
+        # Lähetä kysymys ja siihen liittyvät tiedot LLM:lle (tai hae välimuistista) ja tulosta vastaus.
+        # Striimattuna vastaus tulostuu sitä mukaa kuin tokenit saapuvat (LLM_STREAM=off odottaa koko vastauksen).
+        # Välimuisti on käytössä vain, kun LLM_CACHE=on, joten toistettu kysymys menee oletuksena mallille.
+        # Keskusteluhistoria päivitetään kysymyksellä ja kootulla vastauksella
+        if stream_enabled():
+            answer_question(question, history, knowledge, faq, on_token=prefixed_printer("\nAlpotti: "))
+            print()
+        else:
+            response = answer_question(question, history, knowledge, faq)
+            print(f"\nAlpotti: {response}")
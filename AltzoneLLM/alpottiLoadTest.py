@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter
+from typing import Dict, List
+
+import aiohttp
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+# Kuormitustesti käyttää paikallista testipalvelinta, joten oikeaa API-avainta ei tarvita
+os.environ.setdefault("OPENAI_API_KEY", "load-test-key")
+
+from loadTest import percentiles
+from mockLLMServer import start_server as start_mock_server
+
+from alpottiServer import DEFAULT_LLM_CONCURRENCY, DEFAULT_MAX_PENDING, AlpottiServer, start_server
+from faqCache import FAQCache
+from knowledgeBase import DEFAULT_KNOWLEDGE_FILE, KnowledgeBase
+
+# Kysymyspohjat, joihin sijoitetaan tietopankin hahmojen nimiä
+QUESTION_TEMPLATES = ["Kuka on {name}?", "Kerro {name} hahmosta", "Millainen hahmo {name} on?"]
+
+
+def make_questions(knowledge: KnowledgeBase, count: int, seed: int) -> List[str]:
+    """Arvo istunnolle kysymykset tietopankin hahmoista."""
+    rng = random.Random(seed)
+    names = [record["name"] for record in knowledge.records if record["group"]]
+    return [rng.choice(QUESTION_TEMPLATES).format(name=rng.choice(names)) for _ in range(count)]
+
+
+async def run_visitor(http: aiohttp.ClientSession, url: str, questions: List[str],
+                      latencies: List[float], statuses: Counter) -> None:
+    """Yksi kävijä: kysymykset peräkkäin samassa istunnossa."""
+    session_id = None
+    for question in questions:
+        start = time.perf_counter()
+        try:
+            async with http.post(f"{url}/chat", json={"question": question, "session_id": session_id}) as response:
+                body = await response.json()
+                statuses[response.status] += 1
+        except aiohttp.ClientError as e:
+            statuses[type(e).__name__] += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        session_id = body.get("session_id", session_id)
+
+
+async def run_load_test(url: str, knowledge: KnowledgeBase, visitors: int, questions_per_visitor: int) -> Dict:
+    """
+    Aja annettu määrä samanaikaisia kävijöitä palvelinta vasten.
+
+    Args:
+        url (str): Alpotti-palvelimen osoite.
+        knowledge (KnowledgeBase): Tietopankki, josta kysymykset muodostetaan.
+        visitors (int): Samanaikaisten kävijöiden (istuntojen) määrä.
+        questions_per_visitor (int): Kysymysten määrä istuntoa kohden.
+
+    Returns:
+        Dict: Pyyntöjen viivepersentiilit, tilakoodit ja läpäisy.
+    """
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    connector = aiohttp.TCPConnector(limit=visitors)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=120)) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            run_visitor(http, url, make_questions(knowledge, questions_per_visitor, seed=index), latencies, statuses)
+            for index in range(visitors)
+        ])
+        elapsed = time.perf_counter() - started
+        async with http.get(f"{url}/health") as response:
+            health = await response.json()
+
+    return {
+        "visitors": visitors,
+        "requests": sum(statuses.values()),
+        "request_ms": percentiles(latencies),
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "requests_per_second": sum(statuses.values()) / elapsed if elapsed > 0 else None,
+        "server": health,
+    }
+
+
+def print_report(result: Dict) -> None:
+    latency = result["request_ms"]
+    print(f"\n== Alpotti: {result['visitors']} kävijää, {result['requests']} pyyntöä ==")
+    print(f"{'':<12}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    print(f"{'pyyntö':<12}{latency['p50']:>10.0f}{latency['p95']:>10.0f}{latency['p99']:>10.0f}{latency['max']:>10.0f}")
+    print(f"Tilakoodit: {result['statuses']}")
+    print(f"Läpäisy: {result['requests_per_second']:.1f} pyyntöä/s")
+    print(f"Palvelin: {result['server']}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    knowledge = KnowledgeBase.from_file(args.knowledge)
+    runner = mock = alpotti = None
+    url = args.url
+    if not url:
+        # Palvelin ja paikallinen LLM käynnistetään samaan prosessiin
+        mock, api_base = start_mock_server(latency=args.latency)
+        alpotti = AlpottiServer(
+            knowledge,
+            faq=FAQCache(args.knowledge) if args.faq_cache else None,
+            llm_concurrency=args.llm_concurrency,
+            max_pending=args.max_pending,
+            api_base=api_base,
+        )
+        runner, url = await start_server(alpotti, port=0)
+
+    try:
+        print_report(await run_load_test(url, knowledge, args.visitors, args.questions))
+    finally:
+        if runner:
+            await runner.cleanup()
+        if alpotti:
+            # Taustalla käynnissä olevat tiivistelmät valmiiksi ennen kuin LLM-testipalvelin sammutetaan
+            await asyncio.to_thread(lambda: [session.history.wait() for session in alpotti.sessions.values()])
+        if mock:
+            print(f"LLM-testipalvelimen tilastot: {mock.stats}")
+            mock.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alpotti-palvelimen kuormitustesti paikallista LLM-palvelinta vasten")
+    parser.add_argument("--url", help="valmiiksi käynnissä olevan palvelimen osoite; oletuksena käynnistetään oma")
+    parser.add_argument("--knowledge", default=DEFAULT_KNOWLEDGE_FILE)
+    parser.add_argument("--visitors", type=int, default=200, help="samanaikaiset istunnot")
+    parser.add_argument("--questions", type=int, default=5, help="kysymyksiä istuntoa kohden")
+    parser.add_argument("--latency", default="lognormal:0.3:0.4", help="LLM-testipalvelimen viive tai jakauma")
+    parser.add_argument("--llm-concurrency", type=int, default=DEFAULT_LLM_CONCURRENCY)
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING)
+    parser.add_argument("--faq-cache", action="store_true", help="käytä vastausvälimuistia")
+    main_args = parser.parse_args()
+    # Jakauma välitetään merkkijonona, pelkkä luku vakioviiveenä
+    if main_args.latency.replace(".", "", 1).isdigit():
+        main_args.latency = float(main_args.latency)
+    asyncio.run(main(main_args))
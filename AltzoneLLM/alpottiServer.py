@@ -0,0 +1,252 @@
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from aiohttp import web
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from Alpotti import build_messages, build_summary_messages, generate_response_async
+from faqCache import FAQCache
+from historyManager import HistoryManager
+from knowledgeBase import DEFAULT_KNOWLEDGE_FILE, KnowledgeBase, KnowledgeWatcher
+
+# Kuinka monta LLM-kutsua on käynnissä yhtä aikaa kaikkien istuntojen kesken
+DEFAULT_LLM_CONCURRENCY = 32
+# Kuinka monta kysymystä otetaan käsittelyyn ennen kuin uudet torjutaan 503-vastauksella
+DEFAULT_MAX_PENDING = 256
+# Istuntojen enimmäismäärä ja aika, jonka jälkeen käyttämätön istunto poistetaan
+DEFAULT_MAX_SESSIONS = 10_000
+DEFAULT_SESSION_TTL_SECONDS = 30 * 60
+SESSION_SWEEP_INTERVAL = 60
+
+
+class ChatSession:
+    """Yhden kävijän keskusteluhistoria; lukko pitää istunnon kysymykset järjestyksessä."""
+    def __init__(self, summarize: Callable[[str, List[Dict]], str]):
+        self.history = HistoryManager(summarize)
+        self.lock = asyncio.Lock()
+        self.last_seen = time.monotonic()
+
+
+class AlpottiServer:
+    """
+    Alpotin HTTP-palvelin monelle samanaikaiselle kävijälle.
+
+    Tietopankki ja vastausvälimuisti ovat kaikille istunnoille yhteiset, ja jokaisella
+    istunnolla on oma keskusteluhistoriansa. LLM-kutsujen määrää rajoitetaan yhteisellä
+    semaforilla, ja kun käsittelyssä on jo max_pending kysymystä, uudet torjutaan heti
+    503-vastauksella jonottamisen sijaan, jotta viive ei kasva rajatta kuorman alla.
+
+    Args:
+        knowledge (Union[KnowledgeBase, KnowledgeWatcher]): Kerran ladattu tai tiedoston
+            muuttuessa päivittyvä tietopankki.
+        faq (Optional[FAQCache]): Yhteinen vastausvälimuisti, None = ei välimuistia.
+        llm_concurrency (int): Samanaikaisten LLM-kutsujen enimmäismäärä.
+        max_pending (int): Käsittelyssä olevien kysymysten enimmäismäärä.
+        max_sessions (int): Istuntojen enimmäismäärä.
+        session_ttl (float): Sekunnit, joiden jälkeen käyttämätön istunto poistetaan.
+        **llm_kwargs: Lisäparametrit acompletion-kutsulle, esim. api_base.
+    """
+    def __init__(self, knowledge: Union[KnowledgeBase, KnowledgeWatcher], faq: Optional[FAQCache] = None,
+                 llm_concurrency: int = DEFAULT_LLM_CONCURRENCY, max_pending: int = DEFAULT_MAX_PENDING,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS, session_ttl: float = DEFAULT_SESSION_TTL_SECONDS,
+                 **llm_kwargs):
+        self.knowledge = knowledge
+        self.faq = faq
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.llm_kwargs = llm_kwargs
+        self._llm_limit = asyncio.Semaphore(llm_concurrency)
+        self.sessions: Dict[str, ChatSession] = {}
+        self.pending = 0
+        self.llm_in_flight = 0
+        self.stats = {"requests": 0, "answered": 0, "rejected": 0, "busy": 0, "failed": 0}
+
+    async def answer(self, session: ChatSession, question: str) -> Tuple[str, bool]:
+        """
+        Vastaa istunnon kysymykseen ja päivitä sen historia.
+
+        Vastausvälimuistiin tallennetaan vain istunnon ensimmäisen kysymyksen vastaus,
+        koska myöhemmät vastaukset voivat riippua aiemmasta keskustelusta.
+
+        Returns:
+            Tuple[str, bool]: Vastaus ja tieto siitä, tuliko se välimuistista.
+        """
+        response = self.faq.get(question) if self.faq else None
+        cached = response is not None
+        if not cached:
+            history = session.history.messages()
+            response = await self.complete(build_messages(history, question, self.knowledge))
+            if self.faq and not history:
+                self.faq.set(question, response)
+        session.history.add_turn(question, response)
+        return response, cached
+
+    async def complete(self, messages: List[Dict]) -> str:
+        """Palvelimen ainoa LLM-kutsu: yhteisen rajoittimen alla ja palvelimen llm_kwargs-asetuksilla."""
+        async with self._llm_limit:
+            self.llm_in_flight += 1
+            try:
+                return await generate_response_async(messages, **self.llm_kwargs)
+            finally:
+                self.llm_in_flight -= 1
+
+    def _summarizer(self, loop: asyncio.AbstractEventLoop) -> Callable[[str, List[Dict]], str]:
+        """
+        Historian tiivistäjä, joka ajaa tiivistyskutsun palvelimen tapahtumasilmukassa.
+
+        HistoryManager kutsuu tiivistäjää taustasäikeessä, joten kutsu siirretään silmukkaan,
+        jossa se lasketaan samaan samanaikaisuusrajaan kuin vastaukset.
+        """
+        def summarize(previous_summary: str, messages: List[Dict]) -> str:
+            coroutine = self.complete(build_summary_messages(previous_summary, messages))
+            return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+        return summarize
+
+    def _session(self, session_id: str) -> Optional[ChatSession]:
+        """Palauta istunto tai luo uusi; None, jos istuntoja on jo enimmäismäärä."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            if len(self.sessions) >= self.max_sessions:
+                return None
+            session = self.sessions[session_id] = ChatSession(self._summarizer(asyncio.get_running_loop()))
+        session.last_seen = time.monotonic()
+        return session
+
+    async def handle_chat(self, request: web.Request) -> web.Response:
+        """POST /chat {"question": str, "session_id": str (valinnainen)}"""
+        self.stats["requests"] += 1
+        if self.pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            return web.json_response({"error": "Palvelin on ruuhkautunut, yritä hetken päästä uudelleen."},
+                                     status=503, headers={"Retry-After": "1"})
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            return web.json_response({"error": "Pyynnön runko ei ole kelvollista JSONia."}, status=400)
+        question = str(body.get("question", "")).strip()
+        if not question:
+            return web.json_response({"error": "Kysymys puuttuu."}, status=400)
+
+        session_id = str(body.get("session_id") or uuid.uuid4().hex)
+        session = self._session(session_id)
+        if session is None:
+            self.stats["rejected"] += 1
+            return web.json_response({"error": "Liian monta istuntoa."}, status=503, headers={"Retry-After": "5"})
+        # Yksi kysymys kerrallaan istuntoa kohden: historia pysyy järjestyksessä
+        if session.lock.locked():
+            self.stats["busy"] += 1
+            return web.json_response({"error": "Edellinen kysymys on vielä käsittelyssä.", "session_id": session_id},
+                                     status=429)
+
+        self.pending += 1
+        try:
+            async with session.lock:
+                response, cached = await self.answer(session, question)
+        except Exception as e:
+            self.stats["failed"] += 1
+            return web.json_response({"error": f"Vastauksen muodostaminen epäonnistui: {e}", "session_id": session_id},
+                                     status=502)
+        finally:
+            self.pending -= 1
+        self.stats["answered"] += 1
+        return web.json_response({"session_id": session_id, "answer": response, "cached": cached})
+
+    async def handle_delete_session(self, request: web.Request) -> web.Response:
+        """DELETE /sessions/{session_id}"""
+        removed = self.sessions.pop(request.match_info["session_id"], None) is not None
+        return web.json_response({"removed": removed})
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """GET /health: istuntojen, jonon ja välimuistin tilanne."""
+        return web.json_response(self.status())
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self.sessions),
+            "pending": self.pending,
+            "llm_in_flight": self.llm_in_flight,
+            "stats": dict(self.stats),
+            "faq": self.faq.stats() if self.faq else None,
+            "knowledge_reloads": getattr(self.knowledge, "reloads", 0),
+        }
+
+    def sweep_sessions(self) -> int:
+        """Poista istunnot, joita ei ole käytetty session_ttl sekuntiin."""
+        now = time.monotonic()
+        expired = [session_id for session_id, session in self.sessions.items()
+                   if now - session.last_seen > self.session_ttl and not session.lock.locked()]
+        for session_id in expired:
+            del self.sessions[session_id]
+        return len(expired)
+
+    async def _sweeper(self, app: web.Application):
+        async def sweep_forever():
+            while True:
+                await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+                self.sweep_sessions()
+
+        task = asyncio.create_task(sweep_forever())
+        yield
+        task.cancel()
+
+    def create_app(self) -> web.Application:
+        """Rakenna aiohttp-sovellus palvelimen reitteineen."""
+        app = web.Application()
+        app.add_routes([
+            web.post("/chat", self.handle_chat),
+            web.delete("/sessions/{session_id}", self.handle_delete_session),
+            web.get("/health", self.handle_health),
+        ])
+        app.cleanup_ctx.append(self._sweeper)
+        return app
+
+
+async def start_server(server: AlpottiServer, host: str = "127.0.0.1", port: int = 8080) -> Tuple[web.AppRunner, str]:
+    """
+    Käynnistä palvelin käynnissä olevaan tapahtumasilmukkaan.
+
+    Args:
+        server (AlpottiServer): Palvelin.
+        host (str): Kuunneltava osoite.
+        port (int): Kuunneltava portti, 0 valitsee vapaan portin.
+
+    Returns:
+        Tuple[web.AppRunner, str]: Ajuri (runner.cleanup() sammuttaa) ja palvelimen osoite.
+    """
+    runner = web.AppRunner(server.create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port, backlog=1024).start()
+    return runner, f"http://{host}:{runner.addresses[0][1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alpotti HTTP-palvelimena monelle kävijälle")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--knowledge", default=DEFAULT_KNOWLEDGE_FILE, help="tietopankin JSON-tiedosto")
+    parser.add_argument("--llm-concurrency", type=int, default=DEFAULT_LLM_CONCURRENCY)
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING)
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS)
+    parser.add_argument("--no-faq-cache", action="store_true", help="ohita vastausvälimuisti")
+    parser.add_argument("--api-base", help="LLM-palvelimen osoite, esim. paikallinen testipalvelin")
+    args = parser.parse_args()
+
+    # Tietopankki ladataan kerran ja jaetaan kaikille istunnoille; muutokset vaihdetaan käyttöön lennossa
+    alpotti = AlpottiServer(
+        KnowledgeWatcher(args.knowledge).start(),
+        faq=None if args.no_faq_cache else FAQCache(args.knowledge),
+        llm_concurrency=args.llm_concurrency,
+        max_pending=args.max_pending,
+        max_sessions=args.max_sessions,
+        **({"api_base": args.api_base} if args.api_base else {})
+    )
+    print(f"Alpotti kuuntelee osoitteessa http://{args.host}:{args.port}")
+    web.run_app(alpotti.create_app(), host=args.host, port=args.port, access_log=None, print=None)
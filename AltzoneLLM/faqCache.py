@@ -0,0 +1,147 @@
+import os
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from knowledgeBase import DEFAULT_KNOWLEDGE_FILE, FINNISH_STOPWORDS, tokenize
+
+# Vastaus on voimassa vuorokauden, ellei tietopankki muutu sitä ennen
+DEFAULT_FAQ_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_FAQ_MAX_ENTRIES = 1000
+# Lähes samat kysymykset (sanajoukkojen Jaccard-samankaltaisuus) saavat saman vastauksen
+DEFAULT_SIMILARITY = 0.8
+
+
+def fold(text: str) -> str:
+    """Pienaakkoset ja diakriitit pois: "Älypää" -> "alypaa"."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+_FOLDED_STOPWORDS = {fold(word) for word in FINNISH_STOPWORDS}
+
+
+def question_terms(question: str) -> FrozenSet[str]:
+    """Kysymyksen merkitsevät sanat normalisoituina ilman kysymys- ja täytesanoja."""
+    return frozenset(token for token in tokenize(fold(question)) if token not in _FOLDED_STOPWORDS)
+
+
+def normalize_question(question: str) -> str:
+    """
+    Muodosta kysymyksestä välimuistiavain.
+
+    "Kuka on Hannu Hodari?", "kuka on hannu hodari" ja "Hannu Hodari, kuka?" antavat
+    saman avaimen: sanat normalisoidaan, täytesanat poistetaan ja järjestys ohitetaan.
+    """
+    return " ".join(sorted(question_terms(question)))
+
+
+def file_hash(path: str) -> str:
+    """Tiedoston sisällön SHA-256-tiiviste."""
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+class FAQCache:
+    """
+    Usein kysyttyjen kysymysten vastausvälimuisti.
+
+    Avaimena on normalisoitu kysymys, joten kirjoitusasun erot eivät aiheuta uutta
+    LLM-kutsua. Jos täsmälleen samaa avainta ei löydy, voidaan käyttää vastausta
+    kysymykseen, jonka sanat ovat lähes samat. Vanhentuneet vastaukset (TTL) ohitetaan
+    ja vähiten käytetyt poistetaan rajan täyttyessä (LRU). Koko välimuisti tyhjennetään,
+    kun tietopankin tiedoston sisältö muuttuu.
+
+    Args:
+        source_path (str): Tietopankin tiedosto, jonka muutos mitätöi vastaukset.
+        ttl_seconds (float): Vastauksen voimassaoloaika.
+        max_entries (int): Vastausten enimmäismäärä.
+        similarity (Optional[float]): Lähes samojen kysymysten raja, None = vain täsmälliset osumat.
+    """
+    def __init__(self, source_path: str = DEFAULT_KNOWLEDGE_FILE, ttl_seconds: float = DEFAULT_FAQ_TTL_SECONDS,
+                 max_entries: int = DEFAULT_FAQ_MAX_ENTRIES, similarity: Optional[float] = DEFAULT_SIMILARITY):
+        self.source_path = source_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        # avain -> (vastaus, tallennusaika, sanajoukko)
+        self._entries: "OrderedDict[str, Tuple[str, float, FrozenSet[str]]]" = OrderedDict()
+        self._source_stat: Optional[Tuple[int, int]] = None
+        self.source_hash: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _check_source(self) -> None:
+        """Tyhjennä välimuisti, jos tietopankin sisältö on muuttunut. Vaatii lukon."""
+        try:
+            stat = os.stat(self.source_path)
+        except OSError:
+            return
+        # Tiiviste lasketaan vain, kun mtime tai koko on muuttunut
+        if self._source_stat == (stat.st_mtime_ns, stat.st_size):
+            return
+        self._source_stat = (stat.st_mtime_ns, stat.st_size)
+        digest = file_hash(self.source_path)
+        if digest != self.source_hash:
+            self._entries.clear()
+            self.source_hash = digest
+
+    def get(self, question: str) -> Optional[str]:
+        """
+        Hae vastaus kysymykselle.
+
+        Returns:
+            Optional[str]: Tallennettu vastaus tai None.
+        """
+        terms = question_terms(question)
+        if not terms:
+            # Pelkistä täytesanoista koostuva kysymys ("kerro lisää") riippuu keskustelusta
+            return None
+        key = " ".join(sorted(terms))
+        now = time.time()
+        with self._lock:
+            self._check_source()
+            entry = self._entries.get(key)
+            if entry is None and self.similarity is not None:
+                key, entry = self._nearest(terms)
+            if entry is not None and now - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _nearest(self, terms: FrozenSet[str]) -> Tuple[Optional[str], Optional[Tuple[str, float, FrozenSet[str]]]]:
+        best_key, best_entry, best_score = None, None, 0.0
+        for key, entry in self._entries.items():
+            score = len(terms & entry[2]) / len(terms | entry[2])
+            if score > best_score:
+                best_key, best_entry, best_score = key, entry, score
+        if best_score >= self.similarity:
+            return best_key, best_entry
+        return None, None
+
+    def set(self, question: str, answer: str) -> None:
+        """Tallenna kysymyksen vastaus."""
+        terms = question_terms(question)
+        if not terms:
+            return
+        with self._lock:
+            self._check_source()
+            key = " ".join(sorted(terms))
+            self._entries[key] = (answer, time.time(), terms)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Palauta osumien ja ohitusten määrät sekä vastausten määrä."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import math
+import hashlib
+import threading
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from searchIndex import BM25_B, BM25_K1, tokenize
+
+# Tietopankin oletustiedosto
+DEFAULT_KNOWLEDGE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alpotti.json")
+# Kuinka monta hahmoa kysymykseen liitetään oletuksena
+DEFAULT_TOP_K = 3
+# Nimen sumean vastaavuuden raja (0-1) ja siitä saatava lisäpiste
+FUZZY_NAME_THRESHOLD = 0.8
+NAME_MATCH_BOOST = 5.0
+# Kuinka usein tietopankin tiedoston muutokset tarkistetaan (sekunteina)
+DEFAULT_POLL_SECONDS = 2.0
+# Suomen taivutusmuodot ("Hodarin", "Hodarista") osuvat samaan termiin, kun sanat katkaistaan
+STEM_LENGTH = 5
+# Kysymyssanat ja muut yleiset sanat, jotka eivät kerro mitään haettavasta hahmosta
+FINNISH_STOPWORDS = {
+    "ja", "on", "ei", "se", "ne", "he", "hän", "että", "tai", "kuin", "mutta", "myös", "nyt",
+    "kuka", "ketkä", "mikä", "mitkä", "mitä", "millainen", "millaisia", "miten", "miksi", "missä",
+    "kerro", "kertoa", "tiedätkö", "onko", "ovat", "oli", "olla", "minä", "mä", "sinä", "sä",
+    "minulle", "mulle", "jotain", "lisää", "pelissä", "pelin", "peli", "the", "is", "who", "what",
+}
+
+_SUFFIXES = ("Description", "ImgAlt", "Alt")
+
+
+def query_tokens(text: str) -> List[str]:
+    """Pilko teksti sanoiksi ilman yleisiä kysymys- ja täytesanoja."""
+    return [token for token in tokenize(text) if token not in FINNISH_STOPWORDS]
+
+
+def stem(token: str) -> str:
+    """Kevyt katkaisuvartalo: sanan alku riittää erottamaan hahmojen nimet ja kuvaukset."""
+    return token[:STEM_LENGTH]
+
+
+def _camel_key(slug: str) -> str:
+    """Muunna "hannu-hodari" muotoon "hannuHodari", jolla kuvausavaimet alkavat."""
+    head, *rest = slug.split("-")
+    return head + "".join(part.capitalize() for part in rest)
+
+
+def parse_records(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Muunna alpotti.json hahmokohtaisiksi tietueiksi.
+
+    Tiedostossa on kahta muotoa: tasaiset avaimet (nimi, xDescription, xImgAlt/xAlt)
+    sekä ryhmät, joilla on nimi, kuvaus ja heroes-sanakirja. Jokaisesta hahmosta ja
+    ryhmästä tulee yksi tietue, jonka "text" on valmis kehotteeseen liitettäväksi.
+
+    Args:
+        data (Dict[str, Any]): alpotti.json jäsennettynä.
+
+    Returns:
+        List[Dict[str, Any]]: Tietueet muodossa {"id", "name", "group", "text"}.
+    """
+    records = []
+    used = set()
+
+    # Tasaiset avaimet: kuvauksesta etsitään nimi ja kuvateksti samalla alkuosalla
+    names_by_base = {_camel_key(key): key for key, value in data.items()
+                     if isinstance(value, str) and not key.endswith(_SUFFIXES)}
+    for key, value in data.items():
+        if not (isinstance(value, str) and key.endswith("Description")):
+            continue
+        base = key[:-len("Description")]
+        name_key = names_by_base.get(base, base)
+        name = data.get(name_key, base)
+        alt = data.get(base + "ImgAlt") or data.get(base + "Alt") or ""
+        used.update({key, name_key, base + "ImgAlt", base + "Alt"})
+        records.append({
+            "id": base,
+            "name": name,
+            "group": None,
+            "text": f"{name}: {value.strip()}" + (f" (Kuva: {alt})" if alt else ""),
+        })
+
+    # Ryhmät ja niiden sankarit
+    for key, group in data.items():
+        if not (isinstance(group, dict) and "heroes" in group):
+            continue
+        used.add(key)
+        group_name = group.get("name", key).strip()
+        heroes = group.get("heroes", {})
+        hero_titles = ", ".join(hero.get("title", hero_key) for hero_key, hero in heroes.items())
+        records.append({
+            "id": key,
+            "name": group_name,
+            "group": group_name,
+            "text": f"Ryhmä {group_name}: {group.get('description', '').strip()} Sankarit: {hero_titles}.",
+        })
+        for hero_key, hero in heroes.items():
+            title = hero.get("title", hero_key)
+            records.append({
+                "id": f"{key}.{hero_key}",
+                "name": title,
+                "group": group_name,
+                "text": f"{title} (ryhmä {group_name}): {hero.get('description', '').strip()}",
+            })
+
+    # Loput tasaiset avaimet ovat sivuston tekstejä
+    for key, value in data.items():
+        if key not in used and isinstance(value, str):
+            records.append({"id": key, "name": key, "group": None, "text": f"{key}: {value}"})
+    return records
+
+
+class KnowledgeBase:
+    """
+    Hahmotietueiden haku kysymyksen perusteella.
+
+    Tietueet pisteytetään BM25-tyyppisesti katkaistuilla sanoilla, ja jos kysymyksessä
+    mainitaan hahmon nimi (myös taivutettuna tai kirjoitusvirheellä), tietue saa
+    lisäpisteitä. Indeksi käännetään kerran: termien idf-arvot, tietueiden
+    pituusnormit ja kehotteeseen liitettävät tekstit lasketaan valmiiksi, joten
+    haku ei jäsennä eikä muotoile mitään uudelleen. Olio on muuttumaton, joten sitä
+    voi käyttää useasta säikeestä ja vaihtaa kokonaan uuteen (ks. KnowledgeWatcher).
+
+    Args:
+        records (List[Dict[str, Any]]): parse_records-funktion tuottamat tietueet.
+        source_hash (Optional[str]): Lähdetiedoston sisällön tiiviste, jos tiedossa.
+    """
+    def __init__(self, records: List[Dict[str, Any]], source_hash: Optional[str] = None):
+        self.records = records
+        self.source_hash = source_hash
+        self._fragments = [record["text"] for record in records]
+        self._terms = [Counter(stem(token) for token in tokenize(record["text"])) for record in records]
+        lengths = [sum(terms.values()) for terms in self._terms]
+        average_length = sum(lengths) / len(records) if records else 1.0
+        self._norms = [1 - BM25_B + BM25_B * length / average_length for length in lengths]
+        document_frequency = Counter(term for terms in self._terms for term in terms)
+        count = len(records)
+        self._idf = {term: math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+                     for term, frequency in document_frequency.items()}
+        self._name_tokens = [tokenize(record["name"]) for record in records]
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "KnowledgeBase":
+        """Jäsennä ja indeksoi tietopankki tiedoston sisällöstä."""
+        return cls(parse_records(json.loads(data.decode("utf-8"))), hashlib.sha256(data).hexdigest())
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_KNOWLEDGE_FILE) -> "KnowledgeBase":
+        """Lue ja indeksoi tietopankki JSON-tiedostosta."""
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read())
+
+    def _name_score(self, index: int, question_tokens: List[str]) -> float:
+        """Kuinka hyvin hahmon nimen sanat löytyvät kysymyksestä (0-1)."""
+        name_tokens = self._name_tokens[index]
+        if not name_tokens:
+            return 0.0
+        best = []
+        for name_token in name_tokens:
+            best.append(max((SequenceMatcher(None, name_token, token[:len(name_token) + 2]).ratio()
+                             for token in question_tokens), default=0.0))
+        return sum(best) / len(best)
+
+    def search(self, question: str, top_k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+        """
+        Palauta kysymykseen parhaiten liittyvät tietueet.
+
+        Args:
+            question (str): Käyttäjän kysymys.
+            top_k (int): Palautettavien tietueiden enimmäismäärä.
+
+        Returns:
+            List[Dict[str, Any]]: Tietueet parhaasta alkaen; tyhjä, jos mikään ei osu.
+        """
+        return [self.records[index] for index in self._rank(question, top_k)]
+
+    def _rank(self, question: str, top_k: int) -> List[int]:
+        """Parhaiten pisteytettyjen tietueiden indeksit parhaasta alkaen."""
+        question_tokens = query_tokens(question)
+        query = {stem(token) for token in question_tokens}
+        scores = []
+        for index, terms in enumerate(self._terms):
+            score = 0.0
+            for term in query & terms.keys():
+                frequency = terms[term]
+                score += self._idf[term] * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * self._norms[index])
+            name_score = self._name_score(index, question_tokens) if question_tokens else 0.0
+            if name_score >= FUZZY_NAME_THRESHOLD:
+                score += NAME_MATCH_BOOST * name_score
+            if score > 0:
+                scores.append((score, index))
+        scores.sort(reverse=True)
+        return [index for _, index in scores[:top_k]]
+
+    def context_for(self, question: str, top_k: int = DEFAULT_TOP_K) -> str:
+        """Muodosta kysymykseen liitettävä tietoteksti haetuista tietueista."""
+        return "\n".join(self._fragments[index] for index in self._rank(question, top_k))
+
+
+class KnowledgeWatcher:
+    """
+    Tietopankki, joka päivittyy, kun sen tiedosto muuttuu.
+
+    Taustasäie tarkistaa tiedoston mtime-arvon ja koon poll_interval sekunnin välein.
+    Kun ne muuttuvat ja sisällön tiiviste on eri, uusi KnowledgeBase rakennetaan
+    kokonaan ennen kuin se vaihdetaan käyttöön yhdellä sijoituksella. Käynnissä olevat
+    kysymykset käyttävät loppuun sitä versiota, jonka ne saivat, eikä palvelu katkea.
+    Jos uusi tiedosto on virheellinen, vanha versio jää käyttöön.
+
+    Args:
+        path (str): Tietopankin JSON-tiedosto.
+        poll_interval (float): Tarkistusväli sekunteina.
+    """
+    def __init__(self, path: str = DEFAULT_KNOWLEDGE_FILE, poll_interval: float = DEFAULT_POLL_SECONDS):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._stat = self._read_stat()
+        self.current = KnowledgeBase.from_file(path)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _read_stat(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> bool:
+        """
+        Tarkista tiedosto ja vaihda uusi versio käyttöön, jos sisältö on muuttunut.
+
+        Returns:
+            bool: True, jos tietopankki vaihdettiin.
+        """
+        stat = self._read_stat()
+        if stat is None or stat == self._stat:
+            return False
+        self._stat = stat
+        try:
+            with open(self.path, "rb") as file:
+                data = file.read()
+            if hashlib.sha256(data).hexdigest() == self.current.source_hash:
+                return False
+            knowledge = KnowledgeBase.from_bytes(data)
+        except (OSError, ValueError) as e:
+            # Keskeneräinen tai virheellinen tiedosto: vanha versio palvelee, kunnes tiedosto korjataan
+            self.last_error = str(e)
+            return False
+        self.current = knowledge
+        self.last_error = None
+        self.reloads += 1
+        return True
+
+    def start(self) -> "KnowledgeWatcher":
+        """Käynnistä tarkistukset taustasäikeessä."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="knowledge-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.check()
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        return self.current.records
+
+    def search(self, question: str, top_k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+        """Hae nykyisestä tietopankista, ks. KnowledgeBase.search."""
+        return self.current.search(question, top_k)
+
+    def context_for(self, question: str, top_k: int = DEFAULT_TOP_K) -> str:
+        """Muodosta tietoteksti nykyisestä tietopankista, ks. KnowledgeBase.context_for."""
+        return self.current.context_for(question, top_k)
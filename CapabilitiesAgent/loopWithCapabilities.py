@@ -10,15 +10,6 @@ from typing import Dict, List, Callable
 # Ladataan ympäristömuuttujat .env-tiedostosta
 load_dotenv()
 
-# Haetaan OpenAI:n API-avain ympäristömuuttujista
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    # Heitetään virhe, jos API-avain puuttuu
-    raise ValueError("API-avain puuttuu! Lisää se .env-tiedostoon tai tarkista polku.")
-
-# Asetetaan API-avain litellm-kirjaston käyttöön ympäristömuuttujana
-os.environ["OPENAI_API_KEY"] = api_key
-
 
 class ActionContext:
     """
@@ -184,6 +175,15 @@ class Agent:
 
 # Esimerkki käytöstä
 if __name__ == "__main__":
+    # Haetaan OpenAI:n API-avain ympäristömuuttujista
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        # Heitetään virhe, jos API-avain puuttuu
+        raise ValueError("API-avain puuttuu! Lisää se .env-tiedostoon tai tarkista polku.")
+
+    # Asetetaan API-avain litellm-kirjaston käyttöön ympäristömuuttujana
+    os.environ["OPENAI_API_KEY"] = api_key
+
     agent = Agent(
         goals=["Suorita annettu tehtävä"],
         agent_language=None,
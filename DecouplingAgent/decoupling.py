@@ -1,8 +1,11 @@
 import os
+import sys
 import uuid
 from dotenv import load_dotenv
-from litellm import completion
-from typing import Dict, List, Callable
+from typing import Dict, List, Callable, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from llmCache import cached_completion
 
 # Ladataan ympäristömuuttujat .env-tiedostosta
 load_dotenv()
@@ -50,14 +53,14 @@ class Memory:
 
 
 # LLM-funktio, joka integroi OpenAI:n GPT-mallin
-def real_llm(prompt: str) -> str:
+def real_llm(prompt: str, use_cache: Optional[bool] = None) -> str:
     # OpenAI:n Chat API vaatii "messages"-taulukon
     messages = [
         {"role": "system", "content": "You are a helpful assistant."},  # Järjestelmäsanoma (ohjeistus mallille)
         {"role": "user", "content": prompt}  # Käyttäjän antama pyyntö
     ]
-    # Kutsutaan litellm-kirjaston completion-metodia
-    return completion(messages=messages, model="gpt-4", api_key=os.getenv("OPENAI_API_KEY"))
+    # Kutsutaan litellm-kirjaston completion-metodia välimuistin kautta (LLM_CACHE=on ottaa sen käyttöön, use_cache=False ohittaa sen)
+    return cached_completion(messages=messages, model="gpt-4", api_key=os.getenv("OPENAI_API_KEY"), use_cache=use_cache)
 
 # Työkalu: Koodin laadun analysointi
 def analyze_code_quality(action_context: ActionContext, code: str) -> str:
@@ -1,10 +1,14 @@
 import os
+import sys
 import uuid
 import requests
 from inspect import signature, Parameter
 from typing import Dict, Any, Callable, List, get_type_hints
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from tracing import payload_size, span
+
 # Lataa ympäristömuuttujat .env-tiedostosta
 load_dotenv()
 
@@ -31,25 +35,30 @@ class ActionContext:
 class PythonEnvironment:
     def execute_action(self, action_context: ActionContext, action: Callable, args: Dict) -> Dict:
         """Suorittaa toiminnon automaattisella riippuvuuksien injektiolla."""
-        try:
-            # Kopioidaan args, jotta alkuperäinen pysyy muuttumattomana
-            args_copy = args.copy()
-
-            # Tarkistetaan, tarvitseeko toiminto action_contextin
-            if self._has_named_parameter(action, "action_context"):
-                args_copy["action_context"] = action_context
-
-            # Lisätään ActionContextin ominaisuudet, jotka vastaavat _-prefiksillä alkavia parametreja
-            for key, value in action_context.properties.items():
-                param_name = f"_{key}"
-                if self._has_named_parameter(action, param_name):
-                    args_copy[param_name] = value
-
-            # Suoritetaan toiminto injektoiduilla riippuvuuksilla
-            result = action(**args_copy)
-            return {"tool_executed": True, "result": result}
-        except Exception as e:
-            return {"tool_executed": False, "error": str(e)}
+        with span("execute_action", tool=getattr(action, "__name__", str(action))) as s:
+            if s.recording:
+                s.set(args_bytes=payload_size(args))
+            try:
+                # Kopioidaan args, jotta alkuperäinen pysyy muuttumattomana
+                args_copy = args.copy()
+
+                # Tarkistetaan, tarvitseeko toiminto action_contextin
+                if self._has_named_parameter(action, "action_context"):
+                    args_copy["action_context"] = action_context
+
+                # Lisätään ActionContextin ominaisuudet, jotka vastaavat _-prefiksillä alkavia parametreja
+                for key, value in action_context.properties.items():
+                    param_name = f"_{key}"
+                    if self._has_named_parameter(action, param_name):
+                        args_copy[param_name] = value
+
+                # Suoritetaan toiminto injektoiduilla riippuvuuksilla
+                result = {"tool_executed": True, "result": action(**args_copy)}
+            except Exception as e:
+                result = {"tool_executed": False, "error": str(e)}
+            if s.recording:
+                s.set(bytes=payload_size(result), ok=result["tool_executed"])
+            return result
 
     @staticmethod
     def _has_named_parameter(func: Callable, name: str) -> bool:
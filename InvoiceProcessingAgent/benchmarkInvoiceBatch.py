@@ -0,0 +1,108 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from functools import partial
+from typing import Dict, List
+
+# Benchmark käyttää paikallista testipalvelinta, joten oikeaa API-avainta ei tarvita
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-key")
+
+from litellm import completion
+
+from invoiceAgent import ActionContext
+from invoiceBatch import BatchStats, extract_batch, print_summary
+from invoiceRules import extract_with_rules
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from mockLLMServer import build_completion, start_server
+
+VENDORS = [
+    ("Vendor Name", "123 Vendor St."),
+    ("Vendor ABC", "456 Vendor Ave."),
+    ("Vendor XYZ", "789 Vendor Blvd."),
+]
+# Toimittaja, jonka laskuissa summa on "Amount Due" -rivillä; sääntöjen asettelu ei tunne sitä,
+# joten nämä laskut menevät aina LLM:lle
+UNKNOWN_VENDOR = ("Acme Supplies", "1 Market Sq.")
+_FIELD_RE = {
+    "invoice_number": re.compile(r"Invoice #(\S+)"),
+    "date": re.compile(r"Date: (\S+)"),
+    "total_amount": re.compile(r"(?:Total Amount|Amount Due): \$([\d.]+)"),
+    "vendor_name": re.compile(r"Vendor: (.+)"),
+    "vendor_address": re.compile(r"Address: (.+)"),
+}
+_ITEM_RE = re.compile(r"Description: (.+?), Quantity: (\d+), Unit Price: \$([\d.]+), Total: \$([\d.]+)")
+
+
+def make_invoice(number: int, rng: random.Random, drop_total: bool = False, unknown_vendor: bool = False) -> str:
+    """Luo input_invoice.json-tiedoston muotoinen laskuteksti."""
+    name, address = UNKNOWN_VENDOR if unknown_vendor else rng.choice(VENDORS)
+    quantity, unit_price = rng.randint(1, 9), rng.choice([25.0, 50.0, 100.0])
+    lines = [f"Invoice #{number}", f"Date: 2023-02-{1 + number % 28:02d}", f"Vendor: {name}", f"Address: {address}"]
+    if not drop_total:
+        lines.append(f"{'Amount Due' if unknown_vendor else 'Total Amount'}: ${quantity * unit_price:.2f}")
+    lines += ["", "Line Items:",
+              f"1. Description: Item {number}, Quantity: {quantity}, Unit Price: ${unit_price:.2f}, Total: ${quantity * unit_price:.2f}"]
+    return "\n".join(lines)
+
+
+def make_invoices(count: int, failure_rate: float = 0.0, seed: int = 0, unknown_rate: float = 0.0) -> List[str]:
+    """Luo laskutekstit; failure_rate-osuudesta puuttuu kokonaissumma ja unknown_rate-osuus on tuntemattomalla asettelulla."""
+    rng = random.Random(seed)
+    return [make_invoice(10000 + index, rng, drop_total=rng.random() < failure_rate,
+                         unknown_vendor=rng.random() < unknown_rate) for index in range(count)]
+
+
+def parse_invoice_text(text: str) -> Dict:
+    """Eristä laskun kentät säännöllisillä lausekkeilla kuten LLM (puuttuva kenttä jää pois)."""
+    fields = {key: match.group(1).strip() for key, pattern in _FIELD_RE.items() if (match := pattern.search(text))}
+    data = {key: fields[key] for key in ("invoice_number", "date") if key in fields}
+    if "total_amount" in fields:
+        data["total_amount"] = float(fields["total_amount"])
+    data["vendor"] = {"name": fields.get("vendor_name", ""), "address": fields.get("vendor_address", "")}
+    data["line_items"] = [
+        {"description": description, "quantity": int(quantity), "unit_price": float(unit_price), "total": float(total)}
+        for description, quantity, unit_price, total in _ITEM_RE.findall(text)
+    ]
+    return data
+
+
+def invoice_reply(request: Dict) -> Dict:
+    """Testipalvelimen vastaus laskun eristyspyyntöön."""
+    data = parse_invoice_text(request["messages"][-1]["content"])
+    return build_completion(request.get("model", "gpt-4o"), content=json.dumps(data))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Laskujen eräkäsittelyn läpäisy paikallista LLM-palvelinta vasten")
+    parser.add_argument("--invoices", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rate-limit", type=float, help="LLM-kutsuja sekunnissa")
+    parser.add_argument("--latency", default="lognormal:0.3:0.4", help="LLM-testipalvelimen viive tai jakauma")
+    parser.add_argument("--failure-rate", type=float, default=0.02, help="osuus laskuista, joista puuttuu summa")
+    parser.add_argument("--unknown-rate", type=float, default=0.2, help="osuus laskuista tuntemattomalla asettelulla")
+    args = parser.parse_args()
+
+    latency = float(args.latency) if args.latency.replace(".", "", 1).isdigit() else args.latency
+    server, api_base = start_server(latency=latency, reply=invoice_reply)
+    action_context = ActionContext({"llm": partial(completion, api_base=api_base)})
+    documents = make_invoices(args.invoices, args.failure_rate, unknown_rate=args.unknown_rate)
+
+    for concurrency in args.concurrency:
+        for fast_path in (None, extract_with_rules):
+            # Yksi lasku kerrallaan ilman sääntöjä vastaa alkuperäistä silmukkaa
+            print(f"\n== Rinnakkaisuus {concurrency}, {'säännöt + LLM' if fast_path else 'vain LLM'} ==")
+            stats = BatchStats()
+            started = time.perf_counter()
+            results = list(extract_batch(documents, action_context, concurrency=concurrency,
+                                         rate_limit=args.rate_limit, fast_path=fast_path))
+            for result in results:
+                stats.add(result)
+            print_summary(stats.summarize(time.perf_counter() - started))
+            assert [result["index"] for result in results] == list(range(1, len(documents) + 1))
+
+    server.shutdown()
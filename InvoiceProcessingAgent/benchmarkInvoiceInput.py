@@ -0,0 +1,64 @@
+import os
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from typing import Callable, Dict
+
+from benchmarkInvoiceBatch import make_invoices
+from invoiceBatch import iter_documents
+
+
+def write_input(path: str, count: int, jsonl: bool) -> None:
+    """Kirjoita count laskua JSON-taulukkona tai JSONL-tiedostona."""
+    with open(path, "w", encoding="utf-8") as file:
+        entries = ({"raw_invoice_text": text} for text in make_invoices(count))
+        if jsonl:
+            file.writelines(json.dumps(entry) + "\n" for entry in entries)
+        else:
+            json.dump(list(entries), file, indent=2)
+
+
+def load_whole(path: str):
+    """Alkuperäinen tapa: koko tiedosto jäsennetään ennen ensimmäistä laskua."""
+    with open(path, "r", encoding="utf-8") as file:
+        for entry in json.load(file):
+            yield entry.get("raw_invoice_text", "")
+
+
+def measure(read: Callable[[str], object], path: str) -> Dict[str, float]:
+    """
+    Mittaa huippumuisti, aika ensimmäiseen laskuun ja kokonaisaika.
+
+    tracemalloc hidastaa Python-koodia (striimattu jäsennys) enemmän kuin C-toteutusta
+    (json.load), joten kokonaisajat ovat vain suuntaa antavia.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    for _ in read(path):
+        if first is None:
+            first = time.perf_counter() - start
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"peak_mb": peak / 1024 / 1024, "first_ms": (first or 0.0) * 1000, "total_ms": total * 1000}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Laskusyötteen lukemisen muistinkäyttö ja viive")
+    parser.add_argument("--invoices", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'Syöte':<28}{'Huippu (MB)':>12}{'1. lasku (ms)':>15}{'Yhteensä (ms)':>15}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.invoices:
+            for jsonl in (False, True):
+                path = os.path.join(directory, f"invoices_{count}.json" + ("l" if jsonl else ""))
+                write_input(path, count, jsonl)
+                readers = [("striimattu", iter_documents)] if jsonl else [("json.load", load_whole), ("striimattu", iter_documents)]
+                for name, read in readers:
+                    result = measure(read, path)
+                    label = f"{count} {'JSONL' if jsonl else 'JSON'} / {name}"
+                    print(f"{label:<28}{result['peak_mb']:>12.1f}{result['first_ms']:>15.1f}{result['total_ms']:>15.0f}")
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from functools import partial
+from typing import Any, Callable, Dict
+
+# Benchmark käyttää paikallista testipalvelinta, joten oikeaa API-avainta ei tarvita
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-key")
+
+from litellm import completion
+
+from benchmarkInvoiceBatch import make_invoices, parse_invoice_text
+from invoiceAgent import ActionContext, REPAIR_PROMPT, extract_invoice_data
+from invoiceBatch import BatchStats, extract_batch
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from mockLLMServer import build_completion, start_server
+
+# Korjauspyynnön tunniste ohjeen alusta
+_REPAIR_MARKER = REPAIR_PROMPT.split("{")[0]
+
+
+def _lookup(data: Dict, key: str) -> Any:
+    """Hae arvo avaimella "kenttä" tai "kenttä[indeksi]"."""
+    field, _, index = key.partition("[")
+    value = data.get(field)
+    return value[int(index.rstrip("]"))] if index else value
+
+
+def flaky_reply(error_rate: float, seed: int = 0) -> Callable[[Dict], Dict]:
+    """
+    Testipalvelimen vastaus, joka eristää laskun kuten LLM mutta error_rate-osuudessa
+    koko laskun pyynnöistä jättää summan pois tai palauttaa laskurivin määrän tekstinä.
+    Korjauspyyntöihin vastataan aina oikein pyydetyillä kentillä.
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def reply(request: Dict) -> Dict:
+        system, text = request["messages"][0]["content"], request["messages"][-1]["content"]
+        data = parse_invoice_text(text)
+        if system.startswith(_REPAIR_MARKER):
+            schema = json.loads(system.rsplit("\n", 1)[1])
+            data = {key: _lookup(data, key) for key in schema["properties"]}
+        else:
+            with lock:
+                broken, drop_total = rng.random() < error_rate, rng.random() < 0.5
+            if broken and drop_total:
+                data.pop("total_amount", None)
+            elif broken and data["line_items"]:
+                data["line_items"][0]["quantity"] = str(data["line_items"][0]["quantity"])
+        return build_completion(request.get("model", "gpt-4o"), content=json.dumps(data))
+
+    return reply
+
+
+class UsageCounter:
+    """LLM-kutsun kääre, joka laskee kutsut ja tokenit kaikista säikeistä."""
+    def __init__(self, llm: Callable):
+        self.llm = llm
+        self.calls = self.prompt_tokens = self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, **request):
+        response = self.llm(**request)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += response.usage.prompt_tokens
+            self.completion_tokens += response.usage.completion_tokens
+        return response
+
+
+def full_retry(attempts: int) -> Callable[[ActionContext, str], dict]:
+    """Naiivi uudelleenyritys: koko lasku eristetään alusta, kunnes se kelpaa."""
+    def extract(action_context: ActionContext, document_text: str) -> dict:
+        for attempt in range(attempts):
+            try:
+                return extract_invoice_data(action_context, document_text)
+            except ValueError:
+                if attempt == attempts - 1:
+                    raise
+    return extract
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Virheellisten kenttien korjaus vs. koko laskun uudelleeneristys")
+    parser.add_argument("--invoices", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--error-rate", type=float, default=0.2, help="osuus LLM-vastauksista, joissa on virhe")
+    parser.add_argument("--latency", default="lognormal:0.3:0.4", help="LLM-testipalvelimen viive tai jakauma")
+    args = parser.parse_args()
+
+    latency = float(args.latency) if args.latency.replace(".", "", 1).isdigit() else args.latency
+    documents = make_invoices(args.invoices, unknown_rate=1.0)
+    strategies = {
+        "ei uudelleenyritystä": ({"max_repair_attempts": 0}, extract_invoice_data),
+        "koko lasku uudelleen": ({"max_repair_attempts": 0}, full_retry(3)),
+        "vain virheelliset kentät": ({}, extract_invoice_data),
+    }
+
+    print(f"{'Strategia':<28}{'onnistui':>10}{'kutsuja':>9}{'syöte-t':>10}{'vastaus-t':>11}{'aika (s)':>10}")
+    for name, (context, extract) in strategies.items():
+        # Sama virhejakauma jokaiselle strategialle
+        server, api_base = start_server(latency=latency, reply=flaky_reply(args.error_rate))
+        usage = UsageCounter(partial(completion, api_base=api_base))
+        action_context = ActionContext({"llm": usage, **context})
+        stats = BatchStats()
+        started = time.perf_counter()
+        for result in extract_batch(documents, action_context, concurrency=args.concurrency, extract=extract):
+            stats.add(result)
+        summary = stats.summarize(time.perf_counter() - started)
+        server.shutdown()
+        print(f"{name:<28}{summary['succeeded']:>10}{usage.calls:>9}{usage.prompt_tokens:>10}"
+              f"{usage.completion_tokens:>11}{summary['seconds']:>10.2f}")
@@ -0,0 +1,53 @@
+import json
+import argparse
+import random
+import timeit
+from typing import Callable, Dict, List
+
+from benchmarkInvoiceBatch import invoice_reply, make_invoices
+from invoiceAgent import invoice_schema, validate_invoice
+
+
+def required_only(extracted: dict) -> List[str]:
+    """Aiempi tarkistus: vain ylimmän tason vaaditut kentät."""
+    return [field for field in invoice_schema["required"] if field not in extracted]
+
+
+def make_extractions(count: int, seed: int = 0) -> List[dict]:
+    """Eristetyt laskut testipalvelimen vastauksen muodossa; osassa on vääriä tyyppejä."""
+    rng = random.Random(seed)
+    extractions = []
+    for text in make_invoices(count, failure_rate=0.05, seed=seed):
+        reply = invoice_reply({"messages": [{"role": "user", "content": text}]})
+        extracted = json.loads(reply["choices"][0]["message"]["content"])
+        if rng.random() < 0.05:
+            extracted["line_items"][0]["quantity"] = str(extracted["line_items"][0]["quantity"])
+        extractions.append(extracted)
+    return extractions
+
+
+def measure(validator: Callable[[dict], list], extractions: List[dict], repeat: int) -> Dict[str, float]:
+    seconds = min(timeit.repeat(lambda: [validator(extracted) for extracted in extractions], number=1, repeat=repeat))
+    return {"us_per_invoice": seconds / len(extractions) * 1e6,
+            "invalid": sum(1 for extracted in extractions if validator(extracted))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Laskuskeeman tarkistuksen nopeus laskua kohden")
+    parser.add_argument("--invoices", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    extractions = make_extractions(args.invoices)
+    validators = {"vain vaaditut kentät": required_only, "käännetty skeema": validate_invoice}
+    try:
+        import jsonschema
+        draft = jsonschema.Draft7Validator(invoice_schema)
+        validators["jsonschema"] = lambda extracted: list(draft.iter_errors(extracted))
+    except ImportError:
+        pass
+
+    print(f"{'Tarkistus':<24}{'µs/lasku':>12}{'hylätty':>10}")
+    for name, validator in validators.items():
+        result = measure(validator, extractions, args.repeat)
+        print(f"{name:<24}{result['us_per_invoice']:>12.1f}{result['invalid']:>10}")
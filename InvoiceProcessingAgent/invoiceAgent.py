@@ -1,5 +1,11 @@
+import os
+import sys
 import json
-from typing import List, Dict
+from typing import List, Dict, Tuple, Union
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from jsonStream import iter_json_records
+from schemaCompiler import SchemaValidationError, Violation, compile_schema, format_path
 
 # ---- ActionContext-luokka ----
 class ActionContext:
@@ -33,6 +39,58 @@ class ActionContext:
         """
         self.context_data[key] = value
 
+# ---- Laskun skeema ----
+# Skeema, joka määrittää odotetut kentät ja niiden tyypit
+invoice_schema = {
+    "type": "object",
+    "required": ["invoice_number", "date", "total_amount"],
+    "properties": {
+        "invoice_number": {"type": "string"},
+        "date": {"type": "string"},
+        "total_amount": {"type": "number"},
+        "vendor": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "address": {"type": "string"}
+            }
+        },
+        "line_items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "description": {"type": "string"},
+                    "quantity": {"type": "number"},
+                    "unit_price": {"type": "number"},
+                    "total": {"type": "number"}
+                }
+            }
+        }
+    }
+}
+
+# Skeema käännetään kerran; tarkistus ajetaan jokaiselle eristetylle laskulle
+validate_invoice = compile_schema(invoice_schema)
+
+# Oletusmalli, jos toimintakontekstissa ei ole mallia
+DEFAULT_MODEL = "openai/gpt-4o"
+
+# Ohje, jolla LLM eristää laskutiedot skeeman mukaiseksi JSONiksi
+EXTRACTION_PROMPT = (
+    "Eristä laskun tiedot annetusta tekstistä. Vastaa pelkällä JSON-objektilla, joka noudattaa tätä skeemaa:\n"
+    + json.dumps(invoice_schema)
+)
+
+# Kuinka monta kertaa puuttuvat tai virheelliset kentät pyydetään uudelleen ennen kuin lasku hylätään
+MAX_REPAIR_ATTEMPTS = 2
+
+# Ohje, jolla LLM:ltä pyydetään vain korjattavat kentät
+REPAIR_PROMPT = (
+    "Laskusta aiemmin eristetyissä tiedoissa oli seuraavat virheet:\n{problems}\n"
+    "Eristä annetusta tekstistä vain nämä kentät. Vastaa pelkällä JSON-objektilla, joka noudattaa tätä skeemaa:\n{schema}"
+)
+
 # ---- Laskutietojen käsittelyfunktio ----
 def extract_invoice_data(action_context: ActionContext, document_text: str) -> dict:
     """
@@ -40,47 +98,67 @@ def extract_invoice_data(action_context: ActionContext, document_text: str) -> d
 
     Tämä työkalu käyttää kiinteää skeemaa ja erikoistunutta logiikkaa
     laskutietojen ymmärtämiseen. Se tunnistaa keskeiset kentät, kuten
-    laskun numerot, päivämäärät, summat ja rivitiedot.
+    laskun numerot, päivämäärät, summat ja rivitiedot. Jos LLM:n vastauksesta
+    puuttuu kenttiä tai ne ovat virheellisiä, vain ne pyydetään uudelleen
+    (repair_invoice_data) enintään max_repair_attempts kertaa.
 
     Args:
-        action_context: Toimintakonteksti, joka hallitsee tilaa tai välimuistia.
+        action_context: Toimintakonteksti, joka hallitsee tilaa tai välimuistia. Avaimet
+            "llm", "model" ja "max_repair_attempts" (oletus MAX_REPAIR_ATTEMPTS) ovat valinnaisia.
         document_text: Laskun tekstisisältö.
 
     Returns:
         Sanakirja, joka sisältää eristetyt laskutiedot standardoidussa muodossa.
+
+    Raises:
+        SchemaValidationError: Jos tiedot eivät vastaa invoice_schema-skeemaa vielä korjausyritystenkään
+            jälkeen; virhe listaa kaikki rikkomukset JSON-polkuineen.
     """
-    # Laskun skeema, joka määrittää odotetut kentät ja niiden tyypit
-    invoice_schema = {
-        "type": "object",
-        "required": ["invoice_number", "date", "total_amount"],
-        "properties": {
-            "invoice_number": {"type": "string"},
-            "date": {"type": "string"},
-            "total_amount": {"type": "number"},
-            "vendor": {
-                "type": "object",
-                "properties": {
-                    "name": {"type": "string"},
-                    "address": {"type": "string"}
-                }
-            },
-            "line_items": {
-                "type": "array",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "description": {"type": "string"},
-                        "quantity": {"type": "number"},
-                        "unit_price": {"type": "number"},
-                        "total": {"type": "number"}
-                    }
-                }
-            }
-        }
-    }
+    # LLM-kutsu (esim. litellm:n completion) ja malli tulevat toimintakontekstista
+    llm = action_context.get("llm")
+    if llm is not None:
+        try:
+            extracted = json.loads(_ask_llm(action_context, EXTRACTION_PROMPT, document_text, max_tokens=1024))
+        except json.JSONDecodeError:
+            extracted = None
+    else:
+        extracted = _simulated_extraction()
+
+    # Tarkista vastaus koko skeemaa vasten: vaaditut kentät, tyypit, toimittaja ja rivitiedot.
+    # Virheelliset kentät pyydetään uudelleen yksinään sen sijaan, että koko lasku eristettäisiin alusta
+    if isinstance(extracted, dict):
+        violations = validate_invoice(extracted)
+    else:
+        # Kelvoton vastaus (ei JSON-objekti): kaikki kentät pyydetään korjauspolun kautta
+        extracted = {}
+        violations = [Violation((field,), "vastaus ei ollut kelvollinen JSON-objekti")
+                      for field in invoice_schema["properties"]]
+    for _ in range(action_context.get("max_repair_attempts", MAX_REPAIR_ATTEMPTS) if llm is not None else 0):
+        if not violations or not repair_targets(violations):
+            break
+        extracted = repair_invoice_data(action_context, document_text, extracted, violations)
+        violations = validate_invoice(extracted)
+    if violations:
+        raise SchemaValidationError(violations)
 
-    # Simuloitu LLM-vastaus (korvaa tämä todellisella LLM-kutsulla)
-    simulated_response = {
+    return extracted
+
+def _ask_llm(action_context: ActionContext, system_prompt: str, document_text: str, max_tokens: int) -> str:
+    """Lähetä laskun teksti LLM:lle annetulla ohjeella ja palauta vastauksen JSON-teksti."""
+    response = action_context.get("llm")(
+        model=action_context.get("model", DEFAULT_MODEL),
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": document_text}
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=max_tokens
+    )
+    return response.choices[0].message.content
+
+def _simulated_extraction() -> dict:
+    """Simuloitu LLM-vastaus, kun toimintakontekstissa ei ole LLM-kutsua."""
+    return {
         "invoice_number": "12345",
         "date": "2023-01-01",
         "total_amount": 100.0,
@@ -90,13 +168,81 @@ def extract_invoice_data(action_context: ActionContext, document_text: str) -> d
         ]
     }
 
-    # Tarkista, että kaikki vaaditut kentät löytyvät vastauksesta
-    required_fields = invoice_schema.get("required", [])
-    for field in required_fields:
-        if field not in simulated_response:
-            raise ValueError(f"Puuttuva vaadittu kenttä: {field}")
+# ---- Virheellisten kenttien korjaus ----
+def repair_targets(violations: List[Violation]) -> List[Tuple[Union[str, int], ...]]:
+    """
+    Päättele skeemarikkomuksista pienimmät osat, jotka pyydetään uudelleen.
 
-    return simulated_response
+    Ylimmän tason kenttä pyydetään kokonaan, paitsi taulukoissa vain virheellinen
+    alkio (esim. yksi laskurivi). Jos koko vastaus on väärää tyyppiä, korjattavaa
+    osaa ei ole ja palautetaan tyhjä lista.
+
+    Args:
+        violations: validate_invoice-funktion palauttamat rikkomukset.
+
+    Returns:
+        Korjattavien osien polut järjestyksessä ilman toistoja, esim. [("total_amount",), ("line_items", 2)].
+    """
+    targets = []
+    for violation in violations:
+        path = violation.path
+        if not path:
+            return []
+        is_item = len(path) > 1 and isinstance(path[1], int)
+        target = path[:2] if is_item else path[:1]
+        if target not in targets:
+            targets.append(target)
+    return targets
+
+def _target_schema(target: Tuple[Union[str, int], ...]) -> dict:
+    field_schema = invoice_schema["properties"].get(target[0], {})
+    return field_schema.get("items", {}) if len(target) > 1 else field_schema
+
+def repair_invoice_data(action_context: ActionContext, document_text: str, extracted: dict,
+                        violations: List[Violation]) -> dict:
+    """
+    Pyydä LLM:ltä uudelleen vain virheelliset kentät ja yhdistä ne aiempaan tulokseen.
+
+    Pyynnössä on kapea skeema, jossa on vain korjattavat kentät avaimina niiden
+    JSON-poluilla (esim. "total_amount" tai "line_items[2]"), joten vastaus on
+    murto-osa koko laskusta.
+
+    Args:
+        action_context: Toimintakonteksti, jossa on LLM-kutsu.
+        document_text: Laskun tekstisisältö.
+        extracted: Aiemmin eristetyt laskutiedot.
+        violations: Tietojen skeemarikkomukset.
+
+    Returns:
+        Uusi sanakirja, jossa korjatut kentät on yhdistetty aiempiin tietoihin. Kentät,
+        joita LLM ei palauttanut, jäävät ennalleen.
+    """
+    targets = {format_path(target)[2:]: target for target in repair_targets(violations)}
+    repair_schema = {
+        "type": "object",
+        "required": list(targets),
+        "properties": {key: _target_schema(target) for key, target in targets.items()}
+    }
+    problems = "\n".join(f"- {violation}" for violation in violations)
+    prompt = REPAIR_PROMPT.format(problems=problems, schema=json.dumps(repair_schema))
+    try:
+        answer = json.loads(_ask_llm(action_context, prompt, document_text, max_tokens=512))
+    except json.JSONDecodeError:
+        answer = {}
+
+    repaired = dict(extracted)
+    if not isinstance(answer, dict):
+        return repaired
+    for key, target in targets.items():
+        if key not in answer:
+            continue
+        if len(target) == 1:
+            repaired[target[0]] = answer[key]
+        else:
+            # Kopioidaan taulukko, jotta alkuperäinen tulos ei muutu
+            items = repaired[target[0]] = list(repaired[target[0]])
+            items[target[1]] = answer[key]
+    return repaired
 
 # ---- Laskutietojen tulostusfunktio ----
 def print_invoice_data_as_list(invoice_data: dict):
@@ -122,14 +268,18 @@ def print_invoice_data_as_list(invoice_data: dict):
 
 # ---- Pääohjelma ----
 if __name__ == "__main__":
-    # Lataa laskut JSON-tiedostosta
+    # Laskut luetaan JSON-taulukosta (tai JSONL-tiedostosta) yksi kerrallaan, joten
+    # käsittely alkaa heti eikä koko tiedostoa pidetä muistissa
     input_file = "input_invoice.json"
-    with open(input_file, 'r', encoding='utf-8') as f:
-        invoice_texts = json.load(f)
+    invoice_texts = iter_json_records(input_file)
 
     # Alusta toimintakonteksti
     action_context = ActionContext()
 
+    # Tunnetun asettelun laskut eristetään säännöillä, muut (ja epävarmat) extract_invoice_data-funktiolla.
+    # invoiceRules tuo tämän moduulin, joten se tuodaan vasta täällä
+    from invoiceRules import DEFAULT_MIN_CONFIDENCE, extract_with_rules
+
     # Käsittele ja tulosta kaikki laskut
     for idx, invoice_entry in enumerate(invoice_texts, start=1):
         print(f"Lasku {idx}")
@@ -140,7 +290,15 @@ if __name__ == "__main__":
 
         # Eristä ja tulosta laskutiedot
         try:
-            extracted_data = extract_invoice_data(action_context, document_text)
+            rules = extract_with_rules(document_text)
+        except Exception as e:
+            print(f"  Sääntöjen virhe laskussa {idx}, eristetään LLM:llä: {e}")
+            rules = None
+        try:
+            if rules and rules.confidence >= DEFAULT_MIN_CONFIDENCE:
+                extracted_data = rules.data
+            else:
+                extracted_data = extract_invoice_data(action_context, document_text)
             print_invoice_data_as_list(extracted_data)
         except Exception as e:
             print(f"  Virhe laskussa {idx}: {e}")
\ No newline at end of file
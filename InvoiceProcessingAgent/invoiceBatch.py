@@ -0,0 +1,264 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from jsonStream import iter_json_records
+
+from invoiceAgent import ActionContext, DEFAULT_MODEL, extract_invoice_data, print_invoice_data_as_list
+from invoiceRules import DEFAULT_MIN_CONFIDENCE, RuleResult, extract_with_rules
+
+# Kuinka monta laskua käsitellään oletuksena yhtä aikaa
+DEFAULT_CONCURRENCY = 8
+# Kuinka monta laskua kerrallaan voi olla käsittelyssä tai odottamassa järjestyksessä
+# tulostusta suhteessa rinnakkaisuuteen; rajaa muistin, vaikka yksi lasku jumittaisi
+WINDOW_PER_WORKER = 4
+
+
+class RateLimiter:
+    """
+    Tasaa kutsut annettuun tahtiin (kutsua sekunnissa) kaikkien säikeiden kesken.
+
+    Jokainen acquire() varaa seuraavan vapaan aikavälin ja odottaa sen alkuun, joten
+    kutsut eivät ruuhkaudu purskeiksi, vaikka useampi säie pyytäisi vuoroa kerralla.
+    """
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def extract_batch(documents: Iterable[str], action_context: ActionContext,
+                  concurrency: int = DEFAULT_CONCURRENCY, rate_limit: Optional[float] = None,
+                  ordered: bool = True,
+                  extract: Callable[[ActionContext, str], dict] = extract_invoice_data,
+                  fast_path: Optional[Callable[[str], Optional[RuleResult]]] = None,
+                  min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> Iterator[Dict[str, Any]]:
+    """
+    Eristä laskutiedot monesta laskusta rinnakkain.
+
+    Laskut luetaan syötteestä vasta, kun niille on tilaa, joten syöte voi olla myös
+    generaattori. Yhden laskun virhe kirjataan sen tulokseen eikä keskeytä muita.
+    Jos fast_path on annettu, sitä kokeillaan ensin, ja vain laskut, joiden luottamus
+    jää alle min_confidence-rajan, lähetetään extract-funktiolle.
+
+    Args:
+        documents (Iterable[str]): Laskujen tekstisisällöt.
+        action_context (ActionContext): Toimintakonteksti, jaettu kaikille laskuille.
+        concurrency (int): Samanaikaisesti käsiteltävien laskujen määrä.
+        rate_limit (Optional[float]): LLM-kutsujen enimmäismäärä sekunnissa, None = rajaton. Raja koskee
+            jokaista kutsua, myös korjauspyyntöjä, joten yksi lasku voi käyttää useamman vuoron.
+        ordered (bool): True palauttaa tulokset syötteen järjestyksessä, False valmistumisjärjestyksessä.
+        extract (Callable[[ActionContext, str], dict]): Eristysfunktio.
+        fast_path (Optional[Callable[[str], Optional[RuleResult]]]): Sääntöpohjainen eristys, esim. extract_with_rules.
+        min_confidence (float): Pienin luottamus, jolla fast_path-tulos hyväksytään.
+
+    Yields:
+        Dict[str, Any]: {"index", "data", "seconds", "path"} tai virheen sattuessa {"index", "error", "seconds"};
+        index on laskun järjestysnumero syötteessä alkaen ykkösestä ja path "rules" tai "llm".
+        Jos fast_path tunnisti laskun, mukana on myös sääntöjen "confidence". Jos fast_path kaatui,
+        virhe on kentässä "fast_path_error" ja lasku eristetään extract-funktiolla.
+    """
+    llm = action_context.get("llm")
+    if rate_limit and llm is not None:
+        # Rajoitin kääritään LLM-kutsun ympärille, jotta korjauspyynnötkin lasketaan mukaan
+        limiter = RateLimiter(rate_limit)
+
+        def limited_llm(**request):
+            limiter.acquire()
+            return llm(**request)
+
+        action_context = ActionContext({**action_context.context_data, "llm": limited_llm})
+
+    def run(index: int, document_text: str) -> Dict[str, Any]:
+        if not document_text:
+            return {"index": index, "error": "Laskun tekstisisältö puuttuu.", "seconds": 0.0}
+        start = time.perf_counter()
+        result = {"index": index, "path": "llm"}
+        rules = None
+        if fast_path:
+            # Sääntöjen virhe ei saa kaataa eräajoa: lasku siirtyy tavalliseen eristykseen
+            try:
+                rules = fast_path(document_text)
+            except Exception as e:
+                result["fast_path_error"] = f"{type(e).__name__}: {e}"
+        if rules and rules.confidence >= min_confidence:
+            return {"index": index, "data": rules.data, "seconds": time.perf_counter() - start,
+                    "path": "rules", "confidence": rules.confidence}
+
+        if rules:
+            result["confidence"] = rules.confidence
+        start = time.perf_counter()
+        try:
+            result["data"] = extract(action_context, document_text)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    window = max(1, concurrency) * WINDOW_PER_WORKER
+    numbered = enumerate(documents, start=1)
+    exhausted = False
+    pending = set()
+    # Järjestetyssä tilassa valmiit tulokset odottavat, kunnes kaikki aiemmat on palautettu
+    finished: Dict[int, Dict[str, Any]] = {}
+    next_index = 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            while not exhausted and len(pending) + len(finished) < window:
+                try:
+                    index, document_text = next(numbered)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(run, index, document_text))
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if ordered:
+                    finished[result["index"]] = result
+                else:
+                    yield result
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+
+
+class BatchStats:
+    """
+    Eräajon laskurit. Tuloksia ei säilytetä, joten muistinkäyttö ei kasva laskujen määrän mukana.
+
+    Säästetty aika arvioidaan saman ajon LLM-kutsujen keskimääräisestä kestosta: jokainen
+    sääntöpolun lasku olisi muuten vienyt keskimääräisen LLM-kutsun verran aikaa.
+    """
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+        self.fast_path = 0
+        self.fast_path_seconds = 0.0
+        self.fast_path_errors = 0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+
+    def add(self, result: Dict[str, Any]) -> None:
+        if "error" in result:
+            self.failed += 1
+        else:
+            self.succeeded += 1
+        if "fast_path_error" in result:
+            self.fast_path_errors += 1
+        if result.get("path") == "rules":
+            self.fast_path += 1
+            self.fast_path_seconds += result["seconds"]
+        elif result.get("path") == "llm":
+            self.llm_calls += 1
+            self.llm_seconds += result["seconds"]
+
+    def summarize(self, elapsed: float) -> Dict[str, Any]:
+        """Koosta laskujen määrät, läpäisy ja sääntöpolun säästämä LLM-aika."""
+        invoices = self.succeeded + self.failed
+        llm_mean = self.llm_seconds / self.llm_calls if self.llm_calls else None
+        return {
+            "invoices": invoices,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "seconds": elapsed,
+            "invoices_per_second": invoices / elapsed if elapsed > 0 else None,
+            "fast_path": self.fast_path,
+            "fast_path_errors": self.fast_path_errors,
+            "llm_calls": self.llm_calls,
+            "llm_seconds_mean": llm_mean,
+            # None, jos ajossa ei tehty yhtään LLM-kutsua, johon verrata
+            "seconds_saved": self.fast_path * llm_mean - self.fast_path_seconds if llm_mean is not None else None,
+        }
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(f"\nLaskuja: {summary['invoices']}  onnistui: {summary['succeeded']}  epäonnistui: {summary['failed']}")
+    if summary["invoices_per_second"] is not None:
+        print(f"Aika: {summary['seconds']:.2f} s  läpäisy: {summary['invoices_per_second']:.1f} laskua/s")
+    print(f"Sääntöpolku: {summary['fast_path']}  LLM-kutsuja: {summary['llm_calls']}")
+    if summary["fast_path_errors"]:
+        print(f"Sääntöjen virheitä (eristetty LLM:llä): {summary['fast_path_errors']}")
+    if summary["fast_path"] and summary["seconds_saved"] is not None:
+        print(f"Säästetty LLM-aika: {summary['seconds_saved']:.2f} s "
+              f"(LLM-kutsu keskimäärin {summary['llm_seconds_mean'] * 1000:.0f} ms)")
+
+
+def iter_documents(path: str) -> Iterator[str]:
+    """
+    Lue laskujen tekstisisällöt yksi kerrallaan.
+
+    Syöte voi olla JSON-taulukko {"raw_invoice_text": ...} -objekteja tai JSONL-tiedosto,
+    jonka jokainen rivi on tällainen objekti. Tiedostoa ei jäsennetä kerralla, joten
+    ensimmäinen lasku lähtee eristettäväksi heti ja muistinkäyttö ei kasva tiedoston mukana.
+    """
+    for entry in iter_json_records(path):
+        yield entry.get("raw_invoice_text", "") if isinstance(entry, dict) else ""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Laskujen eräkäsittely rinnakkain")
+    parser.add_argument("input", nargs="?", default="input_invoice.json", help="laskut JSON- tai JSONL-tiedostona")
+    parser.add_argument("--output", help="JSONL-tiedosto tuloksille; oletuksena tulokset tulostetaan")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate-limit", type=float, help="LLM-kutsuja sekunnissa")
+    parser.add_argument("--unordered", action="store_true", help="tulokset valmistumisjärjestyksessä")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--api-base", help="LLM-palvelimen osoite, esim. paikallinen testipalvelin")
+    parser.add_argument("--simulate", action="store_true", help="käytä simuloitua vastausta LLM-kutsun sijaan")
+    parser.add_argument("--no-fast-path", action="store_true", help="lähetä kaikki laskut LLM:lle")
+    parser.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help="pienin sääntöjen luottamus, jolla LLM-kutsu ohitetaan")
+    args = parser.parse_args()
+
+    context = {}
+    if not args.simulate:
+        from litellm import completion
+        context = {"llm": partial(completion, api_base=args.api_base) if args.api_base else completion,
+                   "model": args.model}
+    action_context = ActionContext(context)
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    stats = BatchStats()
+    started = time.perf_counter()
+    try:
+        for result in extract_batch(iter_documents(args.input), action_context, concurrency=args.concurrency,
+                                    rate_limit=args.rate_limit, ordered=not args.unordered,
+                                    fast_path=None if args.no_fast_path else extract_with_rules,
+                                    min_confidence=args.min_confidence):
+            stats.add(result)
+            if output:
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+                continue
+            print(f"Lasku {result['index']}")
+            if "error" in result:
+                print(f"  Virhe laskussa {result['index']}: {result['error']}")
+                continue
+            try:
+                print_invoice_data_as_list(result["data"])
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"  Virhe laskun {result['index']} tulostuksessa: {e}")
+    finally:
+        if output:
+            output.close()
+    print_summary(stats.summarize(time.perf_counter() - started))
@@ -0,0 +1,133 @@
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from invoiceAgent import validate_invoice
+
+# Sääntöjen tulos hyväksytään ilman LLM-kutsua, kun luottamus on vähintään tämä
+DEFAULT_MIN_CONFIDENCE = 0.9
+# Sallittu pyöristysero rivisummien tarkistuksessa
+AMOUNT_TOLERANCE = 0.01
+
+
+def _amount(text: str) -> float:
+    return float(text.replace(",", ""))
+
+
+def _quantity(text: str) -> float:
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+class FieldRule(NamedTuple):
+    """Kentän säännöllinen lauseke ja muunnos; arvo on lausekkeen ensimmäinen ryhmä."""
+    pattern: re.Pattern
+    convert: Callable[[str], Any] = str.strip
+
+
+# Kenttien polut tuloksessa ja niiden säännöt otsikoiduille riveille ("Date: ...", "Vendor: ...")
+STANDARD_FIELDS: Dict[Tuple[str, ...], FieldRule] = {
+    ("invoice_number",): FieldRule(re.compile(r"^Invoice #\s*(\S+)\s*$", re.M)),
+    ("date",): FieldRule(re.compile(r"^Date:\s*(\d{4}-\d{2}-\d{2})\s*$", re.M)),
+    ("total_amount",): FieldRule(re.compile(r"^Total Amount:\s*\$([\d,]+\.\d{2})\s*$", re.M), _amount),
+    ("vendor", "name"): FieldRule(re.compile(r"^Vendor:\s*(.+?)\s*$", re.M)),
+    ("vendor", "address"): FieldRule(re.compile(r"^Address:\s*(.+?)\s*$", re.M)),
+}
+STANDARD_LINE_ITEM = re.compile(
+    r"^\d+\.\s*Description:\s*(?P<description>.+?),\s*Quantity:\s*(?P<quantity>\d+(?:\.\d+)?),"
+    r"\s*Unit Price:\s*\$(?P<unit_price>[\d,]+\.\d{2}),\s*Total:\s*\$(?P<total>[\d,]+\.\d{2})\s*$",
+    re.M,
+)
+# Rivit, jotka näyttävät laskurivin alulta; jos jokin ei vastaa riviskeemaa, sääntö ei kata laskua
+_NUMBERED_LINE = re.compile(r"^\d+\.\s", re.M)
+
+
+class RuleResult(NamedTuple):
+    """Sääntöpohjaisen eristyksen tulos."""
+    layout: str
+    data: Dict[str, Any]
+    confidence: float
+
+
+class LayoutTemplate:
+    """
+    Yhden laskuasettelun säännöt.
+
+    Asettelu tunnistetaan sen rakenteesta (detect-lausekkeet), ei toimittajasta, joten
+    sama malli kattaa kaikki toimittajat, jotka käyttävät samaa asettelua. Kentät
+    eristetään säännöllisillä lausekkeilla, ja luottamus lasketaan tarkistuksista,
+    jotka LLM:kin joutuisi tekemään: löytyivätkö kaikki rivit ja täsmäävätkö summat.
+    """
+    def __init__(self, name: str, detect: List[re.Pattern], fields: Dict[Tuple[str, ...], FieldRule] = None,
+                 line_item: re.Pattern = STANDARD_LINE_ITEM):
+        self.name = name
+        self.detect = detect
+        self.fields = fields or STANDARD_FIELDS
+        self.line_item = line_item
+
+    def matches(self, document_text: str) -> bool:
+        return all(pattern.search(document_text) for pattern in self.detect)
+
+    def extract(self, document_text: str) -> RuleResult:
+        """
+        Eristä laskutiedot tämän asettelun säännöillä.
+
+        Args:
+            document_text (str): Laskun tekstisisältö.
+
+        Returns:
+            RuleResult: Eristetyt tiedot ja luottamus väliltä 0-1. Luottamus on 0, jos
+            tulos ei vastaa laskun skeemaa (esim. vaadittu kenttä puuttuu).
+        """
+        data: Dict[str, Any] = {}
+        for path, rule in self.fields.items():
+            match = rule.pattern.search(document_text)
+            if match:
+                target = data
+                for key in path[:-1]:
+                    target = target.setdefault(key, {})
+                target[path[-1]] = rule.convert(match.group(1))
+        data["line_items"] = [
+            {"description": match["description"].strip(), "quantity": _quantity(match["quantity"]),
+             "unit_price": _amount(match["unit_price"]), "total": _amount(match["total"])}
+            for match in self.line_item.finditer(document_text)
+        ]
+        if validate_invoice(data):
+            return RuleResult(self.name, data, 0.0)
+
+        items = data["line_items"]
+        vendor = data.get("vendor", {})
+        # (paino, läpäisikö tarkistus)
+        checks = [
+            (1, "name" in vendor),
+            (1, "address" in vendor),
+            (2, bool(items) and len(items) == len(_NUMBERED_LINE.findall(document_text))),
+            (1, all(abs(item["quantity"] * item["unit_price"] - item["total"]) <= AMOUNT_TOLERANCE for item in items)),
+            (2, bool(items) and abs(sum(item["total"] for item in items) - data["total_amount"]) <= AMOUNT_TOLERANCE),
+        ]
+        confidence = sum(weight for weight, passed in checks if passed) / sum(weight for weight, _ in checks)
+        return RuleResult(self.name, data, confidence)
+
+
+# Otsikoiduista riveistä ("Invoice #", "Date:", ...) ja numeroiduista laskuriveistä koostuva asettelu
+LABELED_LAYOUT = LayoutTemplate("labeled", [re.compile(r"^Invoice #", re.M), re.compile(r"^Line Items:\s*$", re.M)])
+
+# Tunnetut asettelut kokeilujärjestyksessä
+LAYOUT_TEMPLATES: List[LayoutTemplate] = [LABELED_LAYOUT]
+
+
+def extract_with_rules(document_text: str,
+                       templates: List[LayoutTemplate] = LAYOUT_TEMPLATES) -> Optional[RuleResult]:
+    """
+    Eristä laskutiedot ensimmäisellä asettelumallilla, joka tunnistaa laskun.
+
+    Args:
+        document_text (str): Laskun tekstisisältö.
+        templates (List[LayoutTemplate]): Kokeiltavat asettelumallit.
+
+    Returns:
+        Optional[RuleResult]: Tulos luottamuksineen tai None, jos mikään malli ei tunnista asettelua.
+    """
+    for template in templates:
+        if template.matches(document_text):
+            return template.extract(document_text)
+    return None
@@ -0,0 +1,134 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from litellm import acompletion
+
+from conversationBuffer import ConversationBuffer
+from toolCalls import DEFAULT_MAX_WORKERS, parse_tool_call, run_tool
+from tracing import payload_size, record_usage, span
+
+# Kuinka monta tehtävää ajetaan oletuksena yhtä aikaa
+DEFAULT_CONCURRENCY = 10
+
+
+async def run_agent_async(user_task: str, tools: List[Dict], tool_functions: Dict[str, Callable],
+                          agent_rules: List[Dict], executor: ThreadPoolExecutor,
+                          model: str = "openai/gpt-4o", max_iterations: int = 10,
+                          max_context_tokens: Optional[int] = None, **llm_kwargs) -> Dict[str, Any]:
+    """
+    Suorita agentin silmukka yhdelle tehtävälle asynkronisesti.
+
+    LLM-kutsut tehdään litellm:n acompletion-funktiolla, joten tapahtumasilmukka voi
+    palvella muita tehtäviä vastausta odottaessa. Työkalut ovat tavallisia funktioita,
+    joten ne ajetaan säiejoukossa, jotta ne eivät pysäytä tapahtumasilmukkaa.
+
+    Args:
+        user_task (str): Käyttäjän tehtävä.
+        tools (List[Dict]): Työkalujen kuvaukset LLM:lle.
+        tool_functions (Dict[str, Callable]): Työkalujen nimet ja niitä vastaavat funktiot.
+        agent_rules (List[Dict]): Järjestelmäviestit, jotka lisätään jokaisen pyynnön alkuun.
+        executor (ThreadPoolExecutor): Säiejoukko työkalujen suorittamiseen.
+        model (str): Käytettävä malli.
+        max_iterations (int): Maksimimäärä iteraatioita ennen automaattista lopetusta.
+        max_context_tokens (Optional[int]): Pyynnön tokenibudjetti, None = rajaton.
+        **llm_kwargs: Lisäparametrit acompletion-kutsulle, esim. api_base.
+
+    Returns:
+        Dict[str, Any]: Lopputulos, iteraatioiden määrä ja keskusteluhistoria.
+    """
+    loop = asyncio.get_running_loop()
+    memory = ConversationBuffer(agent_rules, max_tokens=max_context_tokens)
+    memory.append("user", user_task)
+    iterations = 0
+
+    while iterations < max_iterations:
+        iterations += 1
+        with span("iteration", index=iterations):
+            messages = memory.messages()
+            with span("llm", model=model) as llm_span:
+                if llm_span.recording:
+                    llm_span.set(bytes=payload_size(messages))
+                response = await acompletion(
+                    model=model,
+                    messages=messages,
+                    tools=tools,
+                    max_tokens=1024,
+                    **llm_kwargs
+                )
+                record_usage(llm_span, response)
+
+            message = response.choices[0].message
+            if not message.tool_calls:
+                return {"final": message.content, "iterations": iterations, "memory": memory.history}
+
+            actions = [parse_tool_call(tool) for tool in message.tool_calls]
+            terminate_action = next((a for a in actions if a["tool_name"] == "terminate"), None)
+            pending = [a for a in actions if a["tool_name"] != "terminate"]
+
+            results = await asyncio.gather(*[
+                loop.run_in_executor(executor, run_tool, tool_functions, action)
+                for action in pending
+            ])
+            for action, result in zip(pending, results):
+                memory.append_tool_result(action, result)
+
+            if terminate_action:
+                return {"final": terminate_action["args"].get("message", ""), "iterations": iterations, "memory": memory.history}
+
+    return {"final": None, "iterations": iterations, "memory": memory.history}
+
+
+async def run_tasks(user_tasks: List[str], tools: List[Dict], tool_functions: Dict[str, Callable],
+                    agent_rules: List[Dict], concurrency: int = DEFAULT_CONCURRENCY,
+                    max_workers: int = DEFAULT_MAX_WORKERS, **agent_kwargs) -> List[Dict[str, Any]]:
+    """
+    Aja useita toisistaan riippumattomia tehtäviä samassa tapahtumasilmukassa.
+
+    Args:
+        user_tasks (List[str]): Suoritettavat tehtävät.
+        tools, tool_functions, agent_rules: Kuten run_agent_async-funktiossa.
+        concurrency (int): Kuinka monta tehtävää saa olla käynnissä yhtä aikaa.
+        max_workers (int): Työkalujen säiejoukon koko.
+        **agent_kwargs: Välitetään run_agent_async-funktiolle.
+
+    Returns:
+        List[Dict[str, Any]]: Tehtävien tulokset samassa järjestyksessä kuin tehtävät.
+        Epäonnistuneen tehtävän tuloksessa on "error"-avain.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        async def run_one(user_task: str) -> Dict[str, Any]:
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result = await run_agent_async(user_task, tools, tool_functions, agent_rules,
+                                                   executor, **agent_kwargs)
+                except Exception as e:
+                    result = {"final": None, "iterations": 0, "error": str(e)}
+                result["seconds"] = time.perf_counter() - start
+                return result
+
+        return await asyncio.gather(*[run_one(user_task) for user_task in user_tasks])
+
+
+def report_throughput(results: List[Dict[str, Any]], elapsed: float) -> Optional[float]:
+    """
+    Tulosta tehtävien läpäisy (tehtävää sekunnissa) ja palauta se.
+
+    Args:
+        results (List[Dict[str, Any]]): run_tasks-funktion palauttamat tulokset.
+        elapsed (float): Koko ajon kesto sekunteina.
+
+    Returns:
+        Optional[float]: Tehtävää sekunnissa tai None, jos aikaa ei kulunut.
+    """
+    failed = sum(1 for result in results if "error" in result)
+    throughput = len(results) / elapsed if elapsed > 0 else None
+    print(f"Tehtäviä: {len(results)} (epäonnistui {failed})")
+    print(f"Kesto: {elapsed:.2f} s")
+    if throughput is not None:
+        print(f"Läpäisy: {throughput:.1f} tehtävää/s")
+    return throughput
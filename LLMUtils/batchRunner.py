@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+from typing import Any, Dict, List, Set
+
+from asyncAgent import DEFAULT_CONCURRENCY, run_agent_async
+from toolCalls import DEFAULT_MAX_WORKERS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READER_AGENT = os.path.join(REPO_ROOT, "PractiveExercises", "Reader_Agent", "readerAgent.py")
+TOOLS_AGENT = os.path.join(REPO_ROOT, "WithFunctionsAgent", "agentWithTools.py")
+
+
+def load_module(path: str) -> ModuleType:
+    """Lataa skripti moduulina sen tiedostopolusta."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_toolset() -> Dict[str, Any]:
+    """
+    Kokoa eräajon työkalut agenttiskripteistä.
+
+    list_files, read_file ja terminate tulevat lukija-agentilta ja update_json_file
+    työkaluagentilta, joten eräajo käyttää täsmälleen samoja funktioita ja kuvauksia.
+
+    Returns:
+        Dict[str, Any]: Avaimet "tools", "tool_functions" ja "agent_rules".
+    """
+    reader = load_module(READER_AGENT)
+    writer = load_module(TOOLS_AGENT)
+
+    update_schema = next(tool for tool in writer.tools if tool["function"]["name"] == "update_json_file")
+    agent_rules = [{
+        "role": "system",
+        "content": reader.agent_rules[0]["content"]
+        + "Jos tehtävä pyytää muokkaamaan JSON-tiedostoa, käytä 'update_json_file' -työkalua.\n"
+    }]
+    return {
+        "tools": reader.tools + [update_schema],
+        "tool_functions": {**reader.tool_functions, "update_json_file": writer.update_json_file},
+        "agent_rules": agent_rules,
+    }
+
+
+def load_tasks(path: str) -> List[Dict[str, str]]:
+    """
+    Lue tehtävät JSONL-tiedostosta.
+
+    Rivi voi olla pelkkä merkkijono tai objekti {"id": ..., "task": ...}.
+    Ilman tunnistetta tehtävän tunnisteeksi tulee sen rivinumero.
+
+    Args:
+        path (str): Tehtävätiedoston polku.
+
+    Returns:
+        List[Dict[str, str]]: Tehtävät muodossa {"id", "task"}.
+    """
+    tasks = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {"task": entry}
+            tasks.append({"id": str(entry.get("id", line_number)), "task": entry["task"]})
+    return tasks
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """
+    Palauta niiden tehtävien tunnisteet, jotka on jo suoritettu onnistuneesti.
+
+    Epäonnistuneet tehtävät ajetaan jatkettaessa uudelleen.
+
+    Args:
+        output_path (str): Tulostiedoston polku.
+
+    Returns:
+        Set[str]: Valmiiden tehtävien tunnisteet.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    with open(output_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Keskeytetyn ajon viimeinen rivi voi olla kesken
+                continue
+            if "error" in record:
+                done.discard(record["id"])
+            else:
+                done.add(record["id"])
+    return done
+
+
+async def run_batch(tasks: List[Dict[str, str]], output_path: str, toolset: Dict[str, Any],
+                    concurrency: int = DEFAULT_CONCURRENCY, max_workers: int = DEFAULT_MAX_WORKERS,
+                    **agent_kwargs) -> List[Dict[str, Any]]:
+    """
+    Aja tehtävät rinnakkain ja kirjoita jokainen tulos heti valmistuttuaan.
+
+    Args:
+        tasks (List[Dict[str, str]]): Suoritettavat tehtävät muodossa {"id", "task"}.
+        output_path (str): JSONL-tiedosto, johon tulokset lisätään.
+        toolset (Dict[str, Any]): build_toolset-funktion palauttamat työkalut.
+        concurrency (int): Kuinka monta tehtävää saa olla käynnissä yhtä aikaa.
+        max_workers (int): Työkalujen säiejoukon koko.
+        **agent_kwargs: Välitetään run_agent_async-funktiolle, esim. model tai api_base.
+
+    Returns:
+        List[Dict[str, Any]]: Tulokset valmistumisjärjestyksessä.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    records = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            open(output_path, "a", encoding="utf-8") as output:
+        async def run_one(task: Dict[str, str]) -> Dict[str, Any]:
+            async with semaphore:
+                start = time.perf_counter()
+                record = {"id": task["id"], "task": task["task"]}
+                try:
+                    result = await run_agent_async(task["task"], toolset["tools"], toolset["tool_functions"],
+                                                   toolset["agent_rules"], executor, **agent_kwargs)
+                    record.update(final=result["final"], iterations=result["iterations"])
+                except Exception as e:
+                    record.update(final=None, iterations=0, error=str(e))
+                record["seconds"] = time.perf_counter() - start
+                return record
+
+        for finished in asyncio.as_completed([run_one(task) for task in tasks]):
+            record = await finished
+            output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            output.flush()
+            status = f"virhe: {record['error']}" if "error" in record else f"{record['iterations']} iteraatiota"
+            print(f"[{record['id']}] {record['seconds']:.2f} s, {status}")
+            records.append(record)
+
+    return records
+
+
+def print_summary(records: List[Dict[str, Any]], skipped: int, elapsed: float) -> None:
+    """Tulosta eräajon viive- ja iteraatiotilastot."""
+    print(f"\nTehtäviä: {len(records)} (epäonnistui {sum(1 for r in records if 'error' in r)}, "
+          f"ohitettu valmiina {skipped})")
+    if not records:
+        return
+    seconds = [record["seconds"] for record in records]
+    iterations = [record["iterations"] for record in records]
+    print(f"Viive: keskiarvo {statistics.mean(seconds):.2f} s, mediaani {statistics.median(seconds):.2f} s, "
+          f"maksimi {max(seconds):.2f} s")
+    print(f"Iteraatiot: keskiarvo {statistics.mean(iterations):.1f}, maksimi {max(iterations)}")
+    if elapsed > 0:
+        print(f"Kesto: {elapsed:.2f} s, läpäisy {len(records) / elapsed:.1f} tehtävää/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aja agentin tehtävät eräajona JSONL-tiedostosta")
+    parser.add_argument("tasks", help="JSONL-tiedosto, jonka rivit ovat tehtäviä tai {\"id\", \"task\"} -objekteja")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL-tiedosto tuloksille")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument("--model", default="openai/gpt-4o")
+    parser.add_argument("--max-iterations", type=int, default=10)
+    parser.add_argument("--api-base", help="vaihtoehtoinen LLM-palvelin, esim. mockLLMServer")
+    parser.add_argument("--no-resume", action="store_true", help="aja myös jo valmiit tehtävät uudelleen")
+    args = parser.parse_args()
+
+    all_tasks = load_tasks(args.tasks)
+    done = set() if args.no_resume else completed_ids(args.output)
+    pending = [task for task in all_tasks if task["id"] not in done]
+
+    agent_kwargs = {"model": args.model, "max_iterations": args.max_iterations}
+    if args.api_base:
+        agent_kwargs["api_base"] = args.api_base
+
+    start = time.perf_counter()
+    results = asyncio.run(run_batch(pending, args.output, build_toolset(), concurrency=args.concurrency,
+                                    max_workers=args.max_workers, **agent_kwargs))
+    print_summary(results, len(all_tasks) - len(pending), time.perf_counter() - start)
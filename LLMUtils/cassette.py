@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import threading
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, Iterator, List
+
+from litellm import ModelResponse, ModelResponseStream
+
+from llmCache import IGNORED_PARAMS, make_cache_key
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMissError(KeyError):
+    """Toistotilassa pyynnölle ei löytynyt tallennettua vastausta."""
+
+
+class Cassette:
+    """
+    Tallentaa LLM-kutsut kasettitiedostoon ja toistaa ne ilman verkkoa.
+
+    Kasetti on JSONL-tiedosto, jonka jokainen rivi sisältää pyynnön, vastauksen
+    (tai striimatut palat) ja tallennushetken viiveen. Toistossa vastaus haetaan
+    pyynnön sisällöstä lasketulla avaimella, joten agentin ajo on deterministinen.
+    Samalla pyynnöllä tallennetut vastaukset toistetaan tallennusjärjestyksessä.
+    """
+    def __init__(self, path: str, mode: str = REPLAY, llm: Callable = None, replay_latency: bool = False):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Tuntematon kasettitila: {mode}")
+        if mode == RECORD and llm is None:
+            raise ValueError("Tallennustila tarvitsee LLM-kutsun, jonka vastaukset tallennetaan.")
+
+        self.path = path
+        self.mode = mode
+        self.llm = llm
+        self.replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+
+        if mode == REPLAY:
+            self._load()
+        else:
+            # Uusi tallennus korvaa vanhan kasetin
+            open(path, "w", encoding="utf-8").close()
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+
+    def __call__(self, **request) -> Any:
+        """Sama kutsumuoto kuin litellm:n completion-funktiolla."""
+        key = make_cache_key(**request)
+        if self.mode == RECORD:
+            return self._record(key, request)
+        return self._replay(key, request)
+
+    def _record(self, key: str, request: Dict[str, Any]) -> Any:
+        # Agenttisilmukan viestilista kasvaa kutsun jälkeen, joten otetaan siitä kopio
+        request = {**request, "messages": list(request.get("messages", []))}
+        start = time.perf_counter()
+        response = self.llm(**request)
+        if request.get("stream"):
+            return self._record_stream(key, request, response, start)
+
+        self._write({"key": key, "request": request, "response": response.model_dump(),
+                     "latency": time.perf_counter() - start})
+        return response
+
+    def _record_stream(self, key: str, request: Dict[str, Any], stream: Iterator, start: float) -> Iterator:
+        chunks = []
+        for chunk in stream:
+            chunks.append({"offset": time.perf_counter() - start, "chunk": chunk.model_dump()})
+            yield chunk
+        self._write({"key": key, "request": request, "chunks": chunks, "latency": time.perf_counter() - start})
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        entry["request"] = {k: v for k, v in entry["request"].items() if k not in IGNORED_PARAMS}
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+
+    def _replay(self, key: str, request: Dict[str, Any]) -> Any:
+        with self._lock:
+            queue = self._entries.get(key)
+            if not queue:
+                raise CassetteMissError(f"Kasetista {self.path} ei löytynyt vastausta pyynnölle {key[:12]}")
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+
+        if "chunks" in entry:
+            return self._replay_stream(entry["chunks"])
+        if self.replay_latency:
+            time.sleep(entry["latency"])
+        return ModelResponse(**entry["response"])
+
+    def _replay_stream(self, chunks: List[Dict[str, Any]]) -> Iterator[ModelResponseStream]:
+        start = time.perf_counter()
+        for item in chunks:
+            if self.replay_latency:
+                time.sleep(max(0.0, item["offset"] - (time.perf_counter() - start)))
+            yield ModelResponseStream(**item["chunk"])
+
+
+def cassette_from_env(llm: Callable) -> Callable:
+    """
+    Kääri LLM-kutsu kasettiin ympäristömuuttujien perusteella.
+
+    LLM_CASSETTE=polku ottaa kasetin käyttöön, LLM_CASSETTE_MODE=record|replay
+    valitsee tilan (oletus replay) ja LLM_CASSETTE_LATENCY=1 toistaa tallennetut viiveet.
+    Ilman LLM_CASSETTE-muuttujaa palautetaan alkuperäinen kutsu.
+    """
+    path = os.getenv("LLM_CASSETTE")
+    if not path:
+        return llm
+    return Cassette(
+        path,
+        mode=os.getenv("LLM_CASSETTE_MODE", REPLAY),
+        llm=llm,
+        replay_latency=os.getenv("LLM_CASSETTE_LATENCY", "0").lower() in ("1", "on", "true", "yes")
+    )
@@ -0,0 +1,132 @@
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from litellm import token_counter
+
+from llmCache import KeyedMessage
+from tracing import span
+
+# Malli, jonka tokenisoijalla viestit lasketaan
+DEFAULT_MODEL = "openai/gpt-4o"
+
+
+def count_message_tokens(message: Dict[str, str], model: str = DEFAULT_MODEL) -> int:
+    """Laske yhden viestin tokenit (sisältö ja viestin rakenne)."""
+    return token_counter(model=model, messages=[message])
+
+
+class ConversationBuffer:
+    """
+    Agentin keskusteluhistoria, johon viestit vain lisätään.
+
+    Jokainen viesti serialisoidaan ja sen tokenit lasketaan vain kerran, kun se
+    lisätään. LLM:lle lähetettävä ikkuna pidetään valmiina, joten iteraatio maksaa
+    uusien viestien käsittelyn ja ikkunan viitteiden kopioinnin verran eikä koko
+    historiaa tarvitse serialisoida tai tokenisoida uudelleen. Viestien välimuistitiivisteet lasketaan samalla kertaa
+    (KeyedMessage), joten cached_completion ei serialisoi historiaa joka kutsulla.
+
+    Jos tokenibudjetti ylittyy, vanhimmat viestit pudotetaan pyynnöstä, mutta ne
+    jäävät historiaan. Järjestelmäviestit ja pinned_groups ensimmäistä viestiryhmää
+    (oletuksena käyttäjän tehtävä) säilyvät aina, joten agentti ei kadota
+    tavoitettaan. Toiminto ja sen tulos pudotetaan aina yhdessä, joten pyynnössä ei
+    ole tulosta ilman toimintoa.
+    """
+    def __init__(self, system_messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                 token_count: Callable[[Dict[str, str]], int] = count_message_tokens, pinned_groups: int = 1):
+        self.max_tokens = max_tokens
+        self.pinned_groups = pinned_groups
+        self._token_count = token_count
+        self._system_count = len(system_messages)
+
+        # Kaikki viestit lisäysjärjestyksessä ja niiden tokenimäärät
+        self._history: List[Dict[str, str]] = []
+        self._history_tokens: List[int] = []
+        # Viestiryhmien (yksittäinen viesti tai toiminto ja sen tulos) alkuindeksit historiassa
+        self._group_starts: List[int] = []
+        # Vanhin ikkunassa oleva viestiryhmä, jonka saa pudottaa
+        self._window_group = pinned_groups
+        self._dropped = 0
+
+        # LLM:lle lähetettävä ikkuna: järjestelmäviestit + budjettiin mahtuva historia
+        self._window: List[Dict[str, str]] = list(system_messages)
+        self._system_tokens = sum(token_count(message) for message in system_messages)
+        self._window_tokens = self._system_tokens
+
+    def append(self, role: str, content: Any) -> Dict[str, str]:
+        """
+        Lisää viesti historiaan.
+
+        Args:
+            role (str): Viestin rooli ("user" tai "assistant").
+            content (Any): Viestin sisältö. Muut kuin merkkijonot serialisoidaan JSONiksi.
+
+        Returns:
+            Dict[str, str]: Lisätty viesti.
+        """
+        self._group_starts.append(len(self._history))
+        message = self._add(role, content)
+        self._enforce_budget()
+        return message
+
+    def append_tool_result(self, action: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """Lisää toiminto ja sen tulos samassa muodossa kuin agenttisilmukat ennenkin."""
+        self._group_starts.append(len(self._history))
+        self._add("assistant", {"tool_name": action["tool_name"], "args": action["args"]})
+        self._add("user", result)
+        self._enforce_budget()
+
+    def _add(self, role: str, content: Any) -> Dict[str, str]:
+        with span("history", role=role) as s:
+            if not isinstance(content, str):
+                content = json.dumps(content)
+            message = KeyedMessage(role=role, content=content)
+            tokens = self._token_count(message)
+            s.set(bytes=len(content), tokens=tokens)
+
+        self._history.append(message)
+        self._history_tokens.append(tokens)
+        self._window.append(message)
+        self._window_tokens += tokens
+        return message
+
+    def _enforce_budget(self) -> None:
+        """Pudota vanhimmat viestiryhmät ikkunasta, kunnes tokenibudjetti riittää."""
+        if self.max_tokens is None:
+            return
+        # Uusin ryhmä pidetään aina mukana, vaikka se yksin ylittäisi budjetin
+        dropped = 0
+        while self._window_tokens > self.max_tokens and self._window_group < len(self._group_starts) - 1:
+            start = self._group_starts[self._window_group]
+            end = self._group_starts[self._window_group + 1]
+            self._window_tokens -= sum(self._history_tokens[start:end])
+            self._window_group += 1
+            dropped += end - start
+        if dropped:
+            # Pudotetut viestit poistetaan yhdellä viipaleella eikä viesti kerrallaan
+            first = self._system_count + self._group_starts[self.pinned_groups]
+            del self._window[first:first + dropped]
+            self._dropped += dropped
+
+    def messages(self) -> List[Dict[str, str]]:
+        """
+        Palauta LLM:lle lähetettävät viestit.
+
+        Palautettu lista on kopio, joten myöhemmät lisäykset ja pudotukset eivät muuta
+        sitä (esim. kasetin tallentama pyyntö). Viestejä itseään ei saa muokata.
+        """
+        return list(self._window)
+
+    @property
+    def history(self) -> List[Dict[str, str]]:
+        """Koko keskusteluhistoria ilman järjestelmäviestejä."""
+        return self._history
+
+    @property
+    def total_tokens(self) -> int:
+        """Seuraavan pyynnön viestien yhteenlaskettu tokenimäärä."""
+        return self._window_tokens
+
+    @property
+    def dropped(self) -> int:
+        """Kuinka monta vanhinta viestiä on pudotettu pyynnöstä budjetin takia."""
+        return self._dropped
@@ -0,0 +1,782 @@
+import os
+import re
+import mmap
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+# Tätä suuremmat tiedostot luetaan muistikuvauksen (mmap) kautta
+MMAP_THRESHOLD = 256 * 1024
+# Yhdestä tiedostosta palautetaan korkeintaan näin monta tavua
+MAX_FILE_BYTES = 1024 * 1024
+# Koko kansiosta palautetaan korkeintaan näin monta tavua
+MAX_TOTAL_BYTES = 16 * 1024 * 1024
+# Binääritunnistukseen katsotaan tiedoston alusta näin monta tavua
+BINARY_SNIFF_BYTES = 8192
+DEFAULT_READ_WORKERS = 8
+
+
+def is_binary(sample: bytes) -> bool:
+    """Tiedosto tulkitaan binääriksi, jos sen alussa on nollatavu (sama sääntö kuin gitillä)."""
+    return b"\0" in sample
+
+
+def read_text(path: str, max_bytes: int = MAX_FILE_BYTES,
+              mmap_threshold: int = MMAP_THRESHOLD) -> Optional[str]:
+    """
+    Lue tiedoston alusta korkeintaan max_bytes tavua tekstinä.
+
+    Pienet tiedostot luetaan tavallisesti, suuret mmap:n kautta, jolloin vain
+    tarvittava alku sivutetaan muistiin eikä koko tiedostoa kopioida.
+
+    Args:
+        path (str): Luettavan tiedoston polku.
+        max_bytes (int): Palautettavien tavujen enimmäismäärä.
+        mmap_threshold (int): Koko, josta alkaen käytetään mmap-lukua.
+
+    Returns:
+        Optional[str]: Tiedoston sisältö (katkaistuna tarvittaessa) tai None binääritiedostolle.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        if size >= mmap_threshold:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if is_binary(mapped[:BINARY_SNIFF_BYTES]):
+                    return None
+                data = mapped[:max_bytes]
+        else:
+            data = file.read(max_bytes)
+            if is_binary(data[:BINARY_SNIFF_BYTES]):
+                return None
+
+    text = data.decode("utf-8", errors="replace")
+    if size > max_bytes:
+        text += f"\n...[katkaistu: {size - max_bytes} tavua jätetty pois]"
+    return text
+
+
+# Tiivisteet luetaan tämän kokoisina paloina, joten suurikaan tiedosto ei vie muistia
+HASH_CHUNK_BYTES = 1024 * 1024
+# Kuinka monen tiedoston tiiviste pidetään muistissa
+HASH_CACHE_SIZE = 100_000
+
+
+class HashCache:
+    """
+    Tiedostosisältöjen tiivisteet avaimella (polku, mtime, koko).
+
+    Muuttumattoman tiedoston tiiviste lasketaan vain kerran; muuttunut tiedosto saa
+    uuden mtimen tai koon, jolloin vanha merkintä ei enää täsmää. Vanhimmat merkinnät
+    poistetaan, kun raja täyttyy.
+    """
+    def __init__(self, max_entries: int = HASH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int, int, Optional[int]], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def digest(self, path: str, stat: Optional[os.stat_result] = None, max_bytes: Optional[int] = None) -> str:
+        """
+        Palauta tiedoston sisällön BLAKE2b-tiiviste, välimuistista jos mahdollista.
+
+        Jos max_bytes on annettu, tiivistetään vain tiedoston alku; samankokoisilla
+        tiedostoilla sama alku riittää, kun sisällöstä käytetään vain max_bytes tavua.
+        """
+        stat = stat or os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, max_bytes)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        hasher = hashlib.blake2b(digest_size=16)
+        remaining = stat.st_size if max_bytes is None else min(max_bytes, stat.st_size)
+        with open(path, "rb") as file:
+            while remaining > 0 and (chunk := file.read(min(HASH_CHUNK_BYTES, remaining))):
+                hasher.update(chunk)
+                remaining -= len(chunk)
+        digest = hasher.hexdigest()
+
+        with self._lock:
+            self._entries[key] = digest
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return digest
+
+
+_hash_cache = HashCache()
+
+
+class DuplicateFinder:
+    """
+    Tunnistaa tiedostot, joiden sisältö on sama kuin aiemmin nähdyllä tiedostolla.
+
+    Tiiviste lasketaan vasta, kun kaksi tiedostoa on samankokoisia, joten useimmat
+    tiedostot eivät koskaan tarvitse tiivistettä. Ensimmäinen nähty polku on kanoninen.
+    Jos executor annetaan, tiivisteet lasketaan sen säikeissä: submit() kirjaa tiedoston
+    heti, ja resolve() kutsutaan myöhemmin samassa järjestyksessä kuin submit().
+
+    Args:
+        hash_cache (HashCache): Tiivisteiden välimuisti.
+        max_bytes (Optional[int]): Tiivistetään vain tiedoston alku (esim. luettava tavuraja).
+        executor (Optional[ThreadPoolExecutor]): Säiejoukko tiivisteille, None = kutsujan säikeessä.
+    """
+    def __init__(self, hash_cache: HashCache = _hash_cache, max_bytes: Optional[int] = None,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.hash_cache = hash_cache
+        self.max_bytes = max_bytes
+        self._executor = executor
+        # Koko -> ensimmäinen sen kokoinen polku ja sen tiivisteen future (None, kunnes tarvitaan)
+        self._first: Dict[int, Tuple[str, Optional[Future]]] = {}
+        self._by_digest: Dict[Tuple[int, str], str] = {}
+
+    def _digest(self, path: str) -> Optional[str]:
+        try:
+            return self.hash_cache.digest(path, max_bytes=self.max_bytes)
+        except OSError:
+            return None
+
+    def _submit(self, path: str) -> Future:
+        if self._executor is not None:
+            return self._executor.submit(self._digest, path)
+        future: Future = Future()
+        future.set_result(self._digest(path))
+        return future
+
+    def submit(self, path: str, size: int) -> Optional[Future]:
+        """Kirjaa tiedosto; palauttaa sen tiivisteen futuren tai None, jos samankokoista ei ole nähty."""
+        first = self._first.get(size)
+        if first is None:
+            self._first[size] = (path, None)
+            return None
+        first_path, first_future = first
+        if first_future is None:
+            # Ensimmäinen samankokoinen tiivistetään vasta nyt, ja vain kerran
+            self._first[size] = (first_path, self._submit(first_path))
+        return self._submit(path)
+
+    def resolve(self, path: str, size: int, future: Optional[Future]) -> Optional[str]:
+        """Palauta kanoninen polku, jos submit()-kutsun tiedoston sisältö on jo nähty, muuten None."""
+        if future is None:
+            return None
+        first_path, first_future = self._first[size]
+        first_digest = first_future.result()
+        if first_digest is not None:
+            self._by_digest.setdefault((size, first_digest), first_path)
+        digest = future.result()
+        if digest is None:
+            return None
+        canonical = self._by_digest.setdefault((size, digest), path)
+        return canonical if canonical != path else None
+
+    def check(self, path: str, size: int) -> Optional[str]:
+        """
+        Kirjaa tiedosto ja palauta sen kanoninen polku, jos sisältö on jo nähty.
+
+        Returns:
+            Optional[str]: Aiemman saman sisällön polku tai None, jos sisältö on uusi.
+        """
+        return self.resolve(path, size, self.submit(path, size))
+
+
+def iter_folder(folder_path: str, max_file_bytes: int = MAX_FILE_BYTES,
+                max_total_bytes: int = MAX_TOTAL_BYTES, mmap_threshold: int = MMAP_THRESHOLD,
+                max_workers: int = DEFAULT_READ_WORKERS,
+                aliases: Optional[Dict[str, List[str]]] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Lue kansion tiedostot rinnakkain ja palauta ne sitä mukaa kuin ne valmistuvat.
+
+    Hakemistopuun läpikäynti ja lukeminen etenevät yhtä aikaa: kutsuja saa ensimmäiset
+    tiedostot jo ennen kuin koko puu on käyty läpi. Keskeneräisiä lukuja on kerrallaan
+    korkeintaan muutama työntekijää kohden, joten muistinkäyttö pysyy rajattuna.
+    Binääritiedostot ohitetaan. Tiedostot palautetaan läpikäyntijärjestyksessä.
+
+    Jos aliases-sanakirja annetaan, sisällöltään identtiset tiedostot luetaan ja
+    palautetaan vain kerran: kaksoiskappaleiden polut kirjataan sanakirjaan
+    ensimmäisen kappaleen polun alle.
+
+    Args:
+        folder_path (str): Hakemisto, jonka tiedostot luetaan.
+        max_file_bytes (int): Yhden tiedoston tavuraja; pidemmät katkaistaan.
+        max_total_bytes (int): Kaikkien tiedostojen yhteinen tavuraja; sen täytyttyä luku lopetetaan.
+        mmap_threshold (int): Koko, josta alkaen tiedosto luetaan mmap:n kautta.
+        max_workers (int): Lukusäikeiden määrä.
+        aliases (Optional[Dict[str, List[str]]]): Kaksoiskappaleiden kirjanpito, None = ei deduplikointia.
+
+    Yields:
+        Tuple[str, str]: Tiedostopolku ja sen sisältö (tai virheilmoitus).
+    """
+    budget = max_total_bytes
+    # (polku, koko, varattu budjetti, sisällön future, tiivisteen future)
+    pending: Deque[Tuple[str, int, int, Future, Optional[Future]]] = deque()
+
+    def read(path: str, limit: int) -> Optional[str]:
+        try:
+            return read_text(path, limit, mmap_threshold)
+        except Exception as e:
+            return f"Virhe: {str(e)}"
+
+    def drain_one() -> Iterator[Tuple[str, str]]:
+        """Palauta vanhin keskeneräinen tiedosto; ohitetun tiedoston varaama budjetti palautetaan."""
+        nonlocal budget
+        path, size, limit, future, digest_future = pending.popleft()
+        canonical = duplicates.resolve(path, size, digest_future) if duplicates is not None else None
+        if canonical is not None:
+            future.cancel()
+            budget += limit
+            aliases.setdefault(canonical, []).append(path)
+            return
+        content = future.result()
+        if content is None:
+            # Binääritiedosto ei kuluta budjettia
+            budget += limit
+            return
+        yield path, content
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Tiivisteet lasketaan samoissa säikeissä; vain tiedoston alku, koska vain se palautetaan
+        duplicates = DuplicateFinder(max_bytes=max_file_bytes, executor=executor) if aliases is not None else None
+        try:
+            for root, _, files in os.walk(folder_path):
+                for file_name in files:
+                    # Keskeneräiset binääritiedostot ja kaksoiskappaleet voivat vielä palauttaa budjettia
+                    while budget <= 0 and pending:
+                        yield from drain_one()
+                    if budget <= 0:
+                        break
+                    path = os.path.join(root, file_name)
+                    try:
+                        size = os.path.getsize(path)
+                    except OSError as e:
+                        yield path, f"Virhe: {str(e)}"
+                        continue
+
+                    digest_future = duplicates.submit(path, size) if duplicates is not None else None
+                    # Varataan budjetti jo lähetettäessä, jotta rinnakkaiset luvut eivät ylitä sitä
+                    limit = min(size, max_file_bytes, budget)
+                    budget -= limit
+                    pending.append((path, size, limit, executor.submit(read, path, limit), digest_future))
+
+                    while len(pending) >= max_workers * 4:
+                        yield from drain_one()
+                if budget <= 0 and not pending:
+                    break
+
+            while pending:
+                yield from drain_one()
+        finally:
+            # Jos kutsuja lopettaa kesken, aloittamattomat luvut perutaan
+            for _, _, _, future, digest_future in pending:
+                future.cancel()
+                if digest_future is not None:
+                    digest_future.cancel()
+
+
+# Listaukset ohittavat aina nämä, vaikka .gitignore-tiedostoa ei olisi
+DEFAULT_IGNORES = [".git/", "__pycache__/", ".search_index/"]
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+
+def glob_to_regex(pattern: str) -> re.Pattern:
+    """
+    Käännä gitignore-tyylinen glob säännölliseksi lausekkeeksi.
+
+    "*" ja "?" eivät ylitä hakemistorajaa, "**" ylittää. Polut ovat aina /-erotteisia.
+    """
+    regex, i = "", 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                regex += "[" + pattern[i + 1:end].replace("!", "^", 1) + "]"
+                i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return re.compile(regex + r"\Z")
+
+
+class IgnoreRules:
+    """
+    .gitignore-sääntöjen osajoukko: kommentit, !-negaatio, /-loppuiset vain hakemistoille,
+    /-alkuiset ja /-merkin sisältävät ankkuroidaan sääntötiedoston hakemistoon, muut
+    verrataan pelkkään nimeen millä tahansa tasolla. Myöhempi sääntö voittaa aiemman.
+    """
+    def __init__(self):
+        # (perushakemisto, regex, negaatio, vain hakemistoille, ankkuroitu)
+        self.rules: List[Tuple[str, re.Pattern, bool, bool, bool]] = []
+
+    def add(self, patterns: List[str], base: str = "") -> "IgnoreRules":
+        """Lisää säännöt; base on sääntöjen hakemisto suhteessa listattavaan juureen."""
+        for line in patterns:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            self.rules.append((base, glob_to_regex(line.lstrip("/")), negate, dir_only, anchored))
+        return self
+
+    def add_file(self, path: str, base: str = "") -> "IgnoreRules":
+        """Lisää säännöt .gitignore-tiedostosta, jos se on olemassa."""
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as file:
+                return self.add(file.readlines(), base)
+        except OSError:
+            return self
+
+    def copy(self) -> "IgnoreRules":
+        rules = IgnoreRules()
+        rules.rules = list(self.rules)
+        return rules
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """Tarkista, ohitetaanko juuren suhteen annettu /-erotteinen polku."""
+        result = False
+        for base, regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                path = rel_path[len(base) + 1:]
+            else:
+                path = rel_path
+            target = path if anchored else path.rsplit("/", 1)[-1]
+            if regex.match(target):
+                result = not negate
+        return result
+
+
+def _matches_any(regexes: List[re.Pattern], rel_path: str) -> bool:
+    name = rel_path.rsplit("/", 1)[-1]
+    return any(regex.match(rel_path) or regex.match(name) for regex in regexes)
+
+
+def iter_files(directory: str = ".", include: Optional[List[str]] = None,
+               exclude: Optional[List[str]] = None, max_depth: Optional[int] = None,
+               use_gitignore: bool = True, after: Optional[str] = None) -> Iterator[str]:
+    """
+    Käy hakemistopuu läpi os.scandir-kutsuilla ja palauta tiedostopolut yksi kerrallaan.
+
+    Järjestys on deterministinen (nimet aakkosjärjestyksessä, alihakemisto käydään läpi
+    omalla kohdallaan), joten läpikäyntiä voi jatkaa mistä tahansa polusta. Koko listaa
+    ei rakenneta muistiin.
+
+    Args:
+        directory (str): Listattava hakemisto.
+        include (Optional[List[str]]): Globit, joista jonkin tiedoston on täsmättävä (esim. "*.py").
+        exclude (Optional[List[str]]): Globit, joihin täsmäävät tiedostot ja hakemistot ohitetaan.
+        max_depth (Optional[int]): Kuinka syvälle alihakemistoihin mennään, 0 = vain juuri.
+        use_gitignore (bool): Noudatetaanko .gitignore-tiedostoja.
+        after (Optional[str]): Jatka tämän juuren suhteen annetun polun jälkeen.
+
+    Yields:
+        str: Tiedostopolku muodossa os.path.join(directory, suhteellinen_polku).
+    """
+    include_res = [glob_to_regex(pattern) for pattern in include or []]
+    exclude_res = [glob_to_regex(pattern) for pattern in exclude or []]
+    after_parts = tuple(after.replace(os.sep, "/").split("/")) if after else None
+
+    rules = IgnoreRules().add(DEFAULT_IGNORES)
+    if use_gitignore:
+        rules.add_file(os.path.join(directory, ".gitignore"))
+
+    def walk(parts: Tuple[str, ...], depth: int, rules: IgnoreRules) -> Iterator[str]:
+        path = os.path.join(directory, *parts)
+        try:
+            with os.scandir(path) as scan:
+                entries = sorted(scan, key=lambda entry: entry.name)
+        except OSError:
+            return
+        if parts and use_gitignore and any(entry.name == ".gitignore" for entry in entries):
+            rules = rules.copy().add_file(os.path.join(path, ".gitignore"), "/".join(parts))
+
+        for entry in entries:
+            entry_parts = parts + (entry.name,)
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if after_parts is not None and entry_parts <= after_parts and \
+                    not (is_dir and after_parts[:len(entry_parts)] == entry_parts):
+                # Tämä haara on jo palautettu aiemmilla sivuilla
+                continue
+
+            rel_path = "/".join(entry_parts)
+            if rules.ignored(rel_path, is_dir) or _matches_any(exclude_res, rel_path):
+                continue
+            if is_dir:
+                if max_depth is None or depth < max_depth:
+                    yield from walk(entry_parts, depth + 1, rules)
+            elif entry.is_file() and (not include_res or _matches_any(include_res, rel_path)):
+                yield os.path.join(directory, *entry_parts)
+
+    yield from walk((), 0, rules)
+
+
+def group_duplicates(paths: List[str]) -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    Ryhmittele sisällöltään identtiset tiedostot.
+
+    Args:
+        paths (List[str]): Tiedostopolut.
+
+    Returns:
+        Tuple[List[str], Dict[str, List[str]]]: Uniikit polut alkuperäisessä järjestyksessä
+        sekä kaksoiskappaleet kanonisen polun alla.
+    """
+    finder = DuplicateFinder()
+    unique, aliases = [], {}
+    for path in paths:
+        try:
+            canonical = finder.check(path, os.path.getsize(path))
+        except OSError:
+            canonical = None
+        if canonical is None:
+            unique.append(path)
+        else:
+            aliases.setdefault(canonical, []).append(path)
+    return unique, aliases
+
+
+def list_files_page(directory: str = ".", include: Optional[List[str]] = None,
+                    exclude: Optional[List[str]] = None, max_depth: Optional[int] = None,
+                    cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE,
+                    dedupe: bool = True) -> Dict[str, Any]:
+    """
+    Palauta yksi sivu hakemiston tiedostolistauksesta.
+
+    Seuraava sivu haetaan antamalla edellisen sivun next_cursor. Kursori on viimeisen
+    läpikäydyn tiedoston polku, joten sivutus kestää myös sivujen välillä lisätyt tiedostot.
+    Deduplikointi tehdään sivun sisällä: kaksoiskappaleet siirtyvät "aliases"-kenttään.
+
+    Args:
+        directory, include, exclude, max_depth: Kuten iter_files-funktiossa.
+        cursor (Optional[str]): Edellisen sivun next_cursor, None = ensimmäinen sivu.
+        page_size (int): Sivulla läpikäytävien tiedostojen enimmäismäärä, 1..MAX_PAGE_SIZE.
+        dedupe (bool): Ryhmitelläänkö sisällöltään identtiset tiedostot.
+
+    Returns:
+        Dict[str, Any]: {"files": [...], "next_cursor": str tai None} ja dedupe-tilassa
+        kaksoiskappaleiden löytyessä {"aliases": {kanoninen: [kaksoiskappaleet]}}.
+
+    Raises:
+        ValueError: Jos page_size on alle 1.
+    """
+    if page_size < 1:
+        raise ValueError(f"page_size pitää olla vähintään 1, saatiin {page_size}")
+    page_size = min(page_size, MAX_PAGE_SIZE)
+    files, next_cursor = [], None
+    for path in iter_files(directory, include, exclude, max_depth, after=cursor):
+        if len(files) == page_size:
+            next_cursor = os.path.relpath(files[-1], directory).replace(os.sep, "/")
+            break
+        files.append(path)
+
+    page: Dict[str, Any] = {"files": files}
+    if dedupe:
+        page["files"], aliases = group_duplicates(files)
+        if aliases:
+            page["aliases"] = aliases
+    page["next_cursor"] = next_cursor
+    return page
+
+
+# Työkalun kuvaus LLM:lle; agentit lisäävät tämän tools-listaansa
+LIST_FILES_PARAMETERS = {
+    "type": "object",
+    "properties": {
+        "directory": {"type": "string", "description": "Listattava hakemisto, oletus \".\"."},
+        "include": {"type": "array", "items": {"type": "string"},
+                    "description": "Globit, joihin tiedostojen on täsmättävä, esim. [\"*.py\"]."},
+        "exclude": {"type": "array", "items": {"type": "string"},
+                    "description": "Globit, joihin täsmäävät tiedostot ja hakemistot ohitetaan."},
+        "max_depth": {"type": "integer", "description": "Alihakemistojen enimmäissyvyys, 0 = vain hakemisto itse."},
+        "cursor": {"type": "string", "description": "Edellisen sivun next_cursor seuraavan sivun hakemiseen."},
+        "page_size": {"type": "integer", "minimum": 1, "maximum": MAX_PAGE_SIZE,
+                      "description": f"Tiedostoja sivulla, oletus {DEFAULT_PAGE_SIZE}, enintään {MAX_PAGE_SIZE}."}
+    },
+    "required": []
+}
+
+
+# Yhdellä read_file-kutsulla palautetaan oletuksena ja enintään näin monta tavua
+DEFAULT_READ_BYTES = 64 * 1024
+MAX_READ_BYTES = 1024 * 1024
+# head- ja tail-tilojen oletusrivimäärä
+DEFAULT_HEAD_LINES = 50
+# Rivi-indeksiin tallennetaan tavusijainti joka näin monennen rivin alusta
+LINE_CHECKPOINT = 1000
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class LineIndex:
+    """
+    Harva rivi-indeksi: tiedostoittain tavusijainti joka LINE_CHECKPOINT:nnen rivin alusta.
+
+    Indeksi täydentyy sitä mukaa kuin tiedostoa luetaan, joten rivialueen lukeminen voi
+    hypätä lähimpään tunnettuun kohtaan seek-kutsulla sen sijaan että koko alku luettaisiin.
+    Avaimena on (polku, mtime, koko), joten muuttunut tiedosto saa uuden indeksin.
+    """
+    def __init__(self, max_files: int = 1000):
+        self.max_files = max_files
+        self._files: "OrderedDict[Tuple[str, int, int], Dict[int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def checkpoints(self, path: str, stat: os.stat_result) -> Dict[int, int]:
+        """Palauta tiedoston tunnetut rivi -> tavusijainti -parit (rivit 0-pohjaisia)."""
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key not in self._files:
+                self._files[key] = {0: 0}
+                while len(self._files) > self.max_files:
+                    self._files.popitem(last=False)
+            self._files.move_to_end(key)
+            return self._files[key]
+
+
+_line_index = LineIndex()
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def _utf8_complete(data: bytes) -> int:
+    """
+    Palauta pisimmän sellaisen alun pituus, joka ei katkaise monitavuista UTF-8-merkkiä.
+
+    Katsotaan enintään kolme viimeistä tavua: jos niissä alkaa merkki, jonka kaikki
+    tavut eivät mahdu mukaan, alku päättyy ennen sitä.
+    """
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 == 0x80:
+            # Jatkotavu: merkin alku on kauempana
+            continue
+        return len(data) - back if _utf8_length(byte) > back else len(data)
+    return len(data)
+
+
+def _utf8_length(lead: int) -> int:
+    """UTF-8-merkin pituus tavuina sen ensimmäisen tavun perusteella."""
+    return 2 if lead & 0xE0 == 0xC0 else 3 if lead & 0xF0 == 0xE0 else 4 if lead & 0xF8 == 0xF0 else 1
+
+
+def _skip_continuation(data: bytes) -> int:
+    """Palauta ensimmäisen merkin alun sijainti, kun data alkaa keskeltä UTF-8-merkkiä."""
+    start = 0
+    while start < min(3, len(data)) and data[start] & 0xC0 == 0x80:
+        start += 1
+    return start
+
+
+def probe_file(path: str) -> Dict[str, Any]:
+    """Palauta tiedoston koko tavuina ja rivimäärä lukemalla se paloina."""
+    size = os.path.getsize(path)
+    lines, last = 0, b""
+    with open(path, "rb") as file:
+        while chunk := file.read(READ_CHUNK_BYTES):
+            lines += chunk.count(b"\n")
+            last = chunk
+    if last and not last.endswith(b"\n"):
+        lines += 1
+    return {"file": path, "size": size, "lines": lines}
+
+
+def _skip_line(file) -> bool:
+    """Siirry seuraavan rivin alkuun lukematta pitkää riviä kerralla muistiin. False = tiedosto loppui."""
+    while True:
+        raw = file.readline(READ_CHUNK_BYTES)
+        if not raw:
+            return False
+        if raw.endswith(b"\n"):
+            return True
+
+
+def _read_lines(path: str, start_line: int, end_line: int, max_bytes: int) -> Dict[str, Any]:
+    stat = os.stat(path)
+    checkpoints = _line_index.checkpoints(path, stat)
+    # Hypätään lähimpään tunnettuun rivin alkuun ennen pyydettyä aluetta
+    line = max(number for number in list(checkpoints) if number <= start_line - 1)
+    lines: List[str] = []
+    used = 0
+    next_line = next_offset = None
+    with open(path, "rb") as file:
+        file.seek(checkpoints[line])
+        while line < start_line - 1:
+            if line % LINE_CHECKPOINT == 0:
+                checkpoints.setdefault(line, file.tell())
+            if not _skip_line(file):
+                break
+            line += 1
+
+        while line < end_line:
+            if line % LINE_CHECKPOINT == 0:
+                checkpoints.setdefault(line, file.tell())
+            position = file.tell()
+            # Enintään yksi tavu yli budjetin, joten pitkää riviä ei lueta kokonaan
+            raw = file.readline(max_bytes - used + 1)
+            if not raw:
+                break
+            if len(raw) > max_bytes - used:
+                if lines:
+                    next_line = line + 1
+                else:
+                    # Yksin budjettia pidempi rivi: palautetaan alku ja tavusijainti, josta jatkaa
+                    keep = _utf8_complete(raw[:max_bytes]) or _utf8_length(raw[0])
+                    lines.append(_decode(raw[:keep]))
+                    line += 1
+                    next_offset = position + keep
+                break
+            line += 1
+            lines.append(_decode(raw))
+            used += len(raw)
+        else:
+            if file.read(1):
+                next_line = line + 1
+
+    return {"file": path, "content": "".join(lines), "start_line": start_line,
+            "end_line": line if lines else None, "next_line": next_line,
+            "truncated": next_offset is not None, "next_offset": next_offset, "size": stat.st_size}
+
+
+def _read_tail(path: str, count: int, max_bytes: int) -> Dict[str, Any]:
+    size = os.path.getsize(path)
+    data = b""
+    position = size
+    with open(path, "rb") as file:
+        # Luetaan lopusta taaksepäin, kunnes rivejä on tarpeeksi tai tavuraja tulee vastaan
+        while position > 0 and data.count(b"\n") <= count and len(data) < max_bytes:
+            step = min(READ_CHUNK_BYTES, position)
+            position -= step
+            file.seek(position)
+            data = file.read(step) + data
+
+    trailing = data.endswith(b"\n")
+    parts = (data[:-1] if trailing else data).split(b"\n")
+    selected = parts[-count:]
+    content = b"\n".join(selected) + (b"\n" if trailing else b"")
+    # Ensimmäinen pala alkaa keskeltä riviä, jos tiedostoa ei luettu alusta asti
+    truncated = position > 0 and len(selected) == len(parts)
+    if len(content) > max_bytes:
+        # Pudotetaan kokonaisia rivejä alusta; jos yksikään ei mahdu kokonaan, viimeisestä jää loppuosa
+        cut = content.find(b"\n", len(content) - max_bytes - 1, len(content) - 1)
+        if cut != -1:
+            content, truncated = content[cut + 1:], False
+        else:
+            content, truncated = content[-max_bytes:], True
+            # Tavuraja voi katkaista ensimmäisen merkin
+            content = content[_skip_continuation(content):]
+    returned = content.count(b"\n") + (0 if trailing or not content else 1)
+    return {"file": path, "content": _decode(content), "offset": size - len(content),
+            "returned_lines": returned, "requested_lines": count, "truncated": truncated, "size": size}
+
+
+def read_file_range(file_name: str, offset: Optional[int] = None, length: Optional[int] = None,
+                    start_line: Optional[int] = None, end_line: Optional[int] = None,
+                    mode: Optional[str] = None, lines: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Lue tiedostosta vain pyydetty osa seek-kutsuilla, koko tiedostoa lataamatta.
+
+    Tilat:
+        - oletus: tavualue offset..offset+length (oletuksena alusta DEFAULT_READ_BYTES tavua)
+        - start_line/end_line: rivialue (1-pohjainen, loppu mukaan lukien)
+        - mode="head" / "tail": ensimmäiset tai viimeiset `lines` riviä
+        - mode="probe": vain tiedoston koko ja rivimäärä
+
+    Vastauksessa on seuraavan sivun sijainti (next_offset tai next_line), kun tiedostoa on jäljellä.
+    Yksittäistä riviä ei palauteta tavurajaa pidempänä: rivitiloissa truncated on tosi ja
+    next_offset kertoo, mistä tavusta rivin lukemista voi jatkaa. Tail-tilassa offset on
+    palautetun sisällön alku, truncated kertoo, että ensimmäinen rivi on vain loppuosa, ja
+    returned_lines voi jäädä pienemmäksi kuin requested_lines, jos rivit eivät mahdu tavurajaan.
+
+    Args:
+        file_name (str): Luettava tiedosto.
+        offset (Optional[int]): Tavualueen alku.
+        length (Optional[int]): Tavualueen pituus, 1..MAX_READ_BYTES. Sivun raja siirretään
+            tarvittaessa merkin rajalle, joten sisältö voi olla muutaman tavun lyhyempi.
+        start_line (Optional[int]): Rivialueen ensimmäinen rivi.
+        end_line (Optional[int]): Rivialueen viimeinen rivi.
+        mode (Optional[str]): "head", "tail" tai "probe".
+        lines (Optional[int]): Rivimäärä head- ja tail-tiloissa, vähintään 1.
+
+    Returns:
+        Dict[str, Any]: Sisältö ja sijaintitiedot tai probe-tilassa koko ja rivimäärä.
+
+    Raises:
+        OSError: Jos tiedostoa ei voi lukea.
+        ValueError: Jos tila on tuntematon tai length tai lines ei ole positiivinen.
+    """
+    if length is not None and length < 1:
+        raise ValueError(f"length pitää olla vähintään 1, saatiin {length}")
+    if lines is not None and lines < 1:
+        raise ValueError(f"lines pitää olla vähintään 1, saatiin {lines}")
+    max_bytes = min(length or DEFAULT_READ_BYTES, MAX_READ_BYTES)
+    if mode == "probe":
+        return probe_file(file_name)
+    if mode == "head":
+        return _read_lines(file_name, 1, lines or DEFAULT_HEAD_LINES, max_bytes)
+    if mode == "tail":
+        return _read_tail(file_name, lines or DEFAULT_HEAD_LINES, max_bytes)
+    if mode not in (None, "", "range"):
+        raise ValueError(f"Tuntematon lukutila: {mode}")
+    if start_line is not None or end_line is not None:
+        start = max(start_line or 1, 1)
+        return _read_lines(file_name, start, end_line or start + DEFAULT_HEAD_LINES - 1, max_bytes)
+
+    size = os.path.getsize(file_name)
+    start = max(offset or 0, 0)
+    with open(file_name, "rb") as file:
+        file.seek(start)
+        # Muutama ylimääräinen tavu, jotta rajalla oleva merkki voidaan tarvittaessa ottaa kokonaan
+        data = file.read(max_bytes + 3)
+    # Sivu alkaa ja päättyy merkin rajalle, jotta peräkkäiset sivut eivät riko monitavuisia merkkejä
+    skip = _skip_continuation(data) if start > 0 else 0
+    start, data = start + skip, data[skip:]
+    keep = _utf8_complete(data[:max_bytes])
+    if keep == 0 and data:
+        # length on lyhyempi kuin ensimmäinen merkki: palautetaan se kokonaan
+        keep = _utf8_length(data[0])
+    data = data[:keep]
+    end = start + len(data)
+    return {"file": file_name, "content": _decode(data), "offset": start, "end": end,
+            "next_offset": end if end < size else None, "size": size}
+
+
+# read_file-työkalun parametrit LLM:lle
+READ_FILE_PARAMETERS = {
+    "type": "object",
+    "properties": {
+        "file_name": {"type": "string"},
+        "offset": {"type": "integer", "description": "Tavualueen alku; jatka edellisen vastauksen next_offset-arvosta."},
+        "length": {"type": "integer", "minimum": 1, "maximum": MAX_READ_BYTES,
+                   "description": f"Luettavien tavujen määrä, oletus {DEFAULT_READ_BYTES}."},
+        "start_line": {"type": "integer", "description": "Rivialueen ensimmäinen rivi (1-pohjainen)."},
+        "end_line": {"type": "integer", "description": "Rivialueen viimeinen rivi."},
+        "mode": {"type": "string", "enum": ["head", "tail", "probe"],
+                 "description": "head/tail: ensimmäiset/viimeiset rivit, probe: vain koko ja rivimäärä."},
+        "lines": {"type": "integer", "minimum": 1,
+                  "description": f"Rivimäärä head- ja tail-tiloissa, oletus {DEFAULT_HEAD_LINES}."}
+    },
+    "required": ["file_name"]
+}
@@ -0,0 +1,122 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from conversationBuffer import count_message_tokens
+
+# Historian oletusbudjetti tokeneina (tiivistelmä + sanatarkat vuorot)
+DEFAULT_HISTORY_TOKENS = 2000
+# Kuinka monta viimeisintä kysymys-vastaus-paria pidetään aina sanatarkkoina
+DEFAULT_KEEP_TURNS = 4
+
+# Tiivistelmät tehdään taustalla; sama säiejoukko riittää kaikille keskusteluille
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+
+
+class HistoryManager:
+    """
+    Tokenibudjetoitu keskusteluhistoria, jonka vanhat vuorot tiivistetään taustalla.
+
+    Viimeisimmät keep_turns vuoroa pidetään sanatarkkoina. Vanhemmat vuorot siirretään
+    tiivistettäviksi, ja tiivistelmä päivitetään taustasäikeessä, joten vastauksen
+    odottaja ei koskaan odota tiivistämistä. Kunnes uusi tiivistelmä on valmis,
+    tiivistettävät vuorot ovat mukana niin paljon kuin budjettiin mahtuu (uusimmat
+    ensin), joten kehotteen koko pysyy rajattuna joka hetki.
+
+    Args:
+        summarize (Callable[[str, List[Dict]], str]): Saa edellisen tiivistelmän ja
+            tiivistettävät viestit ja palauttaa uuden tiivistelmän.
+        max_tokens (int): Historian tokenibudjetti.
+        keep_turns (int): Sanatarkkoina pidettävien vuorojen määrä.
+        token_count (Callable[[Dict], int]): Viestin tokenimäärän laskija.
+        executor (Optional[ThreadPoolExecutor]): Säiejoukko tiivistelmille.
+    """
+    def __init__(self, summarize: Callable[[str, List[Dict]], str], max_tokens: int = DEFAULT_HISTORY_TOKENS,
+                 keep_turns: int = DEFAULT_KEEP_TURNS, token_count: Callable[[Dict], int] = count_message_tokens,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self._token_count = token_count
+        self._executor = executor or _summary_executor
+        # Valmis tiivistys voi kutsua _finish-metodia samassa säikeessä, joten lukon on oltava uudelleentuleva
+        self._lock = threading.RLock()
+
+        self.summary = ""
+        self._summary_tokens = 0
+        # Vuorot ovat (viestit, tokenit) -pareja: kysymys ja vastaus yhdessä
+        self._recent: List[tuple] = []
+        self._folding: List[tuple] = []
+        self._future: Optional[Future] = None
+        self.summaries_made = 0
+
+    def add_turn(self, question: str, answer: str) -> None:
+        """Lisää kysymys ja vastaus historiaan ja käynnistä tarvittaessa tiivistys."""
+        messages = [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+        tokens = sum(self._token_count(message) for message in messages)
+        with self._lock:
+            self._recent.append((messages, tokens))
+            while len(self._recent) > self.keep_turns:
+                self._folding.append(self._recent.pop(0))
+            self._schedule()
+
+    def _schedule(self) -> None:
+        """Käynnistä tiivistys, jos tiivistettävää on eikä edellinen ole kesken. Vaatii lukon."""
+        if not self._folding or self._future is not None:
+            return
+        batch = list(self._folding)
+        previous = self.summary
+        self._future = self._executor.submit(self.summarize, previous, [m for turn, _ in batch for m in turn])
+        self._future.add_done_callback(lambda future: self._finish(future, len(batch)))
+
+    def _finish(self, future: Future, folded: int) -> None:
+        with self._lock:
+            self._future = None
+            try:
+                summary = future.result()
+            except Exception:
+                # Epäonnistunut tiivistys yritetään uudelleen seuraavan vuoron jälkeen
+                return
+            self.summary = summary
+            self._summary_tokens = self._token_count(self._summary_message()) if summary else 0
+            del self._folding[:folded]
+            self.summaries_made += 1
+            self._schedule()
+
+    def _summary_message(self) -> Dict[str, str]:
+        return {"role": "system", "content": f"Tiivistelmä aiemmasta keskustelusta: {self.summary}"}
+
+    def messages(self) -> List[Dict[str, str]]:
+        """
+        Palauta kehotteeseen lisättävä historia budjetin rajoissa.
+
+        Returns:
+            List[Dict[str, str]]: Tiivistelmä (jos on), budjettiin mahtuvat tiivistettävät
+            vuorot ja viimeisimmät vuorot sanatarkkoina.
+        """
+        with self._lock:
+            used = self._summary_tokens + sum(tokens for _, tokens in self._recent)
+            # Viimeisimmät vuorot ovat aina mukana; niiden edelle mahtuu uusimpia tiivistettäviä
+            included = []
+            for turn, tokens in reversed(self._folding):
+                if used + tokens > self.max_tokens:
+                    break
+                included.insert(0, turn)
+                used += tokens
+            messages = [self._summary_message()] if self.summary else []
+            for turn in included + [turn for turn, _ in self._recent]:
+                messages.extend(turn)
+            return messages
+
+    @property
+    def total_tokens(self) -> int:
+        """messages()-listan tokenimäärä."""
+        return sum(self._token_count(message) for message in self.messages())
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Odota, että käynnissä oleva tiivistys on valmis (esim. ennen lopetusta)."""
+        while (future := self._future) is not None:
+            try:
+                future.result(timeout)
+            except Exception:
+                return
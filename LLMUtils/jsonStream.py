@@ -0,0 +1,125 @@
+import re
+import json
+from typing import Any, Iterator, TextIO
+
+# Kuinka monta merkkiä tiedostosta luetaan kerralla
+READ_CHUNK_CHARS = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_DELIMITERS = tuple(",]" + _WHITESPACE)
+_WHITESPACE_RE = re.compile(r"[ \t\r\n]*")
+
+
+def iter_json_array(file: TextIO, chunk_chars: int = READ_CHUNK_CHARS) -> Iterator[Any]:
+    """
+    Palauta JSON-tiedoston ylimmän tason taulukon alkiot yksi kerrallaan.
+
+    Tiedostoa luetaan paloittain, ja jokainen alkio jäsennetään heti, kun se on
+    kokonaan puskurissa, joten muistissa on kerrallaan vain yksi alkio ja
+    lukupuskuri eikä koko taulukkoa. Jos alkio ei mahdu puskuriin, luettavan palan
+    kokoa kasvatetaan, jotta jäsennysyrityksiä tulee vain logaritminen määrä.
+
+    Args:
+        file (TextIO): Tekstitilassa avattu tiedosto.
+        chunk_chars (int): Kerralla luettavien merkkien määrä.
+
+    Yields:
+        Any: Taulukon alkiot järjestyksessä.
+
+    Raises:
+        json.JSONDecodeError: Jos tiedosto ei ole JSON-taulukko tai se on virheellinen.
+    """
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill(size: int) -> bool:
+        """Lisää puskuriin luettua tekstiä ja pudota jo käsitelty alku. False tiedoston lopussa."""
+        nonlocal buffer, position, eof
+        chunk = file.read(size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        eof = not chunk
+        return not eof
+
+    def skip_whitespace() -> None:
+        nonlocal position
+        while True:
+            position = _WHITESPACE_RE.match(buffer, position).end()
+            if position < len(buffer) or not fill(chunk_chars):
+                return
+
+    skip_whitespace()
+    if buffer[position:position + 1] != "[":
+        raise json.JSONDecodeError("Odotettiin JSON-taulukkoa", buffer, position)
+    position += 1
+
+    expect_value = True
+    empty = True
+    while True:
+        skip_whitespace()
+        if position >= len(buffer):
+            raise json.JSONDecodeError("Taulukko päättyi kesken", buffer, position)
+        char = buffer[position]
+        if char == "]":
+            if expect_value and not empty:
+                raise json.JSONDecodeError("Ylimääräinen pilkku ennen ']'", buffer, position)
+            return
+        if not expect_value:
+            if char != ",":
+                raise json.JSONDecodeError("Odotettiin pilkkua tai ']'", buffer, position)
+            position += 1
+            expect_value = True
+            continue
+
+        read_size = chunk_chars
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof or not fill(read_size):
+                    raise
+                read_size = max(read_size, len(buffer))
+                continue
+            # Luku voi jatkua seuraavassa palassa ("12" + "3.5" tai "1." + "5"), joten arvo
+            # hyväksytään vasta, kun sen perässä näkyy erotin
+            if not eof and buffer[end:end + 1] not in _DELIMITERS and fill(read_size):
+                continue
+            break
+        position = end
+        expect_value = empty = False
+        yield value
+
+
+def iter_jsonl(file: TextIO) -> Iterator[Any]:
+    """Palauta JSONL-tiedoston rivit jäsennettyinä; tyhjät rivit ohitetaan."""
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_json_records(path: str) -> Iterator[Any]:
+    """
+    Palauta JSON-taulukon tai JSONL-tiedoston tietueet yksi kerrallaan.
+
+    Muoto päätellään ensimmäisestä merkistä: "[" tarkoittaa taulukkoa, muuten
+    jokainen rivi on oma JSON-arvonsa.
+
+    Args:
+        path (str): Tiedoston polku.
+
+    Yields:
+        Any: Tietueet tiedoston järjestyksessä.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        first = ""
+        while True:
+            first = file.read(1)
+            if not first or first not in _WHITESPACE:
+                break
+        file.seek(0)
+        if first == "[":
+            yield from iter_json_array(file)
+        else:
+            yield from iter_jsonl(file)
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from litellm import ModelResponse, completion, stream_chunk_builder
+
+# Välimuistin oletussijainti, jaettu kaikkien skriptien kesken
+DEFAULT_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".llm_cache.sqlite")
+)
+# Kuinka kauan vastaus on voimassa (sekunteina)
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+# Enimmäiskoko: rivien määrä ja tallennettujen vastausten tavut
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+# Rajan ylittyessä poistetaan kerralla niin monta riviä, että käyttöaste laskee tähän osuuteen
+EVICT_TARGET = 0.9
+EVICT_BATCH = 256
+
+# Parametrit, jotka eivät vaikuta vastaukseen ja jätetään avaimen ulkopuolelle
+IGNORED_PARAMS = {"api_key"}
+
+
+def cache_enabled() -> bool:
+    """
+    Välimuisti otetaan käyttöön ympäristömuuttujalla LLM_CACHE=on (oletus off).
+
+    Oletuksena pois, koska keskusteluskriptissä sama kysymys toisi muuten hiljaa
+    vanhan vastauksen. Kutsukohtainen use_cache=False ohittaa välimuistin aina.
+    """
+    return os.getenv("LLM_CACHE", "off").lower() in ("1", "on", "true", "yes")
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def message_digest(message: Dict[str, Any]) -> str:
+    """Yhden viestin tiiviste, josta välimuistiavaimen viestiosa kootaan."""
+    digest = getattr(message, "digest", None)
+    if digest is not None:
+        return digest
+    return hashlib.sha256(_canonical(message).encode("utf-8")).hexdigest()
+
+
+class KeyedMessage(dict):
+    """
+    Viesti, jonka tiiviste lasketaan kerran luotaessa.
+
+    Agenttisilmukka lähettää samat viestit joka iteraatiolla, joten avaimen
+    muodostus yhdistää vain valmiit tiivisteet eikä serialisoi koko historiaa
+    uudelleen. Viestiä ei saa muokata luomisen jälkeen.
+    """
+    __slots__ = ("digest",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.digest = message_digest(self)
+
+
+def make_cache_key(**request) -> str:
+    """
+    Muodosta pyynnön sisällöstä yksilöivä avain.
+
+    Avain on SHA-256-tiiviste mallista, viesteistä, työkaluista ja muista
+    parametreista kanonisessa JSON-muodossa, joten samat pyynnöt saavat saman
+    avaimen parametrien järjestyksestä riippumatta. Viestit tiivistetään yksitellen
+    (message_digest), joten KeyedMessage-viestien tiivisteitä ei lasketa uudelleen.
+
+    Args:
+        **request: completion-kutsun parametrit.
+
+    Returns:
+        str: Heksadesimaalimuotoinen tiiviste.
+    """
+    payload = {key: value for key, value in request.items() if key not in IGNORED_PARAMS}
+    if payload.get("messages") is not None:
+        payload["messages"] = [message_digest(message) for message in payload["messages"]]
+    return hashlib.sha256(_canonical(payload).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Pysyvä LLM-vastausten välimuisti SQLite-tietokannassa.
+
+    Vanhentuneet rivit (TTL) poistetaan luettaessa, ja kun rivien määrä tai
+    kokonaiskoko ylittää rajan, pisimpään käyttämättä olleet rivit poistetaan (LRU)
+    erissä last_access-indeksin järjestyksessä, kunnes käyttöaste on EVICT_TARGET.
+    Rivimäärää ja kokoa seurataan muistissa, joten tavallinen kirjoitus ei käy taulua läpi.
+    """
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+        self._connection.commit()
+        self._count, self._total = self._totals()
+
+    def _totals(self) -> Tuple[int, int]:
+        return self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Hae vastaus avaimella. Palauttaa None, jos sitä ei ole tai se on vanhentunut."""
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._delete([key])
+                    self._connection.commit()
+                self.misses += 1
+                return None
+
+            self._connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, response: Dict[str, Any]) -> None:
+        """Tallenna vastaus ja poista tarvittaessa vanhimmat rivit."""
+        data = json.dumps(response, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, data, size, now, now)
+            )
+            self._count += 0 if old else 1
+            self._total += size - (old[0] if old else 0)
+            self._evict()
+            self._connection.commit()
+
+    def _delete(self, keys: List[str]) -> None:
+        """Poista rivit ja päivitä muistissa pidetyt summat. Vaatii lukon."""
+        for key in keys:
+            row = self._connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count -= 1
+                self._total -= row[0]
+
+    def _evict(self) -> None:
+        """Poista pisimpään käyttämättä olleet rivit erissä, kun raja ylittyy. Vaatii lukon."""
+        if self._count <= self.max_entries and self._total <= self.max_bytes:
+            return
+        # Toinen prosessi on voinut kirjoittaa samaan tiedostoon, joten tarkistetaan todelliset summat
+        self._count, self._total = self._totals()
+        target_entries = int(self.max_entries * EVICT_TARGET)
+        target_bytes = int(self.max_bytes * EVICT_TARGET)
+        if self._count <= self.max_entries and self._total <= self.max_bytes:
+            return
+
+        while self._count > target_entries or self._total > target_bytes:
+            rows = self._connection.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT ?", (EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            expired = []
+            count, total = self._count, self._total
+            for key, size in rows:
+                if count <= target_entries and total <= target_bytes:
+                    break
+                expired.append(key)
+                count -= 1
+                total -= size
+            self._delete(expired)
+
+    def clear(self) -> None:
+        """Tyhjennä välimuisti ja laskurit."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+            self._count = self._total = 0
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Palauta osumat, ohitukset, rivien määrä ja kokonaiskoko tavuina."""
+        with self._lock:
+            count, total = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": total}
+
+
+_default_cache: Optional[LLMCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache:
+    """Palauta jaettu välimuisti, joka avataan ensimmäisellä käytöllä."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+        return _default_cache
+
+
+def cached_completion(use_cache: Optional[bool] = None, cache: Optional[LLMCache] = None, **request) -> ModelResponse:
+    """
+    litellm:n completion-kutsu välimuistin kautta.
+
+    Args:
+        use_cache (Optional[bool]): True tai False pakottaa välimuistin päälle tai pois tältä
+            kutsulta, None seuraa LLM_CACHE-muuttujaa (ks. cache_enabled).
+        cache (Optional[LLMCache]): Käytettävä välimuisti, oletuksena jaettu välimuisti.
+        **request: completion-kutsun parametrit.
+
+    Returns:
+        ModelResponse: Välimuistista luettu tai LLM:n palauttama vastaus.
+    """
+    if use_cache is None:
+        use_cache = cache_enabled()
+    # Striimattuja vastauksia ei tallenneta
+    if not use_cache or request.get("stream"):
+        return completion(**request)
+
+    cache = cache or get_cache()
+    key = make_cache_key(**request)
+    cached = cache.get(key)
+    if cached is not None:
+        return ModelResponse(**cached)
+
+    response = completion(**request)
+    cache.set(key, response.model_dump())
+    return response
+
+
+def cached_stream_completion(on_token: Callable[[str], None], use_cache: Optional[bool] = None,
+                             cache: Optional[LLMCache] = None, **request) -> str:
+    """
+    Striimattu completion-kutsu välimuistin kautta.
+
+    Tokenit annetaan on_token-funktiolle sitä mukaa kuin ne saapuvat, ja koottu
+    vastaus tallennetaan samalla avaimella kuin cached_completion-kutsussa, joten
+    striimattu ja tavallinen kutsu jakavat välimuistin. Välimuistiosuma annetaan
+    on_token-funktiolle yhtenä palana.
+
+    Args:
+        on_token (Callable[[str], None]): Kutsutaan jokaiselle tekstitokenille.
+        use_cache (Optional[bool]): True tai False pakottaa välimuistin päälle tai pois tältä
+            kutsulta, None seuraa LLM_CACHE-muuttujaa (ks. cache_enabled).
+        cache (Optional[LLMCache]): Käytettävä välimuisti, oletuksena jaettu välimuisti.
+        **request: completion-kutsun parametrit ilman stream-parametria.
+
+    Returns:
+        str: Koko vastausteksti.
+    """
+    if use_cache is None:
+        use_cache = cache_enabled()
+    if use_cache:
+        cache = cache or get_cache()
+        key = make_cache_key(**request)
+        cached = cache.get(key)
+        if cached is not None:
+            content = ModelResponse(**cached).choices[0].message.content or ""
+            on_token(content)
+            return content
+
+    chunks = []
+    content = []
+    for chunk in completion(stream=True, **request):
+        chunks.append(chunk)
+        if chunk.choices and chunk.choices[0].delta.content:
+            content.append(chunk.choices[0].delta.content)
+            on_token(chunk.choices[0].delta.content)
+
+    if use_cache and chunks:
+        cache.set(key, stream_chunk_builder(chunks, messages=request.get("messages")).model_dump())
+    return "".join(content)
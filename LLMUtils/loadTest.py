@@ -0,0 +1,221 @@
+import io
+import os
+import json
+import time
+import argparse
+import statistics
+import threading
+import importlib.util
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import ModuleType
+from typing import Any, Callable, Dict, List
+
+from litellm import completion
+
+from mockLLMServer import scripted_reply, start_server
+from toolCalls import parse_tool_call
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Kuormitettavat agentit ja niiden tiedostot
+AGENT_FILES = {
+    "loops": os.path.join(REPO_ROOT, "WithLoopsAgent", "agentWithLoops.py"),
+    "reader": os.path.join(REPO_ROOT, "PractiveExercises", "Reader_Agent", "readerAgent.py"),
+    "capabilities": os.path.join(REPO_ROOT, "CapabilitiesAgent", "loopWithCapabilities.py"),
+}
+
+# CapabilitiesAgent-esimerkissä ei ole työkalurekisteriä eikä LLM-silmukkaa, joten sen
+# kyvykkyyksiä ajetaan tämän tynkärekisterin ja run_capabilities_session-silmukan ympärillä
+STUB_TOOLS = [
+    {"type": "function", "function": {
+        "name": "list_files", "description": "Listaa nykyisen hakemiston tiedostot.",
+        "parameters": {"type": "object", "properties": {}}}},
+    {"type": "function", "function": {
+        "name": "terminate", "description": "Lopeta tehtävä ja palauta viesti käyttäjälle.",
+        "parameters": {"type": "object", "properties": {"message": {"type": "string"}}, "required": ["message"]}}},
+]
+STUB_FUNCTIONS: Dict[str, Callable] = {
+    "list_files": lambda: sorted(os.listdir(".")),
+    "terminate": lambda message="": message,
+}
+
+
+def load_module(path: str) -> ModuleType:
+    """Lataa skripti moduulina sen tiedostopolusta."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TimedLLM:
+    """LLM-kutsun kääre, joka mittaa jokaisen iteraation (LLM-kutsun) keston."""
+    def __init__(self, llm: Callable):
+        self.llm = llm
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, **request):
+        start = time.perf_counter()
+        try:
+            return self.llm(**request)
+        except Exception as e:
+            with self._lock:
+                self.errors[type(e).__name__] = self.errors.get(type(e).__name__, 0) + 1
+            raise
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - start)
+
+
+def run_capabilities_session(module: ModuleType, llm: Callable, task: str) -> Any:
+    """
+    Aja yksi CapabilitiesAgent-istunto.
+
+    Agentin run() kutsuu vain kyvykkyyksien init-koukkua, joten LLM-silmukka on tässä:
+    jokainen pyyntö kulkee process_prompt-koukun läpi ja jokainen toiminto
+    process_action- ja process_result-koukkujen läpi, kuten kyvykkyysrajapinta kuvaa.
+    """
+    capabilities = [module.TimeAwareCapability()]
+    agent = module.Agent(goals=["Suorita annettu tehtävä"], agent_language=None, action_registry=STUB_FUNCTIONS,
+                         generate_response=llm, environment=None, capabilities=capabilities)
+    agent.run(task)
+    action_context = module.ActionContext()
+    messages = [{"role": "system", "content": "Suorita käyttäjän tehtävä työkaluilla."},
+                {"role": "user", "content": task}]
+
+    for _ in range(agent.max_iterations):
+        # process_prompt muokkaa järjestelmäviestiä, joten jokainen kierros saa omat kopiot
+        prompt = module.Prompt([dict(message) for message in messages])
+        for capability in capabilities:
+            prompt = capability.process_prompt(agent, action_context, prompt)
+        response = llm(model="openai/gpt-4o", messages=prompt.messages, tools=STUB_TOOLS, max_tokens=1024)
+        message = response.choices[0].message
+        if not message.tool_calls:
+            return message.content
+
+        action = parse_tool_call(message.tool_calls[0])
+        for capability in capabilities:
+            action = capability.process_action(agent, action_context, action)
+        result = STUB_FUNCTIONS[action["tool_name"]](**action["args"])
+        for capability in capabilities:
+            result = capability.process_result(agent, action_context, message.content, None, action, result)
+        if action["tool_name"] == "terminate":
+            for capability in capabilities:
+                capability.end_agent_loop(agent, action_context)
+            return result
+        messages += [{"role": "assistant", "content": json.dumps(action)},
+                     {"role": "user", "content": json.dumps({"result": result})}]
+    return None
+
+
+def make_session(agent: str, llm: TimedLLM) -> Callable[[str], None]:
+    """Palauta funktio, joka ajaa yhden istunnon valitulla agentilla."""
+    module = load_module(AGENT_FILES[agent])
+    if agent == "capabilities":
+        return partial(run_capabilities_session, module, llm)
+    return lambda task: module.run_agent(task, llm=llm)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """Laske p50, p95, p99 ja maksimi millisekunteina."""
+    if len(values) < 2:
+        value = values[0] * 1000 if values else 0.0
+        return {"p50": value, "p95": value, "p99": value, "max": value}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": cuts[49] * 1000, "p95": cuts[94] * 1000, "p99": cuts[98] * 1000, "max": max(values) * 1000}
+
+
+def run_load_test(agent: str, sessions: int, api_base: str, retries: int = 0) -> Dict:
+    """
+    Aja annettu määrä samanaikaisia istuntoja ja kerää viivetilastot.
+
+    Args:
+        agent (str): "loops", "reader" tai "capabilities".
+        sessions (int): Samanaikaisten istuntojen määrä.
+        api_base (str): Testipalvelimen osoite.
+        retries (int): litellm:n uudelleenyritykset virheen jälkeen.
+
+    Returns:
+        Dict: Iteraatio- ja istuntoviiveiden persentiilit, virheet ja läpäisy.
+    """
+    # Kuormitustesti käyttää paikallista testipalvelinta, joten oikeaa API-avainta ei tarvita
+    llm = TimedLLM(partial(completion, api_base=api_base, api_key="load-test-key", max_retries=retries))
+    run_session = make_session(agent, llm)
+    session_latencies: List[float] = []
+    failed: List[int] = []
+
+    def timed_session(index: int) -> None:
+        start = time.perf_counter()
+        try:
+            run_session(f"List the files in the directory ({index})")
+        except Exception:
+            failed.append(index)
+        session_latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    # Agenttien tulosteet ohjataan pois, jotta sadat istunnot eivät tukahduta konsolia
+    with redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=sessions) as executor:
+        list(executor.map(timed_session, range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "agent": agent,
+        "sessions": sessions,
+        "iterations": len(llm.latencies),
+        "iteration_ms": percentiles(llm.latencies),
+        "session_ms": percentiles(session_latencies),
+        "failed_sessions": len(failed),
+        "errors": llm.errors,
+        "sessions_per_second": sessions / elapsed if elapsed > 0 else None,
+    }
+
+
+def print_report(result: Dict) -> None:
+    iteration, session = result["iteration_ms"], result["session_ms"]
+    print(f"\n== {result['agent']}: {result['sessions']} istuntoa, {result['iterations']} iteraatiota ==")
+    print(f"{'':<12}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    print(f"{'iteraatio':<12}{iteration['p50']:>10.0f}{iteration['p95']:>10.0f}{iteration['p99']:>10.0f}{iteration['max']:>10.0f}")
+    print(f"{'istunto':<12}{session['p50']:>10.0f}{session['p95']:>10.0f}{session['p99']:>10.0f}{session['max']:>10.0f}")
+    print(f"Epäonnistuneet istunnot: {result['failed_sessions']}  virheet: {result['errors']}")
+    print(f"Läpäisy: {result['sessions_per_second']:.1f} istuntoa/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agenttisilmukoiden kuormitustesti paikallista LLM-palvelinta vasten")
+    parser.add_argument("--agents", nargs="+", default=list(AGENT_FILES), choices=list(AGENT_FILES))
+    parser.add_argument("--sessions", type=int, default=200, help="samanaikaiset istunnot")
+    parser.add_argument("--latency", default="lognormal:0.3:0.4", help="viive tai jakauma, ks. parse_latency")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--script", help="vastausten käsikirjoitus JSON-tiedostona")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    parser.add_argument("--retries", type=int, default=0)
+    parser.add_argument("--output", help="JSONL-tiedosto, johon tulokset lisätään vertailua varten")
+    args = parser.parse_args()
+
+    server_kwargs = {
+        "latency": float(args.latency) if args.latency.replace(".", "", 1).isdigit() else args.latency,
+        "token_delay": 1 / args.tokens_per_second,
+        "rate_limit_rate": args.rate_limit_rate,
+        "server_error_rate": args.server_error_rate,
+    }
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as file:
+            server_kwargs["reply"] = scripted_reply(json.load(file))
+    server, api_base = start_server(**server_kwargs)
+
+    for agent in args.agents:
+        result = run_load_test(agent, args.sessions, api_base, retries=args.retries)
+        print_report(result)
+        if args.output:
+            with open(args.output, "a", encoding="utf-8") as file:
+                file.write(json.dumps({**result, "server": {k: v for k, v in server_kwargs.items() if k != "reply"}}) + "\n")
+
+    print(f"\nPalvelimen tilastot: {server.stats}")
+    server.shutdown()
@@ -0,0 +1,341 @@
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# Oletusviive sekunteina jokaiselle vastaukselle
+DEFAULT_LATENCY = 0.2
+# Viive sekunteina jokaisen striimatun palan välillä
+DEFAULT_TOKEN_DELAY = 0.02
+# Kuinka monta merkkiä yhteen striimattuun palaan laitetaan
+CHUNK_CHARS = 8
+# Karkea arvio merkkien määrästä tokenia kohden usage-kenttää varten
+CHARS_PER_TOKEN = 4
+
+
+def parse_latency(spec: Union[float, str]) -> Callable[[], float]:
+    """
+    Muunna viivemäärittely funktioksi, joka arpoo viiveen sekunteina.
+
+    Tuetut muodot:
+        0.2 tai "fixed:0.2"        vakioviive
+        "uniform:0.1:0.5"          tasajakauma välillä [0.1, 0.5]
+        "normal:0.3:0.05"          normaalijakauma (keskiarvo, keskihajonta)
+        "lognormal:0.3:0.5"        lognormaalijakauma (mediaani, muotoparametri sigma)
+        "exponential:0.3"          eksponenttijakauma (keskiarvo)
+
+    Args:
+        spec (Union[float, str]): Viive tai jakauman kuvaus.
+
+    Returns:
+        Callable[[], float]: Funktio, joka palauttaa ei-negatiivisen viiveen.
+    """
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+
+    kind, *params = spec.split(":")
+    values = [float(param) for param in params]
+    if kind == "fixed":
+        sample = lambda: values[0]
+    elif kind == "uniform":
+        sample = lambda: random.uniform(values[0], values[1])
+    elif kind == "normal":
+        sample = lambda: random.gauss(values[0], values[1])
+    elif kind == "lognormal":
+        sample = lambda: random.lognormvariate(math.log(values[0]), values[1])
+    elif kind == "exponential":
+        sample = lambda: random.expovariate(1.0 / values[0])
+    else:
+        raise ValueError(f"Tuntematon viivejakauma: {kind}")
+    return lambda: max(0.0, sample())
+
+
+def build_completion(model: str, content: str = None, tool_calls: List[Dict] = None) -> Dict:
+    """
+    Rakenna OpenAI:n chat completions -muotoinen vastaus.
+
+    Args:
+        model (str): Mallin nimi, joka palautetaan vastauksessa.
+        content (str): Tekstivastaus.
+        tool_calls (List[Dict]): Työkalukutsut muodossa {"name": ..., "args": {...}}.
+
+    Returns:
+        Dict: JSON-muotoinen vastaus.
+    """
+    message = {"role": "assistant", "content": content}
+    if tool_calls:
+        message["tool_calls"] = [
+            {
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": call["name"], "arguments": json.dumps(call["args"])}
+            }
+            for call in tool_calls
+        ]
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": message,
+            "finish_reason": "tool_calls" if tool_calls else "stop"
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    }
+
+
+def estimate_usage(request: Dict, completion: Dict) -> Dict:
+    """Arvioi pyynnön ja vastauksen tokenimäärät merkkien määrästä."""
+    prompt_chars = sum(len(str(m.get("content") or "")) for m in request.get("messages", []))
+    message = completion["choices"][0]["message"]
+    completion_chars = len(message.get("content") or "") + sum(
+        len(call["function"]["arguments"]) for call in message.get("tool_calls", [])
+    )
+    prompt_tokens = prompt_chars // CHARS_PER_TOKEN
+    completion_tokens = max(1, completion_chars // CHARS_PER_TOKEN)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def scripted_reply(script: List[Dict]) -> Callable[[Dict], Dict]:
+    """
+    Luo vastausfunktio käsikirjoituksesta.
+
+    Käsikirjoitus on lista vuoroja, esim.
+    [{"tool_calls": [{"name": "list_files", "args": {}}]},
+     {"tool_calls": [{"name": "terminate", "args": {"message": "Valmis."}}]}].
+    Vuoro valitaan pyynnön avustajaviestien määrän perusteella, joten palvelin
+    pysyy tilattomana ja sama käsikirjoitus toimii sadoille rinnakkaisille istunnoille.
+    Käsikirjoituksen loputtua toistetaan viimeistä vuoroa.
+    """
+    def reply(request: Dict) -> Dict:
+        turn = sum(1 for m in request.get("messages", []) if m["role"] == "assistant")
+        step = script[min(turn, len(script) - 1)]
+        return build_completion(request.get("model", "gpt-4o"),
+                                content=step.get("content"), tool_calls=step.get("tool_calls"))
+    return reply
+
+
+def default_reply(request: Dict) -> Dict:
+    """
+    Yksinkertainen agenttikäsikirjoitus: listaa tiedostot ensimmäisellä kierroksella
+    ja lopeta toisella. Ilman työkaluja palautetaan tekstivastaus.
+    """
+    model = request.get("model", "gpt-4o")
+    tool_names = [tool["function"]["name"] for tool in request.get("tools", [])]
+    answered = any(m["role"] == "assistant" for m in request.get("messages", []))
+
+    if not tool_names:
+        return build_completion(model, content="Tämä on paikallisen testipalvelimen vastaus.")
+    if not answered and "list_files" in tool_names:
+        return build_completion(model, tool_calls=[{"name": "list_files", "args": {}}])
+    if "terminate" in tool_names:
+        return build_completion(model, tool_calls=[{"name": "terminate", "args": {"message": "Valmis."}}])
+    return build_completion(model, content="Valmis.")
+
+
+def completion_to_chunks(completion: Dict) -> List[Dict]:
+    """
+    Pilko valmis vastaus striimattaviksi chat.completion.chunk-paloiksi.
+
+    Tekstisisältö ja työkalukutsujen parametrit lähetetään CHUNK_CHARS merkin paloina,
+    samaan tapaan kuin oikea rajapinta lähettää ne token kerrallaan.
+    """
+    message = completion["choices"][0]["message"]
+    base = {"id": completion["id"], "object": "chat.completion.chunk",
+            "created": completion["created"], "model": completion["model"]}
+
+    def chunk(delta: Dict, finish_reason: str = None) -> Dict:
+        return {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+    chunks = [chunk({"role": "assistant", "content": ""})]
+    content = message.get("content") or ""
+    for start in range(0, len(content), CHUNK_CHARS):
+        chunks.append(chunk({"content": content[start:start + CHUNK_CHARS]}))
+
+    for index, tool_call in enumerate(message.get("tool_calls", [])):
+        chunks.append(chunk({"tool_calls": [{
+            "index": index, "id": tool_call["id"], "type": "function",
+            "function": {"name": tool_call["function"]["name"], "arguments": ""}
+        }]}))
+        arguments = tool_call["function"]["arguments"]
+        for start in range(0, len(arguments), CHUNK_CHARS):
+            chunks.append(chunk({"tool_calls": [{
+                "index": index, "function": {"arguments": arguments[start:start + CHUNK_CHARS]}
+            }]}))
+
+    chunks.append(chunk({}, finish_reason=completion["choices"][0]["finish_reason"]))
+    return chunks
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """HTTP-käsittelijä, joka vastaa /chat/completions-pyyntöihin."""
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.count("requests")
+
+        time.sleep(self.server.sample_latency())
+
+        # Injektoidut virheet, joilla testataan uudelleenyrityksiä ja virheenkäsittelyä
+        error = self.server.pick_error()
+        if error:
+            self._send_error(error)
+            return
+
+        completion = self.server.reply(request)
+        completion["usage"] = estimate_usage(request, completion)
+
+        if request.get("stream"):
+            self._send_stream(completion)
+            return
+
+        # Ilman striimausta vastaus lähtee vasta, kun koko viesti olisi generoitu
+        time.sleep(self.server.token_delay * len(completion_to_chunks(completion)))
+        body = json.dumps(completion).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int):
+        """Lähetä OpenAI-muotoinen virhevastaus (429 tai 500)."""
+        self.server.count(f"errors_{status}")
+        if status == 429:
+            error = {"message": "Rate limit reached (mock)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}
+        else:
+            error = {"message": "Internal server error (mock)", "type": "server_error", "code": None}
+        body = json.dumps({"error": error}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, completion: Dict):
+        """Lähetä vastaus server-sent events -striiminä."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        for chunk in completion_to_chunks(completion):
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        # Ei tulosteta jokaista pyyntöä kuormitustestien aikana
+        pass
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """
+    Paikallinen OpenAI-yhteensopiva palvelin kuormitus- ja viivetesteihin.
+
+    Viive arvotaan jokaiselle pyynnölle valitusta jakaumasta, striimatut palat
+    lähetetään token_delay-välein ja osa pyynnöistä voidaan vastata 429- tai
+    500-virheellä. Pyyntöjen ja virheiden määrät kerätään stats-sanakirjaan.
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address: Tuple[str, int], latency: Union[float, str] = DEFAULT_LATENCY,
+                 token_delay: float = DEFAULT_TOKEN_DELAY, reply: Callable[[Dict], Dict] = default_reply,
+                 rate_limit_rate: float = 0.0, server_error_rate: float = 0.0):
+        super().__init__(address, MockLLMHandler)
+        self.sample_latency = parse_latency(latency)
+        self.token_delay = token_delay
+        self.reply = reply
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.stats: Dict[str, int] = {"requests": 0, "errors_429": 0, "errors_500": 0}
+        self._stats_lock = threading.Lock()
+
+    def count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def pick_error(self) -> Optional[int]:
+        """Arvo, vastataanko pyyntöön virheellä."""
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.server_error_rate:
+            return 500
+        return None
+
+
+def start_server(port: int = 0, latency: Union[float, str] = DEFAULT_LATENCY,
+                 token_delay: float = DEFAULT_TOKEN_DELAY, reply: Callable[[Dict], Dict] = default_reply,
+                 rate_limit_rate: float = 0.0, server_error_rate: float = 0.0) -> Tuple[MockLLMServer, str]:
+    """
+    Käynnistä testipalvelin taustasäikeeseen.
+
+    Args:
+        port (int): Kuunneltava portti, 0 valitsee vapaan portin.
+        latency (Union[float, str]): Viive ennen vastauksen ensimmäistä tavua, sekunteina
+            tai jakaumana (ks. parse_latency).
+        token_delay (float): Viive sekunteina striimattujen palojen välillä.
+        reply (Callable[[Dict], Dict]): Funktio, joka muodostaa vastauksen pyynnöstä.
+        rate_limit_rate (float): Osuus pyynnöistä, joihin vastataan 429-virheellä.
+        server_error_rate (float): Osuus pyynnöistä, joihin vastataan 500-virheellä.
+
+    Returns:
+        Tuple[MockLLMServer, str]: Palvelin ja sen api_base-osoite litellm:lle.
+    """
+    server = MockLLMServer(("127.0.0.1", port), latency=latency, token_delay=token_delay, reply=reply,
+                           rate_limit_rate=rate_limit_rate, server_error_rate=server_error_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paikallinen OpenAI-yhteensopiva testipalvelin")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default=str(DEFAULT_LATENCY),
+                        help="viive sekunteina tai jakauma, esim. lognormal:0.3:0.5")
+    parser.add_argument("--tokens-per-second", type=float, default=1 / DEFAULT_TOKEN_DELAY,
+                        help="striimattujen palojen nopeus")
+    parser.add_argument("--script", help="JSON-tiedosto, jossa vastausten käsikirjoitus")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429-virheiden osuus")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="500-virheiden osuus")
+    args = parser.parse_args()
+
+    latency = float(args.latency) if args.latency.replace(".", "", 1).isdigit() else args.latency
+    reply = default_reply
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as file:
+            reply = scripted_reply(json.load(file))
+
+    server, api_base = start_server(
+        port=args.port,
+        latency=latency,
+        token_delay=1 / args.tokens_per_second,
+        reply=reply,
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate
+    )
+    print(f"Paikallinen LLM-palvelin käynnissä: {api_base}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Tilastot: {server.stats}")
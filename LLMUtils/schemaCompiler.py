@@ -0,0 +1,309 @@
+import re
+import json
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+# Polku arvoon: objektien avaimet ja taulukoiden indeksit juuresta alkaen
+Path = Tuple[Union[str, int], ...]
+
+# JSON-skeeman tyyppien Python-vastineet
+_PYTHON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+    "null": type(None),
+}
+# Avainsanat, jotka vaikuttaisivat validointiin mutta joita kääntäjä ei tue
+_UNSUPPORTED = {"$ref", "allOf", "anyOf", "oneOf", "not", "if", "patternProperties",
+                "dependencies", "dependentRequired", "dependentSchemas", "prefixItems", "contains"}
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class Violation(NamedTuple):
+    """Yksi skeemarikkomus: arvon polku ja kuvaus."""
+    path: Path
+    message: str
+
+    @property
+    def json_path(self) -> str:
+        return format_path(self.path)
+
+    def __str__(self) -> str:
+        return f"{self.json_path}: {self.message}"
+
+
+class SchemaValidationError(ValueError):
+    """Arvo ei vastaa skeemaa; kaikki rikkomukset ovat violations-listassa."""
+    def __init__(self, violations: List[Violation]):
+        self.violations = violations
+        super().__init__("; ".join(str(violation) for violation in violations))
+
+
+# Käännetty tarkistin lisää rikkomukset annettuun listaan
+Checker = Callable[[Any, Path, List[Violation]], None]
+Validator = Callable[[Any], List[Violation]]
+
+
+def format_path(path: Path) -> str:
+    """Muotoile polku JSONPath-muotoon, esim. $.line_items[0].total."""
+    parts = ["$"]
+    for part in path:
+        if isinstance(part, int):
+            parts.append(f"[{part}]")
+        elif _IDENTIFIER_RE.match(part):
+            parts.append(f".{part}")
+        else:
+            parts.append(f"[{json.dumps(part, ensure_ascii=False)}]")
+    return "".join(parts)
+
+
+def json_type_name(value: Any) -> str:
+    """Arvon JSON-tyypin nimi virheilmoituksia varten."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    return type(value).__name__
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _compile_type(names: List[str]) -> Callable[[Any], bool]:
+    """Käännä type-avainsana yhdeksi isinstance-tarkistukseksi."""
+    unknown = [name for name in names if name not in _PYTHON_TYPES]
+    if unknown:
+        raise ValueError(f"Tuntematon skeematyyppi: {unknown[0]}")
+    python_types = tuple(t for name in names for t in
+                         (_PYTHON_TYPES[name] if isinstance(_PYTHON_TYPES[name], tuple) else (_PYTHON_TYPES[name],)))
+    # bool on Pythonissa int:n alaluokka, mutta JSONissa eri tyyppi kuin luku
+    allow_bool = "boolean" in names
+    # JSON-skeemassa 1.0 on kokonaisluku
+    integral_float = "integer" in names and "number" not in names
+
+    def type_ok(value: Any) -> bool:
+        if isinstance(value, python_types):
+            return allow_bool or not isinstance(value, bool)
+        return integral_float and isinstance(value, float) and value.is_integer()
+
+    return type_ok
+
+
+def _compile_object(schema: Dict[str, Any]) -> Optional[Checker]:
+    required = tuple(schema.get("required", ()))
+    properties = tuple((name, checker) for name, subschema in schema.get("properties", {}).items()
+                       if (checker := _compile(subschema)) is not None)
+    additional = schema.get("additionalProperties", True)
+    known = frozenset(schema.get("properties", {}))
+    additional_checker = _compile(additional) if isinstance(additional, dict) else None
+    if not required and not properties and additional is True and additional_checker is None:
+        return None
+
+    def check_object(value: dict, path: Path, errors: List[Violation]) -> None:
+        for name in required:
+            if name not in value:
+                errors.append(Violation(path + (name,), "puuttuva vaadittu kenttä"))
+        for name, checker in properties:
+            if name in value:
+                checker(value[name], path + (name,), errors)
+        if additional is False:
+            for name in value:
+                if name not in known:
+                    errors.append(Violation(path + (name,), "kenttää ei sallita skeemassa"))
+        elif additional_checker is not None:
+            for name, item in value.items():
+                if name not in known:
+                    additional_checker(item, path + (name,), errors)
+
+    return check_object
+
+
+def _compile_array(schema: Dict[str, Any]) -> Optional[Checker]:
+    items = schema.get("items")
+    if items is not None and not isinstance(items, dict):
+        raise ValueError("Vain yksi items-skeema taulukon kaikille alkioille on tuettu")
+    item_checker = _compile(items) if items is not None else None
+    min_items, max_items = schema.get("minItems"), schema.get("maxItems")
+    if item_checker is None and min_items is None and max_items is None:
+        return None
+
+    def check_array(value: list, path: Path, errors: List[Violation]) -> None:
+        if min_items is not None and len(value) < min_items:
+            errors.append(Violation(path, f"vähintään {min_items} alkiota, saatiin {len(value)}"))
+        if max_items is not None and len(value) > max_items:
+            errors.append(Violation(path, f"enintään {max_items} alkiota, saatiin {len(value)}"))
+        if item_checker is not None:
+            for index, item in enumerate(value):
+                item_checker(item, path + (index,), errors)
+
+    return check_array
+
+
+def _compile_string(schema: Dict[str, Any]) -> Optional[Checker]:
+    min_length, max_length = schema.get("minLength"), schema.get("maxLength")
+    pattern = re.compile(schema["pattern"]) if "pattern" in schema else None
+    if min_length is None and max_length is None and pattern is None:
+        return None
+
+    def check_string(value: str, path: Path, errors: List[Violation]) -> None:
+        if min_length is not None and len(value) < min_length:
+            errors.append(Violation(path, f"vähintään {min_length} merkkiä, saatiin {len(value)}"))
+        if max_length is not None and len(value) > max_length:
+            errors.append(Violation(path, f"enintään {max_length} merkkiä, saatiin {len(value)}"))
+        if pattern is not None and not pattern.search(value):
+            errors.append(Violation(path, f"ei vastaa kaavaa {pattern.pattern!r}"))
+
+    return check_string
+
+
+def _compile_number(schema: Dict[str, Any]) -> Optional[Checker]:
+    # (avainsana, vertailu, kuvaus); rajat luetaan kerran käännöksen aikana
+    bounds = [(schema[keyword], compare, text) for keyword, compare, text in (
+        ("minimum", lambda value, limit: value >= limit, "vähintään"),
+        ("maximum", lambda value, limit: value <= limit, "enintään"),
+        ("exclusiveMinimum", lambda value, limit: value > limit, "suurempi kuin"),
+        ("exclusiveMaximum", lambda value, limit: value < limit, "pienempi kuin"),
+    ) if _is_number(schema.get(keyword))]
+    if not bounds:
+        return None
+
+    def check_number(value: Union[int, float], path: Path, errors: List[Violation]) -> None:
+        for limit, compare, text in bounds:
+            if not compare(value, limit):
+                errors.append(Violation(path, f"arvon pitää olla {text} {limit}, saatiin {value}"))
+
+    return check_number
+
+
+def _compile_enum(options: List[Any]) -> Checker:
+    # True == 1 Pythonissa, joten totuusarvot erotetaan luvuista vertailussa
+    keyed = [(isinstance(option, bool), option) for option in options]
+
+    def check_enum(value: Any, path: Path, errors: List[Violation]) -> None:
+        is_bool = isinstance(value, bool)
+        if not any(option_is_bool == is_bool and option == value for option_is_bool, option in keyed):
+            errors.append(Violation(path, f"arvon pitää olla yksi arvoista {options}, saatiin {value!r}"))
+
+    return check_enum
+
+
+def _compile(schema: Union[Dict[str, Any], bool]) -> Optional[Checker]:
+    """
+    Käännä skeeman solmu tarkistinfunktioksi.
+
+    Palauttaa None, jos solmu hyväksyy minkä tahansa arvon, jolloin kutsuja ohittaa
+    sen kokonaan eikä arvoa tarvitse käydä läpi.
+    """
+    if schema is True:
+        return None
+    if schema is False:
+        return lambda value, path, errors: errors.append(Violation(path, "arvoa ei sallita skeemassa"))
+    unsupported = _UNSUPPORTED.intersection(schema)
+    if unsupported:
+        raise ValueError(f"Skeeman avainsanaa ei tueta: {sorted(unsupported)[0]}")
+
+    type_names = schema.get("type")
+    if isinstance(type_names, str):
+        type_names = [type_names]
+    type_ok = _compile_type(type_names) if type_names else None
+    expected = " tai ".join(type_names) if type_names else ""
+
+    generic = []
+    if "enum" in schema:
+        generic.append(_compile_enum(schema["enum"]))
+    if "const" in schema:
+        generic.append(_compile_enum([schema["const"]]))
+    object_checker = _compile_object(schema)
+    array_checker = _compile_array(schema)
+    string_checker = _compile_string(schema)
+    number_checker = _compile_number(schema)
+
+    if type_ok is None and not generic and not any((object_checker, array_checker, string_checker, number_checker)):
+        return None
+
+    def check(value: Any, path: Path, errors: List[Violation]) -> None:
+        if type_ok is not None and not type_ok(value):
+            # Väärän tyyppisen arvon sisältöä ei tarkisteta, jotta yksi virhe ei monistu
+            errors.append(Violation(path, f"odotettiin tyyppiä {expected}, saatiin {json_type_name(value)}"))
+            return
+        for checker in generic:
+            checker(value, path, errors)
+        if isinstance(value, dict):
+            if object_checker is not None:
+                object_checker(value, path, errors)
+        elif isinstance(value, list):
+            if array_checker is not None:
+                array_checker(value, path, errors)
+        elif isinstance(value, str):
+            if string_checker is not None:
+                string_checker(value, path, errors)
+        elif number_checker is not None and _is_number(value):
+            number_checker(value, path, errors)
+
+    return check
+
+
+@lru_cache(maxsize=256)
+def _compile_cached(canonical: str) -> Validator:
+    checker = _compile(json.loads(canonical))
+
+    def validator(value: Any) -> List[Violation]:
+        errors: List[Violation] = []
+        if checker is not None:
+            checker(value, (), errors)
+        return errors
+
+    return validator
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """
+    Käännä JSON-skeema validointifunktioksi.
+
+    Skeema käydään läpi vain kerran: jokaisesta solmusta tehdään sulkeuma, joka
+    tarkistaa vain kyseisen solmun avainsanat, ja rajoituksettomat solmut jätetään
+    kokonaan pois. Käännetyt funktiot tallennetaan välimuistiin skeeman sisällön
+    mukaan, joten saman skeeman kääntäminen uudelleen palauttaa saman funktion.
+    Kuumassa silmukassa kannattaa silti säilyttää käännetty funktio itse.
+
+    Tuettu osajoukko: type, required, properties, additionalProperties, items,
+    minItems, maxItems, minLength, maxLength, pattern, minimum, maximum,
+    exclusiveMinimum, exclusiveMaximum, enum ja const. Kuvailevat avainsanat
+    (description, title, format, default) ohitetaan.
+
+    Args:
+        schema (Dict[str, Any]): JSON-skeema.
+
+    Returns:
+        Validator: Funktio, joka palauttaa arvon kaikki skeemarikkomukset (tyhjä lista, jos arvo on kelvollinen).
+
+    Raises:
+        ValueError: Jos skeema käyttää avainsanaa, jota kääntäjä ei tue.
+    """
+    return _compile_cached(json.dumps(schema, sort_keys=True))
+
+
+def validate(schema: Dict[str, Any], value: Any) -> None:
+    """
+    Tarkista arvo skeemaa vasten.
+
+    Raises:
+        SchemaValidationError: Jos arvossa on rikkomuksia; kaikki rikkomukset ovat virheen mukana.
+    """
+    violations = compile_schema(schema)(value)
+    if violations:
+        raise SchemaValidationError(violations)
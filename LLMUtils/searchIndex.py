@@ -0,0 +1,262 @@
+import os
+import re
+import json
+import math
+import time
+import hashlib
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from fileTools import iter_files, read_text
+
+# Indeksitiedostojen oletushakemisto, yksi tiedosto indeksoitavaa hakemistoa kohden
+DEFAULT_INDEX_DIR = os.getenv(
+    "SEARCH_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".search_index")
+)
+# Indeksoidaan vain tiedoston alku; suuret lokit eivät paisuta indeksiä
+MAX_INDEXED_BYTES = 512 * 1024
+# BM25-parametrit: termifrekvenssin kyllästyminen ja dokumentin pituuden normalisointi
+BM25_K1 = 1.5
+BM25_B = 0.75
+SNIPPETS_PER_FILE = 3
+# Hakutulosten oletus- ja enimmäismäärä
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 50
+# Hakemistopuu käydään läpi enintään kerran tässä ajassa (sekunteina); tiheämmät haut käyttävät nykyistä indeksiä
+DEFAULT_UPDATE_INTERVAL = 2.0
+INDEX_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Pilko teksti pienaakkosiksi sanoiksi (myös ääkköset), yksimerkkiset pois."""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if len(token) > 1]
+
+
+class SearchIndex:
+    """
+    Hakemiston käänteinen indeksi BM25-pisteytyksellä.
+
+    Jokaisesta tiedostosta tallennetaan mtime, koko, pituus sanoina ja termifrekvenssit.
+    update() indeksoi uudelleen vain muuttuneet tiedostot ja poistaa kadonneet, ja indeksi
+    tallennetaan levylle, joten seuraava käynnistys jatkaa siitä mihin edellinen jäi.
+    Katkelmat haetaan hakuhetkellä vain parhaiten pisteytetyistä tiedostoista.
+    Indeksin oma hakemisto jätetään indeksoimatta.
+    """
+    def __init__(self, directory: str = ".", index_path: Optional[str] = None,
+                 update_interval: float = DEFAULT_UPDATE_INTERVAL):
+        self.directory = directory
+        self.index_path = index_path or os.path.join(
+            DEFAULT_INDEX_DIR,
+            hashlib.sha256(os.path.abspath(directory).encode("utf-8")).hexdigest()[:16] + ".json"
+        )
+        self.update_interval = update_interval
+        self._index_dir = os.path.abspath(os.path.dirname(self.index_path)) + os.sep
+        self._last_update = -math.inf
+        self._lock = threading.Lock()
+        # polku -> {"mtime": ns, "size": tavua, "length": sanoja, "terms": {termi: frekvenssi}}
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        # termi -> {polku: frekvenssi}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        for path, doc in data["docs"].items():
+            self._add_doc(path, doc)
+
+    def save(self) -> None:
+        """Tallenna indeksi levylle atomisesti (kirjoitus väliaikaiseen tiedostoon ja vaihto)."""
+        with self._lock:
+            data = {"version": INDEX_VERSION, "directory": os.path.abspath(self.directory), "docs": self.docs}
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(data, file, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+
+    def _add_doc(self, path: str, doc: Dict[str, Any]) -> None:
+        self.docs[path] = doc
+        self.total_length += doc["length"]
+        for term, frequency in doc["terms"].items():
+            self.postings.setdefault(term, {})[path] = frequency
+
+    def _remove_doc(self, path: str) -> None:
+        doc = self.docs.pop(path)
+        self.total_length -= doc["length"]
+        for term in doc["terms"]:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(path, None)
+                if not postings:
+                    del self.postings[term]
+
+    def update(self, force: bool = False) -> Dict[str, int]:
+        """
+        Synkronoi indeksi hakemiston kanssa.
+
+        Tiedosto luetaan vain, jos sen mtime tai koko on muuttunut. Indeksi tallennetaan,
+        jos jotain muuttui. Jos edellisestä läpikäynnistä on alle update_interval sekuntia,
+        hakemistoa ei käydä uudelleen läpi.
+
+        Args:
+            force (bool): Käy hakemisto läpi aikarajasta riippumatta.
+
+        Returns:
+            Dict[str, int]: Lisättyjen, päivitettyjen ja poistettujen tiedostojen määrät.
+        """
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        seen = set()
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_update < self.update_interval:
+                return counts
+            self._last_update = now
+            for path in iter_files(self.directory):
+                if os.path.abspath(path).startswith(self._index_dir):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                seen.add(path)
+                doc = self.docs.get(path)
+                if doc and doc["mtime"] == stat.st_mtime_ns and doc["size"] == stat.st_size:
+                    continue
+
+                try:
+                    text = read_text(path, MAX_INDEXED_BYTES)
+                except OSError:
+                    text = None
+                if doc:
+                    self._remove_doc(path)
+                    counts["updated"] += 1
+                else:
+                    counts["added"] += 1
+                tokens = tokenize(text) if text else []
+                # Binääritiedostot merkitään tyhjinä, jotta niitä ei lueta joka kerta uudelleen
+                self._add_doc(path, {"mtime": stat.st_mtime_ns, "size": stat.st_size,
+                                     "length": len(tokens), "terms": dict(Counter(tokens))})
+
+            for path in [path for path in self.docs if path not in seen]:
+                self._remove_doc(path)
+                counts["removed"] += 1
+
+        if any(counts.values()):
+            self.save()
+        return counts
+
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+        """
+        Hae kyselyä parhaiten vastaavat tiedostot BM25-pisteillä.
+
+        Args:
+            query (str): Hakusanat.
+            top_k (int): Palautettavien tiedostojen enimmäismäärä, vähintään 1 ja rajataan MAX_TOP_K:hon.
+
+        Returns:
+            List[Dict[str, Any]]: Tulokset parhaasta alkaen muodossa
+            {"file", "score", "snippets": [{"line", "text"}, ...]}.
+
+        Raises:
+            ValueError: Jos top_k on pienempi kuin 1.
+        """
+        if top_k < 1:
+            raise ValueError(f"top_k pitää olla vähintään 1, saatiin {top_k}")
+        top_k = min(top_k, MAX_TOP_K)
+        terms = set(tokenize(query))
+        with self._lock:
+            doc_count = len(self.docs)
+            if not terms or not doc_count:
+                return []
+            average_length = self.total_length / doc_count or 1.0
+
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for path, frequency in postings.items():
+                    length_norm = 1 - BM25_B + BM25_B * self.docs[path]["length"] / average_length
+                    scores[path] = scores.get(path, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [{"file": path, "score": round(score, 4), "snippets": self._snippets(path, terms)}
+                for path, score in best]
+
+    @staticmethod
+    def _snippets(path: str, terms: set) -> List[Dict[str, Any]]:
+        """Poimi tiedostosta rivit, joilla on eniten hakusanoja."""
+        try:
+            text = read_text(path, MAX_INDEXED_BYTES) or ""
+        except OSError:
+            return []
+        scored = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            hits = len(terms.intersection(tokenize(line)))
+            if hits:
+                scored.append((hits, number, line.strip()[:200]))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [{"line": number, "text": line} for _, number, line in scored[:SNIPPETS_PER_FILE]]
+
+
+_indexes: Dict[str, SearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(directory: str = ".") -> SearchIndex:
+    """Palauta hakemiston indeksi; sama olio jaetaan kaikkien kutsujen kesken."""
+    key = os.path.abspath(directory)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = SearchIndex(directory)
+        return _indexes[key]
+
+
+def search_files(query: str, directory: str = ".", top_k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+    """
+    Hae hakemiston tiedostoista ja palauta osuvimmat katkelmat rivinumeroineen.
+
+    Indeksi päivitetään ennen hakua (enintään kerran DEFAULT_UPDATE_INTERVAL-ajassa),
+    ja vain muuttuneet tiedostot luetaan uudelleen.
+
+    Args:
+        query (str): Hakusanat.
+        directory (str): Hakemisto, josta haetaan.
+        top_k (int): Palautettavien tiedostojen enimmäismäärä, 1..MAX_TOP_K.
+
+    Returns:
+        List[Dict[str, Any]]: Tulokset muodossa {"file", "score", "snippets"}.
+
+    Raises:
+        ValueError: Jos top_k on pienempi kuin 1.
+    """
+    if top_k < 1:
+        raise ValueError(f"top_k pitää olla vähintään 1, saatiin {top_k}")
+    index = get_index(directory)
+    index.update()
+    return index.search(query, top_k)
+
+
+# Työkalun kuvaus LLM:lle
+SEARCH_FILES_PARAMETERS = {
+    "type": "object",
+    "properties": {
+        "query": {"type": "string", "description": "Hakusanat."},
+        "directory": {"type": "string", "description": "Hakemisto, josta haetaan, oletus \".\"."},
+        "top_k": {"type": "integer", "minimum": 1, "maximum": MAX_TOP_K,
+                  "description": f"Tiedostojen enimmäismäärä, oletus {DEFAULT_TOP_K}."}
+    },
+    "required": ["query"]
+}
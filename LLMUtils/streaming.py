@@ -0,0 +1,156 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from toolCalls import DEFAULT_MAX_WORKERS, run_tool
+
+
+def stream_enabled() -> bool:
+    """
+    Keskusteluskriptien striimauksen voi kytkeä pois ympäristömuuttujalla LLM_STREAM=off.
+
+    Vastausten välimuisti kytketään vastaavasti päälle muuttujalla LLM_CACHE=on (llmCache.cache_enabled).
+    """
+    return os.getenv("LLM_STREAM", "on").lower() not in ("0", "off", "false", "no")
+
+
+def print_token(token: str) -> None:
+    """Tulosta token heti ilman rivinvaihtoa."""
+    print(token, end="", flush=True)
+
+
+def prefixed_printer(prefix: str) -> Callable[[str], None]:
+    """Palauta on_token-funktio, joka tulostaa etuliitteen ennen ensimmäistä tokenia."""
+    started = False
+
+    def on_token(token: str) -> None:
+        nonlocal started
+        if not started:
+            print(prefix, end="", flush=True)
+            started = True
+        print_token(token)
+
+    return on_token
+
+
+class ToolCallAssembler:
+    """
+    Kokoaa työkalukutsut striimatuista delta-paloista ja käynnistää työkalun heti,
+    kun sen parametrien JSON on valmis, odottamatta koko viestin loppua.
+    """
+    def __init__(self, tool_functions: Dict[str, Callable], executor: ThreadPoolExecutor,
+                 on_dispatch: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.tool_functions = tool_functions
+        self.executor = executor
+        self.on_dispatch = on_dispatch
+        # Kutsut indeksin mukaan: {"name": ..., "arguments": ..., "action": ..., "future": ...}
+        self.calls: Dict[int, Dict[str, Any]] = {}
+
+    def add_delta(self, tool_call_delta) -> None:
+        """Lisää yksi striimattu työkalukutsun pala."""
+        index = tool_call_delta.index if tool_call_delta.index is not None else len(self.calls)
+        # Uuden kutsun alkaminen tarkoittaa, että edelliset ovat valmiita
+        for previous in [i for i in self.calls if i < index]:
+            self._dispatch(previous, final=True)
+
+        call = self.calls.setdefault(index, {"name": "", "arguments": "", "action": None, "future": None})
+        function = tool_call_delta.function
+        if function is not None:
+            call["name"] += function.name or ""
+            call["arguments"] += function.arguments or ""
+        self._dispatch(index, final=False)
+
+    def finish(self) -> None:
+        """Merkitse striimi päättyneeksi ja käynnistä loput kutsut."""
+        for index in sorted(self.calls):
+            self._dispatch(index, final=True)
+
+    def _dispatch(self, index: int, final: bool) -> None:
+        call = self.calls[index]
+        if call["action"] is not None:
+            return
+
+        arguments = call["arguments"].strip() or ("{}" if final else "")
+        # Objektin JSON voi olla valmis vasta, kun se päättyy aaltosulkeeseen
+        if not arguments.endswith("}"):
+            if not final:
+                return
+            call["action"] = {"tool_name": call["name"], "args": {},
+                              "error": f"Invalid arguments for {call['name']}: {call['arguments']!r}"}
+        else:
+            try:
+                call["action"] = {"tool_name": call["name"], "args": json.loads(arguments)}
+            except json.JSONDecodeError as e:
+                if not final:
+                    return
+                call["action"] = {"tool_name": call["name"], "args": {},
+                                  "error": f"Invalid arguments for {call['name']}: {str(e)}"}
+
+        if call["action"]["tool_name"] != "terminate":
+            call["future"] = self.executor.submit(run_tool, self.tool_functions, call["action"])
+        if self.on_dispatch:
+            self.on_dispatch(call["action"])
+
+    def actions(self) -> List[Dict[str, Any]]:
+        """Palauta valmiit toiminnot kutsujärjestyksessä."""
+        return [self.calls[index]["action"] for index in sorted(self.calls)]
+
+    def results(self) -> List[Dict[str, Any]]:
+        """Odota työkalujen tulokset kutsujärjestyksessä (ilman terminate-kutsuja)."""
+        return [self.calls[index]["future"].result() for index in sorted(self.calls)
+                if self.calls[index]["future"] is not None]
+
+
+def stream_step(llm: Callable, tool_functions: Dict[str, Callable],
+                on_token: Callable[[str], None] = print_token,
+                max_workers: int = DEFAULT_MAX_WORKERS, **request) -> Dict[str, Any]:
+    """
+    Tee yksi striimattu LLM-kutsu ja suorita sen työkalukutsut niiden valmistuessa.
+
+    Args:
+        llm (Callable): LLM-kutsu, esim. litellm:n completion.
+        tool_functions (Dict[str, Callable]): Työkalujen nimet ja niitä vastaavat funktiot.
+        on_token (Callable[[str], None]): Kutsutaan jokaiselle tekstitokenille.
+        max_workers (int): Samanaikaisesti suoritettavien työkalujen enimmäismäärä.
+        **request: LLM-kutsun parametrit (model, messages, tools, ...).
+
+    Returns:
+        Dict[str, Any]: Koottu tekstisisältö, toiminnot, työkalujen tulokset sekä
+        ajat ensimmäiseen tokeniin ja ensimmäiseen toimintoon sekunteina.
+    """
+    start = time.perf_counter()
+    timings = {"first_token": None, "first_action": None}
+    content = []
+
+    def mark_action(action: Dict[str, Any]) -> None:
+        if timings["first_action"] is None:
+            timings["first_action"] = time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        assembler = ToolCallAssembler(tool_functions, executor, on_dispatch=mark_action)
+
+        for chunk in llm(stream=True, **request):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                if timings["first_token"] is None:
+                    timings["first_token"] = time.perf_counter() - start
+                content.append(delta.content)
+                on_token(delta.content)
+            for tool_call_delta in delta.tool_calls or []:
+                assembler.add_delta(tool_call_delta)
+
+        assembler.finish()
+        results = assembler.results()
+
+    return {
+        "content": "".join(content) or None,
+        "actions": assembler.actions(),
+        "results": results,
+        "first_token": timings["first_token"],
+        "first_action": timings["first_action"],
+        "total": time.perf_counter() - start,
+    }
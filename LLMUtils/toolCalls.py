@@ -0,0 +1,81 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from tracing import payload_size, span
+
+# Kuinka monta työkalua suoritetaan korkeintaan yhtä aikaa
+DEFAULT_MAX_WORKERS = 4
+
+
+def parse_tool_call(tool_call) -> Dict[str, Any]:
+    """
+    Muunna LLM:n palauttama työkalukutsu toiminto-objektiksi.
+
+    Args:
+        tool_call: Vastauksen `message.tool_calls`-listan alkio.
+
+    Returns:
+        Dict[str, Any]: Toiminto muodossa {"tool_name": ..., "args": ...}. Jos parametrit
+        eivät ole kelvollista JSONia, mukana on myös "error"-avain.
+    """
+    tool_name = tool_call.function.name
+    arguments = tool_call.function.arguments or "{}"
+    with span("parse", tool=tool_name, bytes=len(arguments)):
+        try:
+            tool_args = json.loads(arguments)
+        except json.JSONDecodeError as e:
+            return {"tool_name": tool_name, "args": {}, "error": f"Invalid arguments for {tool_name}: {str(e)}"}
+    return {"tool_name": tool_name, "args": tool_args}
+
+
+def run_tool(tool_functions: Dict[str, Callable], action: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Suorita yksi toiminto ja palauta sen tulos tai virhe.
+
+    Args:
+        tool_functions (Dict[str, Callable]): Työkalujen nimet ja niitä vastaavat funktiot.
+        action (Dict[str, Any]): parse_tool_call-funktion palauttama toiminto.
+
+    Returns:
+        Dict[str, Any]: {"result": ...} onnistuessa tai {"error": ...} virhetilanteessa.
+    """
+    if "error" in action:
+        return {"error": action["error"]}
+
+    tool_name = action["tool_name"]
+    if tool_name not in tool_functions:
+        return {"error": f"Unknown tool: {tool_name}"}
+
+    with span("tool", tool=tool_name) as s:
+        try:
+            result = {"result": tool_functions[tool_name](**action["args"])}
+        except Exception as e:
+            result = {"error": f"Error executing {tool_name}: {str(e)}"}
+        if s.recording:
+            s.set(bytes=payload_size(result), ok="error" not in result)
+    return result
+
+
+def execute_tool_calls(tool_functions: Dict[str, Callable], actions: List[Dict[str, Any]],
+                       max_workers: int = DEFAULT_MAX_WORKERS) -> List[Dict[str, Any]]:
+    """
+    Suorita kaikki yhden LLM-vastauksen toiminnot rinnakkain rajatussa säiejoukossa.
+
+    Tulokset palautetaan samassa järjestyksessä kuin toiminnot, ja jokaisen kutsun virhe
+    pysyy omassa tuloksessaan, joten yksi epäonnistunut työkalu ei kaada muita.
+
+    Args:
+        tool_functions (Dict[str, Callable]): Työkalujen nimet ja niitä vastaavat funktiot.
+        actions (List[Dict[str, Any]]): Suoritettavat toiminnot.
+        max_workers (int): Samanaikaisesti suoritettavien työkalujen enimmäismäärä.
+
+    Returns:
+        List[Dict[str, Any]]: Toimintojen tulokset alkuperäisessä järjestyksessä.
+    """
+    if len(actions) <= 1:
+        # Yhdelle kutsulle ei kannata käynnistää säiejoukkoa
+        return [run_tool(tool_functions, action) for action in actions]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(actions))) as executor:
+        return list(executor.map(lambda action: run_tool(tool_functions, action), actions))
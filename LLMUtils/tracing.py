@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import threading
+import statistics
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+# Kuinka monta viimeisintä spania (ja kestoa vaihetta kohden p95-laskentaan) pidetään muistissa
+DEFAULT_MAX_SPANS = 10_000
+
+# Käynnissä oleva span, jotta sisäkkäiset spanit saavat vanhempansa tunnisteen
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """Yksi mitattu vaihe: nimi, kesto ja vapaamuotoiset attribuutit (tokenit, tavut, ...)."""
+    recording = True
+
+    def __init__(self, name: str, parent: Optional["Span"], attrs: Dict[str, Any]):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration = 0.0
+
+    def set(self, **attrs) -> None:
+        """Lisää spanille attribuutteja."""
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration * 1000,
+            "thread": threading.current_thread().name,
+            **self.attrs,
+        }
+
+
+class _NullSpan:
+    """Span, jota käytetään jäljityksen ollessa pois päältä. Ei tallenna mitään."""
+    recording = False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Kerää agenttisilmukan vaiheiden spanit, kirjoittaa ne JSONL-tiedostoon
+    ja tulostaa yhteenvedon ohjelman päättyessä.
+
+    Muistissa pidetään vain max_spans viimeisintä spania. Yhteenvedon määrät ja
+    summat päivitetään jokaisen spanin valmistuessa, joten ne kattavat koko ajon,
+    ja p95 lasketaan kunkin vaiheen max_spans viimeisimmästä kestosta.
+
+    Args:
+        path (Optional[str]): JSONL-tiedosto, johon jokainen valmis span lisätään. None = ei tiedostoa.
+        enabled (bool): Pois päältä span() palauttaa tyhjän spanin eikä mittaa mitään.
+        max_spans (int): Muistissa pidettävien spanien enimmäismäärä.
+    """
+    def __init__(self, path: Optional[str] = None, enabled: bool = True, max_spans: int = DEFAULT_MAX_SPANS):
+        self.path = path
+        self.enabled = enabled
+        self.max_spans = max_spans
+        self.spans: Deque[Dict[str, Any]] = deque(maxlen=max_spans)
+        # nimi -> {"count", "total_ms", "tokens", "bytes", "durations": viimeisimmät kestot}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8") if path and enabled else None
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Any]:
+        """
+        Mittaa with-lohkon keston nimettynä spanina.
+
+        Kutsuja voi lisätä attribuutteja span.set(...)-metodilla. Kalliit attribuutit
+        (esim. serialisoidun datan koko) kannattaa laskea vain, kun span.recording on tosi.
+        """
+        if not self.enabled:
+            yield NULL_SPAN
+            return
+
+        span = Span(name, _current_span.get(), attrs)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Striimi voidaan sulkea eri kontekstissa kuin missä se avattiin
+                pass
+            self._finish(span)
+
+    def _finish(self, span: Span) -> None:
+        record = span.to_dict()
+        with self._lock:
+            self.spans.append(record)
+            stats = self._stats.get(span.name)
+            if stats is None:
+                stats = self._stats[span.name] = {"count": 0, "total_ms": 0.0, "tokens": 0, "bytes": 0,
+                                                  "durations": deque(maxlen=self.max_spans)}
+            stats["count"] += 1
+            stats["total_ms"] += record["duration_ms"]
+            stats["tokens"] += (record.get("prompt_tokens", 0) + record.get("completion_tokens", 0)
+                                + record.get("tokens", 0))
+            stats["bytes"] += record.get("bytes", 0)
+            stats["durations"].append(record["duration_ms"])
+            if self._file:
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                self._file.flush()
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        Laske vaihekohtaiset tilastot.
+
+        Returns:
+            List[Dict[str, Any]]: Rivi jokaiselle spanin nimelle: määrä, kokonais-, keski-
+            ja p95-kesto millisekunteina sekä tokenien ja tavujen summat.
+        """
+        with self._lock:
+            groups = {name: {**stats, "durations": sorted(stats["durations"])} for name, stats in self._stats.items()}
+
+        rows = []
+        for name, stats in groups.items():
+            durations = stats["durations"]
+            p95 = statistics.quantiles(durations, n=100, method="inclusive")[94] if len(durations) > 1 else durations[0]
+            rows.append({
+                "name": name,
+                "count": stats["count"],
+                "total_ms": stats["total_ms"],
+                "mean_ms": stats["total_ms"] / stats["count"],
+                "p95_ms": p95,
+                "tokens": stats["tokens"],
+                "bytes": stats["bytes"],
+            })
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def print_summary(self) -> None:
+        """Tulosta yhteenvetotaulukko, jos spaneja on kerätty."""
+        rows = self.summary()
+        if not rows:
+            return
+        print(f"\n{'vaihe':<16}{'määrä':>8}{'yht. ms':>12}{'ka. ms':>10}{'p95 ms':>10}{'tokenit':>10}{'tavut':>12}")
+        for row in rows:
+            print(f"{row['name']:<16}{row['count']:>8}{row['total_ms']:>12.1f}{row['mean_ms']:>10.2f}"
+                  f"{row['p95_ms']:>10.2f}{row['tokens']:>10}{row['bytes']:>12}")
+        if self.path:
+            print(f"Jäljitys tallennettu: {self.path}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """
+    Palauta prosessin yhteinen Tracer.
+
+    LLM_TRACE=polku ottaa jäljityksen käyttöön ja kirjoittaa spanit tiedostoon,
+    LLM_TRACE=1 pelkän yhteenvedon. Yhteenveto tulostetaan ohjelman päättyessä.
+    Ilman muuttujaa jäljitys on pois päältä.
+    """
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                setting = os.getenv("LLM_TRACE", "")
+                enabled = setting.lower() not in ("", "0", "off", "false", "no")
+                path = setting if enabled and setting.lower() not in ("1", "on", "true", "yes") else None
+                _tracer = Tracer(path, enabled=enabled)
+                if enabled:
+                    atexit.register(_tracer.close)
+                    atexit.register(_tracer.print_summary)
+    return _tracer
+
+
+def span(name: str, **attrs):
+    """Lyhenne: get_tracer().span(name, **attrs)."""
+    return get_tracer().span(name, **attrs)
+
+
+def payload_size(value: Any) -> int:
+    """Arvon koko tavuina JSON-muodossa (merkkijonot sellaisenaan)."""
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    return len(value.encode("utf-8"))
+
+
+def record_usage(span, response: Any) -> None:
+    """Kirjaa LLM-vastauksen tokenimäärät spanille, jos vastaus sisältää ne."""
+    usage = getattr(response, "usage", None)
+    if span.recording and usage:
+        span.set(prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                 completion_tokens=getattr(usage, "completion_tokens", 0) or 0)
+
+
+def traced_llm(llm: Callable) -> Callable:
+    """
+    Kääri LLM-kutsu niin, että jokainen kutsu mitataan "llm"-spanina.
+
+    Spaniin kirjataan pyynnön koko tavuina ja vastauksen tokenit. Striimatussa
+    kutsussa span kattaa koko striimin lukemisen. Jäljityksen ollessa pois päältä
+    palautetaan alkuperäinen kutsu, joten kääre ei maksa mitään.
+    """
+    tracer = get_tracer()
+    if not tracer.enabled:
+        return llm
+
+    def call(**request):
+        if request.get("stream"):
+            return _traced_stream(tracer, llm, request)
+        with tracer.span("llm", model=request.get("model"), bytes=payload_size(request.get("messages", []))) as s:
+            response = llm(**request)
+            record_usage(s, response)
+            return response
+    return call
+
+
+def _traced_stream(tracer: Tracer, llm: Callable, request: Dict[str, Any]) -> Iterator:
+    with tracer.span("llm", model=request.get("model"), stream=True,
+                     bytes=payload_size(request.get("messages", []))) as s:
+        chunks = 0
+        for chunk in llm(**request):
+            chunks += 1
+            record_usage(s, chunk)
+            yield chunk
+        s.set(chunks=chunks)
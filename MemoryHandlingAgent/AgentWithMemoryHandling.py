@@ -1,7 +1,10 @@
 import os
+import sys
 from dotenv import load_dotenv
-from litellm import completion
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from llmCache import cached_completion
 
 # Lataa ympäristömuuttujat .env-tiedostosta
 load_dotenv()
@@ -16,9 +19,9 @@ if not api_key:
 os.environ["OPENAI_API_KEY"] = api_key
 
 
-def generate_response(messages: List[Dict]) -> str:
+def generate_response(messages: List[Dict], use_cache: Optional[bool] = None) -> str:
     """Call LLM to get response"""
-    response = completion(model="openai/gpt-4o", messages=messages, max_tokens=1024)
+    response = cached_completion(model="openai/gpt-4o", messages=messages, max_tokens=1024, use_cache=use_cache)
     return response.choices[0].message.content
 
 
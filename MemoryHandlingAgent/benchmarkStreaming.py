@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import importlib.util
+from types import ModuleType
+from typing import Dict
+
+# Benchmark käyttää paikallista testipalvelinta, joten oikeaa API-avainta ei tarvita
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-key")
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from mockLLMServer import build_completion, start_server
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Skriptit, joiden generate_response-funktiota mitataan
+SCRIPT_FILES = {
+    "Alpotti": os.path.join(REPO_ROOT, "AltzoneLLM", "Alpotti.py"),
+    "readingFiles": os.path.join(REPO_ROOT, "MemoryHandlingAgent", "readingFiles.py"),
+    "example2": os.path.join(REPO_ROOT, "MemoryHandlingAgent", "example2.py"),
+}
+ANSWER = "Hannu Hodari on pelin sankari, joka puolustaa ystäviään ja suojelee muita hahmoja. " * 6
+MESSAGES = [{"role": "user", "content": "Kuka on Hannu Hodari?"}]
+
+
+def load_module(path: str) -> ModuleType:
+    """Lataa skripti moduulina sen tiedostopolusta."""
+    sys.path.append(os.path.dirname(path))
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(generate_response, stream: bool) -> Dict[str, float]:
+    """Mittaa aika ensimmäiseen näytettävään tokeniin ja koko vastaukseen sekunteina."""
+    first = None
+    start = time.perf_counter()
+
+    def on_token(token: str) -> None:
+        nonlocal first
+        if first is None:
+            first = time.perf_counter() - start
+
+    response = generate_response(MESSAGES, use_cache=False, on_token=on_token if stream else None)
+    total = time.perf_counter() - start
+    assert response == ANSWER
+    # Ilman striimausta mitään ei näytetä ennen kuin koko vastaus on saapunut
+    return {"first": first if stream else total, "total": total}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Striimatun ja odottavan vastauksen TTFT- ja kokonaisaika")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3, help="viive ennen ensimmäistä tavua")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="striimattujen palojen nopeus")
+    args = parser.parse_args()
+
+    server, api_base = start_server(latency=args.latency, token_delay=1 / args.tokens_per_second,
+                                    reply=lambda request: build_completion(request.get("model", "gpt-4o"), content=ANSWER))
+    # Skriptien generate_response lukee LLM:n osoitteen ympäristöstä
+    os.environ["OPENAI_API_BASE"] = api_base
+
+    print(f"{'Skripti / tila':<28}{'TTFT (ms)':>12}{'Kokonais (ms)':>16}")
+    for name, path in SCRIPT_FILES.items():
+        generate_response = load_module(path).generate_response
+        for stream in (False, True):
+            runs = [measure(generate_response, stream) for _ in range(args.rounds)]
+            first = statistics.mean(run["first"] for run in runs) * 1000
+            total = statistics.mean(run["total"] for run in runs) * 1000
+            label = f"{name} / {'striimattu' if stream else 'odottava'}"
+            print(f"{label:<28}{first:>12.0f}{total:>16.0f}")
+
+    server.shutdown()
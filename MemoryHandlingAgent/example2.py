@@ -1,7 +1,11 @@
 import os
+import sys
 from dotenv import load_dotenv
-from litellm import completion
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from llmCache import cached_completion, cached_stream_completion
+from streaming import prefixed_printer, stream_enabled
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,9 +20,13 @@ if not api_key:
 os.environ["OPENAI_API_KEY"] = api_key
 
 
-def generate_response(messages: List[Dict]) -> str:
-    """Call LLM to get response"""
-    response = completion(model="openai/gpt-4o", messages=messages, max_tokens=1024)
+def generate_response(messages: List[Dict], use_cache: Optional[bool] = None,
+                      on_token: Optional[Callable[[str], None]] = None) -> str:
+    """Call LLM to get response; with on_token the response is streamed token by token"""
+    if on_token is not None:
+        return cached_stream_completion(on_token, model="openai/gpt-4o", messages=messages, max_tokens=1024,
+                                        use_cache=use_cache)
+    response = cached_completion(model="openai/gpt-4o", messages=messages, max_tokens=1024, use_cache=use_cache)
     return response.choices[0].message.content
 
 
@@ -35,9 +43,15 @@ def main():
         },
     ]
 
-    # Get initial response
-    initial_response = generate_response(messages)
-    print("Initial response:", initial_response)
+    # Get initial response, printing tokens as they arrive unless LLM_STREAM=off
+    # (answers are cached only with LLM_CACHE=on, so repeated prompts hit the model by default)
+    stream = stream_enabled()
+    if stream:
+        initial_response = generate_response(messages, on_token=prefixed_printer("Initial response: "))
+        print()
+    else:
+        initial_response = generate_response(messages)
+        print("Initial response:", initial_response)
 
     # Add the assistant's response to the messages
     messages.append({"role": "assistant", "content": initial_response})
@@ -48,8 +62,12 @@ def main():
     )
 
     # Get updated response
-    updated_response = generate_response(messages)
-    print("Updated response:", updated_response)
+    if stream:
+        generate_response(messages, on_token=prefixed_printer("Updated response: "))
+        print()
+    else:
+        updated_response = generate_response(messages)
+        print("Updated response:", updated_response)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,11 @@
 import os
+import sys
 from dotenv import load_dotenv
-from litellm import completion
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from llmCache import cached_completion, cached_stream_completion
+from streaming import prefixed_printer, stream_enabled
 
 # Lataa ympäristömuuttujat .env-tiedostosta
 load_dotenv()
@@ -17,17 +21,24 @@ if not api_key:
 os.environ["OPENAI_API_KEY"] = api_key
 
 
-def generate_response(messages: List[Dict]) -> str:
+def generate_response(messages: List[Dict], use_cache: Optional[bool] = None,
+                      on_token: Optional[Callable[[str], None]] = None) -> str:
     """
     Lähetä viestihistoria LLM:lle ja palauta sen vastaus.
 
     Args:
         messages (List[Dict]): Lista viesteistä, jotka sisältävät käyttäjän ja avustajan vuorovaikutuksen.
+        use_cache (Optional[bool]): False ohittaa LLM-vastausten välimuistin, None seuraa LLM_CACHE-muuttujaa.
+        on_token (Optional[Callable[[str], None]]): Jos annettu, vastaus striimataan ja
+            jokainen token annetaan tälle funktiolle heti sen saapuessa.
 
     Returns:
-        str: LLM:n tuottama vastaus viestihistorian perusteella.
+        str: LLM:n tuottama (koottu) vastaus viestihistorian perusteella.
     """
-    response = completion(model="openai/gpt-4o", messages=messages, max_tokens=1024)
+    if on_token is not None:
+        return cached_stream_completion(on_token, model="openai/gpt-4o", messages=messages, max_tokens=1024,
+                                        use_cache=use_cache)
+    response = cached_completion(model="openai/gpt-4o", messages=messages, max_tokens=1024, use_cache=use_cache)
     return response.choices[0].message.content
 
 
@@ -70,71 +81,76 @@ def read_file(file_name: str) -> str:
         return f"Error: {str(e)}"
 
 
-# Alustetaan keskusteluhistoria, jossa määritellään avustajan rooli
-messages = [
-    {
-        "role": "system",
-        "content": (
-            "Olet asiantunteva ohjelmistoinsinööri, joka voi suorittaa seuraavat toiminnot:\n"
-            "- Listaa tiedostot hakemistossa (list_files_in_directory).\n"
-            "- Lue tiedoston sisältö (read_file).\n"
-            "Vastaa aina toimintamuodossa, esimerkiksi:\n"
-            "```action\n{\"tool_name\": \"list_files_in_directory\", \"args\": {\"directory\": \".\"}}\n```"
-        ),
-    }
-]
-
-# Pääohjelman silmukka
-while True:
-    # Listaa tiedostot ja pyydä käyttäjää valitsemaan tiedosto
-    print("\nHakemiston tiedostot:")
-    files = list_files_in_directory()
-    for idx, file_name in enumerate(files, start=1):
-        print(f"{idx}. {file_name}")
-
-    user_input = input("\nKäyttäjä: Valitse tiedoston numero tai kirjoita 'exit' lopettaaksesi: ").strip()
-    if user_input.lower() == "exit":
-        print("Ohjelma lopetettu.")
-        break
-
-    # Tarkista, onko syöte validi numero
-    if user_input.isdigit():
-        file_index = int(user_input) - 1
-        if 0 <= file_index < len(files):
-            selected_file = files[file_index]
-            print(f"Valitsit tiedoston: {selected_file}")
+if __name__ == "__main__":
+    # Alustetaan keskusteluhistoria, jossa määritellään avustajan rooli
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "Olet asiantunteva ohjelmistoinsinööri, joka voi suorittaa seuraavat toiminnot:\n"
+                "- Listaa tiedostot hakemistossa (list_files_in_directory).\n"
+                "- Lue tiedoston sisältö (read_file).\n"
+                "Vastaa aina toimintamuodossa, esimerkiksi:\n"
+                "```action\n{\"tool_name\": \"list_files_in_directory\", \"args\": {\"directory\": \".\"}}\n```"
+            ),
+        }
+    ]
+
+    # Pääohjelman silmukka
+    while True:
+        # Listaa tiedostot ja pyydä käyttäjää valitsemaan tiedosto
+        print("\nHakemiston tiedostot:")
+        files = list_files_in_directory()
+        for idx, file_name in enumerate(files, start=1):
+            print(f"{idx}. {file_name}")
+
+        user_input = input("\nKäyttäjä: Valitse tiedoston numero tai kirjoita 'exit' lopettaaksesi: ").strip()
+        if user_input.lower() == "exit":
+            print("Ohjelma lopetettu.")
+            break
+
+        # Tarkista, onko syöte validi numero
+        if user_input.isdigit():
+            file_index = int(user_input) - 1
+            if 0 <= file_index < len(files):
+                selected_file = files[file_index]
+                print(f"Valitsit tiedoston: {selected_file}")
+            else:
+                print("Virhe: Valitsemasi numero ei vastaa mitään tiedostoa.")
+                continue
         else:
-            print("Virhe: Valitsemasi numero ei vastaa mitään tiedostoa.")
+            print("Virhe: Anna tiedoston numero tai kirjoita 'exit'.")
             continue
-    else:
-        print("Virhe: Anna tiedoston numero tai kirjoita 'exit'.")
-        continue
 
-    # Lue valitun tiedoston sisältö
-    file_content = read_file(selected_file)
-    if "Error" in file_content:
-        print(f"Tiedoston '{selected_file}' lukeminen epäonnistui: {file_content}")
-        continue
+        # Lue valitun tiedoston sisältö
+        file_content = read_file(selected_file)
+        if "Error" in file_content:
+            print(f"Tiedoston '{selected_file}' lukeminen epäonnistui: {file_content}")
+            continue
 
-    # Päivitä keskusteluhistoria tiedoston sisällöllä
-    messages.append({"role": "user", "content": f"Lue tiedoston '{selected_file}' sisältö."})
-    messages.append({"role": "assistant", "content": f"Tiedoston '{selected_file}' sisältö on tallennettu muistiin."})
+        # Päivitä keskusteluhistoria tiedoston sisällöllä
+        messages.append({"role": "user", "content": f"Lue tiedoston '{selected_file}' sisältö."})
+        messages.append({"role": "assistant", "content": f"Tiedoston '{selected_file}' sisältö on tallennettu muistiin."})
 
-    print(f"Tiedoston '{selected_file}' sisältö on tallennettu muistiin.")
+        print(f"Tiedoston '{selected_file}' sisältö on tallennettu muistiin.")
 
-    # Kysytään käyttäjältä, mitä hän haluaa tietää tiedostosta
-    while True:
-        question = input("\nKäyttäjä: Mitä haluat tietää tästä tiedostosta? (Kirjoita 'back' palataksesi tiedoston valintaan): ").strip()
-        if question.lower() == "back":
-            print("Palataan tiedoston valintaan.")
-            break
+        # Kysytään käyttäjältä, mitä hän haluaa tietää tiedostosta
+        while True:
+            question = input("\nKäyttäjä: Mitä haluat tietää tästä tiedostosta? (Kirjoita 'back' palataksesi tiedoston valintaan): ").strip()
+            if question.lower() == "back":
+                print("Palataan tiedoston valintaan.")
+                break
 
-        # Lisää käyttäjän kysymys keskusteluhistoriaan
-        messages.append({"role": "user", "content": f"Tiedoston '{selected_file}' sisältö: {file_content}\nKysymys: {question}"})
+            # Lisää käyttäjän kysymys keskusteluhistoriaan
+            messages.append({"role": "user", "content": f"Tiedoston '{selected_file}' sisältö: {file_content}\nKysymys: {question}"})
 
-        # Lähetä kysymys LLM:lle ja tulosta vastaus
-        response = generate_response(messages)
-        print(f"Avustaja: {response}")
+            # Lähetä kysymys LLM:lle ja tulosta vastaus; striimattuna tokenit tulostuvat sitä mukaa kuin ne saapuvat
+            if stream_enabled():
+                response = generate_response(messages, on_token=prefixed_printer("Avustaja: "))
+                print()
+            else:
+                response = generate_response(messages)
+                print(f"Avustaja: {response}")
 
-        # Päivitä keskusteluhistoria avustajan vastauksella
-        messages.append({"role": "assistant", "content": response})
\ No newline at end of file
+            # Päivitä keskusteluhistoria avustajan vastauksella
+            messages.append({"role": "assistant", "content": response})
@@ -1,6 +1,10 @@
 import os
+import sys
+from typing import Optional
 from dotenv import load_dotenv
-from litellm import completion
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from llmCache import cached_completion
 
 # Lataa API-avain .env-tiedostosta
 load_dotenv()
@@ -16,9 +20,9 @@ os.environ["OPENAI_API_KEY"] = api_key
 messages = [{"role": "system", "content": "Olet avulias AI-avustaja."}]
 
 
-def generate_response():
+def generate_response(use_cache: Optional[bool] = None):
     """Kutsu LLM-mallia ja hanki vastaus keskusteluhistorian perusteella."""
-    response = completion(model="gpt-4o", messages=messages, max_tokens=512)
+    response = cached_completion(model="gpt-4o", messages=messages, max_tokens=512, use_cache=use_cache)
 
     # Varmista, että vastaus on kelvollinen
     if "choices" not in response or not response["choices"]:
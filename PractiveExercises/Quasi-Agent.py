@@ -1,9 +1,12 @@
-from litellm import completion
-from typing import List, Dict
+from typing import List, Dict, Optional
 from dotenv import load_dotenv
 import os
+import sys
 import re
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from llmCache import cached_completion
+
 # Lataa API-avain .env-tiedostosta
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
@@ -23,9 +26,9 @@ messages = [
 ]
 
 
-def generate_response():
+def generate_response(use_cache: Optional[bool] = None):
     """Kutsu LLM-mallia ja hanki vastaus keskusteluhistorian perusteella."""
-    response = completion(model="gpt-4o", messages=messages, max_tokens=512)
+    response = cached_completion(model="gpt-4o", messages=messages, max_tokens=512, use_cache=use_cache)
 
     # Varmista, että vastaus on kelvollinen
     if "choices" not in response or not response["choices"]:
@@ -1,53 +1,70 @@
 import os
-import json
+import sys
 from dotenv import load_dotenv
-from litellm import completion
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Union
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "LLMUtils"))
+from cassette import cassette_from_env
+from conversationBuffer import ConversationBuffer
+from fileTools import DEFAULT_PAGE_SIZE, LIST_FILES_PARAMETERS, READ_FILE_PARAMETERS, iter_folder, list_files_page, read_file_range
+from llmCache import cached_completion
+from searchIndex import SEARCH_FILES_PARAMETERS, search_files
+from toolCalls import execute_tool_calls, parse_tool_call
+from tracing import span, traced_llm
+from streaming import prefixed_printer, stream_step
 
 # Lataa ympäristömuuttujat .env-tiedostosta
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
 
-# Tarkista, että API-avain on asetettu
-if not api_key:
-    raise ValueError("API-avain puuttuu! Lisää se .env-tiedostoon.")
 
-# Aseta API-avain ympäristömuuttujaksi LiteLLM:ää varten
-os.environ["OPENAI_API_KEY"] = api_key
-
-
-# Funktio: Listaa kaikki tiedostot ja kansiot annetussa hakemistossa
-def list_files(directory: str = ".") -> List[str]:
+# Funktio: Listaa tiedostot annetussa hakemistossa sivu kerrallaan
+def list_files(directory: str = ".", include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+               max_depth: Optional[int] = None, cursor: Optional[str] = None,
+               page_size: int = DEFAULT_PAGE_SIZE) -> Dict:
     """
-    Listaa kaikki tiedostot ja kansiot annetussa hakemistossa.
+    Listaa yksi sivu annetun hakemiston tiedostoista.
+
+    Hakemistopuu käydään läpi os.scandir-generaattorilla, joten koko listausta ei
+    rakenneta muistiin eikä lähetetä LLM:lle kerralla. .gitignore-säännöt huomioidaan.
 
     Args:
         directory (str): Hakemisto, jonka sisältö listataan. Oletuksena nykyinen hakemisto.
+        include (Optional[List[str]]): Globit, joihin tiedostojen on täsmättävä, esim. ["*.json"].
+        exclude (Optional[List[str]]): Globit, joihin täsmäävät tiedostot ja kansiot ohitetaan.
+        max_depth (Optional[int]): Alihakemistojen enimmäissyvyys, 0 = vain hakemisto itse.
+        cursor (Optional[str]): Edellisen sivun next_cursor seuraavan sivun hakemiseen.
+        page_size (int): Tiedostojen määrä sivulla.
 
     Returns:
-        List[str]: Lista tiedostojen ja kansioiden poluista.
+        Dict: {"files": tiedostopolut, "next_cursor": seuraavan sivun kursori tai None}.
     """
-    file_list = []
-    for root, dirs, files in os.walk(directory):
-        for name in files:
-            file_list.append(os.path.join(root, name))
-    return file_list
+    return list_files_page(directory, include, exclude, max_depth, cursor, page_size)
 
 
 # Funktio: Lue yksittäisen tiedoston sisältö
-def read_file(file_name: str) -> str:
+def read_file(file_name: str, offset: Optional[int] = None, length: Optional[int] = None,
+              start_line: Optional[int] = None, end_line: Optional[int] = None,
+              mode: Optional[str] = None, lines: Optional[int] = None) -> Union[Dict, str]:
     """
-    Lue tiedoston sisältö.
+    Lue tiedostosta tavu- tai rivialue koko tiedostoa lataamatta.
+
+    Ilman alueparametreja palautetaan tiedoston ensimmäiset 64 kt. Suurta tiedostoa
+    luetaan sivuittain jatkamalla vastauksen next_offset- tai next_line-kohdasta.
 
     Args:
         file_name (str): Tiedoston nimi, joka luetaan.
+        offset (Optional[int]): Tavualueen alku.
+        length (Optional[int]): Luettavien tavujen määrä.
+        start_line (Optional[int]): Rivialueen ensimmäinen rivi (1-pohjainen).
+        end_line (Optional[int]): Rivialueen viimeinen rivi.
+        mode (Optional[str]): "head", "tail" tai "probe" (vain koko ja rivimäärä).
+        lines (Optional[int]): Rivimäärä head- ja tail-tiloissa.
 
     Returns:
-        str: Tiedoston sisältö tai virheilmoitus.
+        Union[Dict, str]: Sisältö sijaintitietoineen tai virheilmoitus.
     """
     try:
-        with open(file_name, "r", encoding="utf-8") as file:
-            return file.read()
+        return read_file_range(file_name, offset, length, start_line, end_line, mode, lines)
     except FileNotFoundError:
         return f"Virhe: {file_name} ei löydy."
     except Exception as e:
@@ -55,21 +72,25 @@ def read_file(file_name: str) -> str:
 
 
 # Funktio: Lue kaikki tiedostot annetusta hakemistosta
-def read_folder(folder_path: str) -> Dict[str, str]:
+def read_folder(folder_path: str) -> Dict[str, Dict]:
     """
-    Lue kaikki tiedostot annetusta hakemistosta ja palauta niiden sisällöt.
+    Lue kaikki tekstitiedostot annetusta hakemistosta ja palauta niiden sisällöt.
+
+    Tiedostot luetaan rinnakkain (suuret mmap:n kautta), binääritiedostot ohitetaan
+    ja sisällöt katkaistaan tiedosto- ja kokonaistavurajoihin. Sisällöltään identtiset
+    tiedostot palautetaan vain kerran, ja muut kopiot listataan aliaksina. Jos tuloksia
+    halutaan käsitellä jo lukemisen aikana, käytä suoraan iter_folder-generaattoria.
 
     Args:
         folder_path (str): Hakemisto, jonka tiedostot luetaan.
 
     Returns:
-        Dict[str, str]: Sanakirja, jossa avaimina tiedostopolut ja arvoina tiedostojen sisällöt.
+        Dict[str, Dict]: Avaimina tiedostopolut, arvoina {"content": sisältö, "aliases": [kopioiden polut]}.
     """
-    contents = {}
-    for root, _, files in os.walk(folder_path):
-        for file_name in files:
-            file_path = os.path.join(root, file_name)
-            contents[file_path] = read_file(file_path)
+    aliases: Dict[str, List[str]] = {}
+    contents = {path: {"content": content} for path, content in iter_folder(folder_path, aliases=aliases)}
+    for path, entry in contents.items():
+        entry["aliases"] = aliases.get(path, [])
     return contents
 
 
@@ -88,6 +109,7 @@ def terminate(message: str) -> None:
 tool_functions = {
     "list_files": list_files,
     "read_file": read_file,
+    "search_files": search_files,
     "terminate": terminate,
 }
 
@@ -97,26 +119,24 @@ tools = [
         "type": "function",
         "function": {
             "name": "list_files",
-            "description": "Palauttaa listan hakemiston tiedostoista ja kansioista.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "directory": {"type": "string"}
-                },
-                "required": ["directory"]
-            }
+            "description": "Palauttaa yhden sivun hakemiston tiedostoista. Seuraava sivu haetaan next_cursor-arvolla.",
+            "parameters": LIST_FILES_PARAMETERS
         }
     },
     {
         "type": "function",
         "function": {
             "name": "read_file",
-            "description": "Lukee annetun tiedoston sisällön.",
-            "parameters": {
-                "type": "object",
-                "properties": {"file_name": {"type": "string"}},
-                "required": ["file_name"]
-            }
+            "description": "Lukee osan tiedostosta. Suuret tiedostot palautetaan sivuittain; jatka next_offset- tai next_line-kohdasta.",
+            "parameters": READ_FILE_PARAMETERS
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_files",
+            "description": "Hakee hakemiston tiedostoista ja palauttaa osuvimmat tiedostot ja rivit rivinumeroineen.",
+            "parameters": SEARCH_FILES_PARAMETERS
         }
     },
     {
@@ -142,75 +162,121 @@ agent_rules = [{
 Olet AI-agentti, joka voi suorittaa tehtäviä käyttäen käytettävissä olevia työkaluja.
 Voit listata tiedostoja, lukea yksittäisiä tiedostoja ja lukea koko kansioiden sisällön.
 Jos käyttäjä pyytää tiedostoihin liittyvää tietoa, listaa ensin hakemiston sisältö ennen tiedostojen lukemista.
+Jos käyttäjä kysyy, missä jokin asia mainitaan, käytä 'search_files' -työkalua koko kansion lukemisen sijaan.
 
 Kun tehtävä on suoritettu, lopeta keskustelu käyttämällä 'terminate' -työkalua.
 """
 }]
 
-# Alustetaan agentti
-iterations = 0  # Iteraatioiden laskuri
-max_iterations = 10  # Maksimimäärä iteraatioita ennen automaattista lopetusta
-
-# Pyydä käyttäjältä tehtävä
-user_task = input("Mitä haluat minun tekevän? ")
-
-# Alustetaan keskusteluhistoria
-memory = [{"role": "user", "content": user_task}]
-
-# Agentin pääsilmukka
-while iterations < max_iterations:
-    # Päivitä viestit agentin säännöillä ja keskusteluhistorialla
-    messages = agent_rules + memory
-
-    # Lähetä pyyntö LLM:lle
-    response = completion(
-        model="openai/gpt-4o",
-        messages=messages,
-        tools=tools,
-        max_tokens=1024
-    )
-
-    # Tarkista, palauttaako LLM työkalukutsun
-    if response.choices[0].message.tool_calls:
-        tool = response.choices[0].message.tool_calls[0]
-        tool_name = tool.function.name
-        tool_args = json.loads(tool.function.arguments)
-
-        # Luo toiminto-objekti
-        action = {
-            "tool_name": tool_name,
-            "args": tool_args
-        }
+# Agentin pääsilmukka funktiona, jotta sitä voidaan ajaa myös ilman input()-kutsua
+def run_agent(user_task: str, llm: Callable = cached_completion, max_iterations: int = 10,
+              parallel_tool_calls: bool = True, stream: bool = False,
+              max_context_tokens: Optional[int] = None) -> Dict:
+    """
+    Suorita agentin silmukka yhdelle tehtävälle.
+
+    Kaikki yhden vastauksen työkalukutsut suoritetaan rinnakkain, ja tulokset
+    tallennetaan muistiin siinä järjestyksessä, jossa LLM niitä pyysi.
+
+    Args:
+        user_task (str): Käyttäjän tehtävä.
+        llm (Callable): LLM-kutsu, oletuksena välimuistin kautta kulkeva completion.
+        max_iterations (int): Maksimimäärä iteraatioita ennen automaattista lopetusta.
+        parallel_tool_calls (bool): Jos False, suoritetaan vain ensimmäinen työkalukutsu.
+        stream (bool): Jos True, vastaus striimataan: teksti tulostetaan token kerrallaan
+            ja työkalu käynnistyy heti, kun sen parametrit ovat saapuneet.
+        max_context_tokens (Optional[int]): Pyynnön tokenibudjetti. Kun se ylittyy,
+            vanhimmat viestit jätetään pois pyynnöstä. None = rajaton.
 
-        # Suorita työkalu tai lopeta, jos 'terminate' kutsutaan
-        if tool_name == "terminate":
-            print(f"Lopetusviesti: {tool_args['message']}")
-            break
-        elif tool_name in tool_functions:
-            try:
-                # Suorita työkalu ja tallenna tulos
-                result = {"result": tool_functions[tool_name](**tool_args)}
-            except Exception as e:
-                # Käsittele virhe työkalun suorituksessa
-                result = {"error": f"Virhe suorituksessa {tool_name}: {str(e)}"}
-        else:
-            # Tuntematon työkalu
-            result = {"error": f"Tuntematon työkalu: {tool_name}"}
-
-        # Tulosta toiminnon tulos
-        print(f"Suoritetaan: {tool_name} parametreilla {tool_args}")
-        print(f"Tulos: {result}")
-
-        # Päivitä keskusteluhistoria
-        memory.extend([
-            {"role": "assistant", "content": json.dumps(action)},
-            {"role": "user", "content": json.dumps(result)}
-        ])
-    else:
-        # Jos LLM ei palauta työkalukutsua, tulosta sen vastaus
-        result = response.choices[0].message.content
-        print(f"Vastaus: {result}")
-        break
-
-    # Päivitä iterointilaskuri
-    iterations += 1
\ No newline at end of file
+    Returns:
+        Dict: Lopputulos, iteraatioiden määrä ja keskusteluhistoria.
+    """
+    llm = traced_llm(llm)
+    iterations = 0  # Iteraatioiden laskuri
+
+    # Alustetaan keskusteluhistoria: viestit serialisoidaan ja tokenit lasketaan vain kerran
+    memory = ConversationBuffer(agent_rules, max_tokens=max_context_tokens)
+    memory.append("user", user_task)
+
+    while iterations < max_iterations:
+        # Päivitä iterointilaskuri
+        iterations += 1
+
+        with span("iteration", index=iterations):
+            # Agentin säännöt ja keskusteluhistoria ovat valmiina puskurissa
+            messages = memory.messages()
+
+            if stream:
+                # Striimattu pyyntö: työkalut käynnistyvät jo viestin saapuessa
+                step = stream_step(
+                    llm,
+                    tool_functions,
+                    on_token=prefixed_printer("Vastaus: "),
+                    model="openai/gpt-4o",
+                    messages=messages,
+                    tools=tools,
+                    max_tokens=1024
+                )
+                if step["content"]:
+                    print()
+                content, actions, results = step["content"], step["actions"], step["results"]
+            else:
+                # Lähetä pyyntö LLM:lle
+                response = llm(
+                    model="openai/gpt-4o",
+                    messages=messages,
+                    tools=tools,
+                    max_tokens=1024
+                )
+                content = response.choices[0].message.content
+                tool_calls = response.choices[0].message.tool_calls or []
+                if not parallel_tool_calls:
+                    tool_calls = tool_calls[:1]
+
+                # Luo toiminto-objektit ja suorita työkalut rinnakkain, tulokset tulevat kutsujärjestyksessä
+                actions = [parse_tool_call(tool) for tool in tool_calls]
+                results = execute_tool_calls(tool_functions, [a for a in actions if a["tool_name"] != "terminate"])
+
+            # Tarkista, palauttiko LLM työkalukutsuja
+            if actions:
+                # Erota lopetuskutsu muista
+                terminate_action = next((a for a in actions if a["tool_name"] == "terminate"), None)
+                pending = [a for a in actions if a["tool_name"] != "terminate"]
+
+                for action, result in zip(pending, results):
+                    # Tulosta toiminnon tulos
+                    print(f"Suoritetaan: {action['tool_name']} parametreilla {action['args']}")
+                    print(f"Tulos: {result}")
+
+                    # Päivitä keskusteluhistoria
+                    memory.append_tool_result(action, result)
+
+                # Lopeta, jos 'terminate' kutsuttiin
+                if terminate_action:
+                    message = terminate_action["args"].get("message", "")
+                    print(f"Lopetusviesti: {message}")
+                    return {"final": message, "iterations": iterations, "memory": memory.history}
+            else:
+                # Jos LLM ei palauta työkalukutsua, tulosta sen vastaus
+                if not stream:
+                    print(f"Vastaus: {content}")
+                return {"final": content, "iterations": iterations, "memory": memory.history}
+
+    return {"final": None, "iterations": iterations, "memory": memory.history}
+
+
+if __name__ == "__main__":
+    # API-avain tarkistetaan vasta tässä, jotta moduulin voi ladata (esim. eräajossa) ilman avainta
+    api_key = os.getenv("OPENAI_API_KEY")
+
+    # Tarkista, että API-avain on asetettu
+    if not api_key:
+        raise ValueError("API-avain puuttuu! Lisää se .env-tiedostoon.")
+
+    # Aseta API-avain ympäristömuuttujaksi LiteLLM:ää varten
+    os.environ["OPENAI_API_KEY"] = api_key
+
+    # Pyydä käyttäjältä tehtävä
+    user_task = input("Mitä haluat minun tekevän? ")
+    # LLM_CASSETTE ja LLM_CASSETTE_MODE tallentavat ajon tai toistavat sen ilman verkkoa
+    run_agent(user_task, llm=cassette_from_env(cached_completion), stream="--stream" in sys.argv)
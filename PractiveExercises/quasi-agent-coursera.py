@@ -1,7 +1,10 @@
-from litellm import completion
-from typing import List, Dict
+from typing import List, Dict, Optional
 from dotenv import load_dotenv
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from llmCache import cached_completion
 
 # Load API key from .env file
 load_dotenv()
@@ -13,9 +16,9 @@ if not api_key:
 # Set the API key for LiteLLM
 os.environ["OPENAI_API_KEY"] = api_key
 
-def generate_response(messages: List[Dict]) -> str:
+def generate_response(messages: List[Dict], use_cache: Optional[bool] = None) -> str:
     """Call LLM to get response"""
-    response = completion(model="openai/gpt-4", messages=messages, max_tokens=1024)
+    response = cached_completion(model="openai/gpt-4", messages=messages, max_tokens=1024, use_cache=use_cache)
     return response.choices[0].message.content
 
 def extract_code_block(response: str) -> str:
@@ -1,6 +1,9 @@
 import os
+import sys
 from dotenv import load_dotenv
-from typing import Dict
+from typing import Dict, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
 
 # Lataa ympäristömuuttujat .env-tiedostosta
 load_dotenv()
@@ -30,7 +33,7 @@ def register_tool(tags=None):
 
 
 # ---- LLM-kyselytoiminto ----
-def prompt_expert(action_context: Dict, description_of_expert: str, prompt: str) -> str:
+def prompt_expert(action_context: Dict, description_of_expert: str, prompt: str, use_cache: Optional[bool] = None) -> str:
     """
     Kysyy asiantuntijalta (LLM) vastauksen annettuun kysymykseen.
 
@@ -38,11 +41,12 @@ def prompt_expert(action_context: Dict, description_of_expert: str, prompt: str)
         action_context (Dict): Toimintakonteksti, joka voi sisältää tilatietoja.
         description_of_expert (str): Kuvaus asiantuntijan roolista ja osaamisesta.
         prompt (str): Käyttäjän kysymys tai pyyntö.
+        use_cache (Optional[bool]): False ohittaa LLM-vastausten välimuistin, None seuraa LLM_CACHE-muuttujaa.
 
     Returns:
         str: LLM:n tuottama vastaus.
     """
-    from litellm import completion
+    from llmCache import cached_completion
 
     try:
         # Rakenna viestit OpenAI:n API:lle
@@ -52,11 +56,12 @@ def prompt_expert(action_context: Dict, description_of_expert: str, prompt: str)
         ]
 
         # Kutsu LLM:ää ja palauta vastaus
-        response = completion(
+        response = cached_completion(
             model="gpt-4",  # Käytettävä malli
             messages=messages,
             api_key=api_key,
-            max_tokens=1000  # Maksimimäärä vastauksen tokeneita
+            max_tokens=1000,  # Maksimimäärä vastauksen tokeneita
+            use_cache=use_cache  # LLM_CACHE=on lukee samat kysymykset välimuistista
         )
         return response.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
     except Exception as e:
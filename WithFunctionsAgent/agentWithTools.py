@@ -1,33 +1,31 @@
 import os
+import sys
 import json
 from dotenv import load_dotenv
-from litellm import completion
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from cassette import cassette_from_env
+from fileTools import DEFAULT_PAGE_SIZE, LIST_FILES_PARAMETERS, READ_FILE_PARAMETERS, list_files_page, read_file_range
+from llmCache import cached_completion
 
 # Lataa ympäristömuuttujat .env-tiedostosta
 load_dotenv()
 
-# Hae API-avain ympäristömuuttujista
-api_key = os.getenv("OPENAI_API_KEY")
-
-# Tarkista, että API-avain on asetettu
-if not api_key:
-    raise ValueError("API-avain puuttuu! Lisää se .env-tiedostoon.")
-
-# Aseta API-avain ympäristömuuttujaksi LiteLLM:ää varten
-os.environ["OPENAI_API_KEY"] = api_key
 
+def list_files(directory: str = ".", include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+               max_depth: Optional[int] = None, cursor: Optional[str] = None,
+               page_size: int = DEFAULT_PAGE_SIZE) -> Dict:
+    """List one page of files under a directory, honouring .gitignore."""
+    return list_files_page(directory, include, exclude, max_depth, cursor, page_size)
 
-def list_files() -> List[str]:
-    """List files in the current directory."""
-    return os.listdir(".")
 
-
-def read_file(file_name: str) -> str:
-    """Read a file's contents."""
+def read_file(file_name: str, offset: Optional[int] = None, length: Optional[int] = None,
+              start_line: Optional[int] = None, end_line: Optional[int] = None,
+              mode: Optional[str] = None, lines: Optional[int] = None) -> Union[Dict, str]:
+    """Read part of a file by byte or line range (first 64 KB by default)."""
     try:
-        with open(file_name, "r", encoding="utf-8") as file:
-            return file.read()
+        return read_file_range(file_name, offset, length, start_line, end_line, mode, lines)
     except FileNotFoundError:
         return f"Error: {file_name} not found."
     except Exception as e:
@@ -90,20 +88,16 @@ tools = [
         "type": "function",
         "function": {
             "name": "list_files",
-            "description": "Returns a list of files in the directory.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
+            "description": "Returns one page of files in the directory. Pass next_cursor to get the next page.",
+            "parameters": LIST_FILES_PARAMETERS
         }
     },
     {
         "type": "function",
         "function": {
             "name": "read_file",
-            "description": "Reads the content of a specified file in the directory.",
-            "parameters": {
-                "type": "object",
-                "properties": {"file_name": {"type": "string"}},
-                "required": ["file_name"]
-            }
+            "description": "Reads part of a file. Large files are returned in pages; continue from next_offset or next_line.",
+            "parameters": READ_FILE_PARAMETERS
         }
     },
     {
@@ -138,42 +132,55 @@ Always respond with the most relevant tool call.
 }]
 
 
-# Käyttäjän tehtävä
-user_task = input("What would you like me to do? ")
+# Ajetaan vain suoraan käynnistettäessä, jotta työkaluja voidaan käyttää myös eräajossa
+if __name__ == "__main__":
+    # Hae API-avain ympäristömuuttujista
+    api_key = os.getenv("OPENAI_API_KEY")
+
+    # Tarkista, että API-avain on asetettu
+    if not api_key:
+        raise ValueError("API-avain puuttuu! Lisää se .env-tiedostoon.")
+
+    # Aseta API-avain ympäristömuuttujaksi LiteLLM:ää varten
+    os.environ["OPENAI_API_KEY"] = api_key
+
+    # Käyttäjän tehtävä
+    user_task = input("What would you like me to do? ")
 
-memory = [{"role": "user", "content": user_task}]
-messages = agent_rules + memory
+    memory = [{"role": "user", "content": user_task}]
+    messages = agent_rules + memory
 
 
-# LLM-kutsu
-response = completion(
-    model="openai/gpt-4o",
-    messages=messages,
-    tools=tools,
-    max_tokens=1024
-)
+    # LLM-kutsu (samat pyynnöt luetaan välimuistista, LLM_CASSETTE tallentaa tai toistaa ajon)
+    llm = cassette_from_env(cached_completion)
+    response = llm(
+        model="openai/gpt-4o",
+        messages=messages,
+        tools=tools,
+        max_tokens=1024
+    )
 
-# Debug-tulosteet
-print("Messages sent to LLM:", messages)
-print("LLM Response:", response)
+    # Debug-tulosteet
+    print("Messages sent to LLM:", messages)
+    print("LLM Response:", response)
 
-# Tarkista, palauttaako LLM työkalukutsun
-if not response.choices[0].message.tool_calls:
-    # Jos työkalukutsua ei ole, tulosta LLM:n tekstivastaus
-    print(f"LLM Response: {response.choices[0].message.content}")
-    exit()
+    # Tarkista, palauttaako LLM työkalukutsun
+    if not response.choices[0].message.tool_calls:
+        # Jos työkalukutsua ei ole, tulosta LLM:n tekstivastaus
+        print(f"LLM Response: {response.choices[0].message.content}")
+        exit()
 
-# Työkalukutsun käsittely
-tool = response.choices[0].message.tool_calls[0]
-tool_name = tool.function.name
-tool_args = json.loads(tool.function.arguments)
+    # Työkalukutsun käsittely
+    tool = response.choices[0].message.tool_calls[0]
+    tool_name = tool.function.name
+    tool_args = json.loads(tool.function.arguments)
 
-# Suorita työkalu
-result = tool_functions[tool_name](**tool_args)
+    # Suorita työkalu
+    result = tool_functions[tool_name](**tool_args)
 
-print(f"Tool Name: {tool_name}")
-print(f"Tool Arguments: {tool_args}")
-print(f"Result: {result}")
+    print(f"Tool Name: {tool_name}")
+    print(f"Tool Arguments: {tool_args}")
+    print(f"Result: {result}")
 
-# Päivitä muisti tuloksella
-memory.append({"role": "assistant", "content": result})
\ No newline at end of file
+    # Päivitä muisti tuloksella
+    memory.append({"role": "assistant", "content": result})
@@ -1,31 +1,30 @@
 import os
-import json
+import sys
 from dotenv import load_dotenv
-from litellm import completion
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Union
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from conversationBuffer import ConversationBuffer
+from fileTools import DEFAULT_PAGE_SIZE, LIST_FILES_PARAMETERS, READ_FILE_PARAMETERS, list_files_page, read_file_range
+from llmCache import cached_completion
+from toolCalls import execute_tool_calls, parse_tool_call
+from tracing import span, traced_llm
 
 # Lataa ympäristömuuttujat .env-tiedostosta
 load_dotenv()
 
-# Hae API-avain ympäristömuuttujista
-api_key = os.getenv("OPENAI_API_KEY")
-
-# Tarkista, että API-avain on asetettu
-if not api_key:
-    raise ValueError("API-avain puuttuu! Lisää se .env-tiedostoon.")
-
-# Aseta API-avain ympäristömuuttujaksi LiteLLM:ää varten
-os.environ["OPENAI_API_KEY"] = api_key
-
-def list_files() -> List[str]:
-    """List files in the current directory."""
-    return os.listdir(".")
+def list_files(directory: str = ".", include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+               max_depth: Optional[int] = None, cursor: Optional[str] = None,
+               page_size: int = DEFAULT_PAGE_SIZE) -> Dict:
+    """List one page of files under a directory, honouring .gitignore."""
+    return list_files_page(directory, include, exclude, max_depth, cursor, page_size)
 
-def read_file(file_name: str) -> str:
-    """Read a file's contents."""
+def read_file(file_name: str, offset: Optional[int] = None, length: Optional[int] = None,
+              start_line: Optional[int] = None, end_line: Optional[int] = None,
+              mode: Optional[str] = None, lines: Optional[int] = None) -> Union[Dict, str]:
+    """Read part of a file by byte or line range (first 64 KB by default)."""
     try:
-        with open(file_name, "r") as file:
-            return file.read()
+        return read_file_range(file_name, offset, length, start_line, end_line, mode, lines)
     except FileNotFoundError:
         return f"Error: {file_name} not found."
     except Exception as e:
@@ -46,20 +45,16 @@ tools = [
         "type": "function",
         "function": {
             "name": "list_files",
-            "description": "Returns a list of files in the directory.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
+            "description": "Returns one page of files in the directory. Pass next_cursor to get the next page.",
+            "parameters": LIST_FILES_PARAMETERS
         }
     },
     {
         "type": "function",
         "function": {
             "name": "read_file",
-            "description": "Reads the content of a specified file in the directory.",
-            "parameters": {
-                "type": "object",
-                "properties": {"file_name": {"type": "string"}},
-                "required": ["file_name"]
-            }
+            "description": "Reads part of a file. Large files are returned in pages; continue from next_offset or next_line.",
+            "parameters": READ_FILE_PARAMETERS
         }
     },
     {
@@ -89,54 +84,77 @@ When you are done, terminate the conversation by using the "terminate" tool and
 """
 }]
 
-# Initialize agent parameters
-iterations = 0
-max_iterations = 10
-
-user_task = input("What would you like me to do? ")
-
-memory = [{"role": "user", "content": user_task}]
-
-# The Agent Loop
-while iterations < max_iterations:
-
-    messages = agent_rules + memory
-
-    response = completion(
-        model="openai/gpt-4o",
-        messages=messages,
-        tools=tools,
-        max_tokens=1024
-    )
-
-    if response.choices[0].message.tool_calls:
-        tool = response.choices[0].message.tool_calls[0]
-        tool_name = tool.function.name
-        tool_args = json.loads(tool.function.arguments)
-
-        action = {
-            "tool_name": tool_name,
-            "args": tool_args
-        }
-
-        if tool_name == "terminate":
-            print(f"Termination message: {tool_args['message']}")
-            break
-        elif tool_name in tool_functions:
-            try:
-                result = {"result": tool_functions[tool_name](**tool_args)}
-            except Exception as e:
-                result = {"error":f"Error executing {tool_name}: {str(e)}"}
-        else:
-            result = {"error": f"Unknown tool: {tool_name}"}
-
-        print(f"Executing: {tool_name} with args {tool_args}")
-        print(f"Result: {result}")
-        memory.extend([
-            {"role": "assistant", "content": json.dumps(action)},
-            {"role": "user", "content": json.dumps(result)}
-        ])
-    else:
-        result = response.choices[0].message.content
-        print(f"Response: {result}")
-        break
\ No newline at end of file
+def run_agent(user_task: str, llm: Callable = cached_completion, max_iterations: int = 10,
+              parallel_tool_calls: bool = True, max_context_tokens: Optional[int] = None) -> Dict:
+    """
+    Run the agent loop for a single task.
+
+    Every tool call in a response is executed concurrently and the results are
+    stored in memory in the order the model requested them. With
+    `parallel_tool_calls=False` only the first tool call is executed.
+
+    History is kept in a ConversationBuffer, so each iteration only pays for
+    the new messages. `max_context_tokens` drops the oldest messages from the
+    request once the budget is exceeded.
+
+    Returns a summary with the final message, iteration count and memory.
+    """
+    llm = traced_llm(llm)
+    iterations = 0
+    memory = ConversationBuffer(agent_rules, max_tokens=max_context_tokens)
+    memory.append("user", user_task)
+
+    # The Agent Loop
+    while iterations < max_iterations:
+        iterations += 1
+
+        with span("iteration", index=iterations):
+            messages = memory.messages()
+
+            response = llm(
+                model="openai/gpt-4o",
+                messages=messages,
+                tools=tools,
+                max_tokens=1024
+            )
+
+            if response.choices[0].message.tool_calls:
+                tool_calls = response.choices[0].message.tool_calls
+                if not parallel_tool_calls:
+                    tool_calls = tool_calls[:1]
+
+                actions = [parse_tool_call(tool) for tool in tool_calls]
+                terminate_action = next((a for a in actions if a["tool_name"] == "terminate"), None)
+                pending = [a for a in actions if a["tool_name"] != "terminate"]
+
+                results = execute_tool_calls(tool_functions, pending)
+                for action, result in zip(pending, results):
+                    print(f"Executing: {action['tool_name']} with args {action['args']}")
+                    print(f"Result: {result}")
+                    memory.append_tool_result(action, result)
+
+                if terminate_action:
+                    message = terminate_action["args"].get("message", "")
+                    print(f"Termination message: {message}")
+                    return {"final": message, "iterations": iterations, "memory": memory.history}
+            else:
+                result = response.choices[0].message.content
+                print(f"Response: {result}")
+                return {"final": result, "iterations": iterations, "memory": memory.history}
+
+    return {"final": None, "iterations": iterations, "memory": memory.history}
+
+
+if __name__ == "__main__":
+    # Hae API-avain ympäristömuuttujista
+    api_key = os.getenv("OPENAI_API_KEY")
+
+    # Tarkista, että API-avain on asetettu
+    if not api_key:
+        raise ValueError("API-avain puuttuu! Lisää se .env-tiedostoon.")
+
+    # Aseta API-avain ympäristömuuttujaksi LiteLLM:ää varten
+    os.environ["OPENAI_API_KEY"] = api_key
+
+    user_task = input("What would you like me to do? ")
+    run_agent(user_task)
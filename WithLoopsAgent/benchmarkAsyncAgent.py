@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+from functools import partial
+from litellm import completion
+
+# Benchmark käyttää paikallista testipalvelinta, joten oikeaa API-avainta ei tarvita
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-key")
+
+import agentWithLoops
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from asyncAgent import report_throughput, run_tasks
+from mockLLMServer import start_server
+
+
+def run_sequential(user_tasks, api_base: str) -> float:
+    """Run the tasks one after another with the synchronous loop."""
+    llm = partial(completion, api_base=api_base)
+    start = time.perf_counter()
+    for user_task in user_tasks:
+        agentWithLoops.run_agent(user_task, llm=llm)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async agent runner throughput benchmark")
+    parser.add_argument("--tasks", type=int, default=50, help="number of independent tasks")
+    parser.add_argument("--concurrency", type=int, default=20, help="max tasks running at once")
+    parser.add_argument("--latency", type=float, default=0.2, help="stand-in LLM latency in seconds")
+    parser.add_argument("--sequential-tasks", type=int, default=5, help="tasks for the synchronous baseline")
+    args = parser.parse_args()
+
+    server, api_base = start_server(latency=args.latency)
+    user_tasks = [f"List the files in the directory ({idx})" for idx in range(args.tasks)]
+
+    print("== Synchronous loop ==")
+    elapsed = run_sequential(user_tasks[:args.sequential_tasks], api_base)
+    print(f"Läpäisy: {args.sequential_tasks / elapsed:.1f} tehtävää/s")
+
+    print(f"\n== Async runner, concurrency {args.concurrency} ==")
+    start = time.perf_counter()
+    results = asyncio.run(run_tasks(
+        user_tasks,
+        agentWithLoops.tools,
+        agentWithLoops.tool_functions,
+        agentWithLoops.agent_rules,
+        concurrency=args.concurrency,
+        api_base=api_base
+    ))
+    report_throughput(results, time.perf_counter() - start)
+
+    server.shutdown()
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import statistics
+from functools import partial
+from litellm import completion
+from typing import Dict
+
+import agentWithLoops
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from mockLLMServer import build_completion, start_server
+from streaming import stream_step
+from toolCalls import execute_tool_calls, parse_tool_call
+
+ROUNDS = 5
+ANSWER = "Hakemistossa on kolme tiedostoa, joista jokainen sisältää pelin hahmojen kuvauksia. " * 4
+
+
+def scripted_reply(request: Dict) -> Dict:
+    """Answer text when no tools are given, otherwise ask for three files."""
+    model = request.get("model", "gpt-4o")
+    if not request.get("tools"):
+        return build_completion(model, content=ANSWER)
+    return build_completion(model, tool_calls=[
+        {"name": "read_file", "args": {"file_name": name}}
+        for name in ("agentWithLoops.py", "benchmarkToolCalls.py", "benchmarkStreaming.py")
+    ])
+
+
+def measure_blocking(llm, with_tools: bool) -> Dict:
+    """First token and first action both arrive with the complete response."""
+    start = time.perf_counter()
+    response = llm(model="openai/gpt-4o", messages=[{"role": "user", "content": "Hi"}],
+                   tools=agentWithLoops.tools if with_tools else None, max_tokens=1024)
+    arrived = time.perf_counter() - start
+    tool_calls = response.choices[0].message.tool_calls or []
+    execute_tool_calls(agentWithLoops.tool_functions, [parse_tool_call(tool) for tool in tool_calls])
+    return {"first": arrived, "total": time.perf_counter() - start}
+
+
+def measure_streaming(llm, with_tools: bool) -> Dict:
+    step = stream_step(llm, agentWithLoops.tool_functions, on_token=lambda token: None,
+                       model="openai/gpt-4o", messages=[{"role": "user", "content": "Hi"}],
+                       tools=agentWithLoops.tools if with_tools else None, max_tokens=1024)
+    return {"first": step["first_action"] if with_tools else step["first_token"], "total": step["total"]}
+
+
+if __name__ == "__main__":
+    server, api_base = start_server(latency=0.2, token_delay=0.01, reply=scripted_reply)
+    # Benchmark käyttää paikallista testipalvelinta, joten oikeaa API-avainta ei tarvita
+    llm = partial(completion, api_base=api_base, api_key="benchmark-key")
+
+    print(f"{'Scenario':<34}{'First (ms)':>12}{'Total (ms)':>12}")
+    for with_tools, label in ((False, "time-to-first-token"), (True, "time-to-first-action")):
+        for mode, measure in (("blocking", measure_blocking), ("streaming", measure_streaming)):
+            runs = [measure(llm, with_tools) for _ in range(ROUNDS)]
+            first = statistics.mean(run["first"] for run in runs) * 1000
+            total = statistics.mean(run["total"] for run in runs) * 1000
+            print(f"{label + ' / ' + mode:<34}{first:>12.0f}{total:>12.0f}")
+
+    server.shutdown()
@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import tempfile
+from types import SimpleNamespace
+from typing import List, Dict
+
+# Benchmark ei tee oikeita LLM-kutsuja, joten API-avaimeksi kelpaa mikä tahansa arvo
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-key")
+
+import agentWithLoops
+
+# Simuloidut viiveet sekunteina
+LLM_LATENCY = 0.3
+TOOL_LATENCY = 0.1
+FILE_COUNT = 6
+
+
+def make_response(tool_calls: List[Dict] = None, content: str = None):
+    """Build an object shaped like a litellm completion response."""
+    calls = [
+        SimpleNamespace(
+            id=f"call_{idx}",
+            function=SimpleNamespace(name=call["name"], arguments=json.dumps(call["args"]))
+        )
+        for idx, call in enumerate(tool_calls or [])
+    ]
+    message = SimpleNamespace(content=content, tool_calls=calls or None)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def scripted_llm(model: str, messages: List[Dict], **kwargs):
+    """
+    Stand-in LLM that lists the files, asks for every unread file at once
+    and terminates when all of them have been read.
+    """
+    time.sleep(LLM_LATENCY)
+
+    actions = [json.loads(m["content"]) for m in messages if m["role"] == "assistant"]
+    listed = [a for a in actions if a["tool_name"] == "list_files"]
+    if not listed:
+        return make_response([{"name": "list_files", "args": {}}])
+
+    files = sorted(f for f in os.listdir(".") if f.endswith(".txt"))
+    read = {a["args"]["file_name"] for a in actions if a["tool_name"] == "read_file"}
+    unread = [f for f in files if f not in read]
+    if unread:
+        return make_response([{"name": "read_file", "args": {"file_name": f}} for f in unread])
+
+    return make_response([{"name": "terminate", "args": {"message": f"Read {len(read)} files."}}])
+
+
+def slow_read_file(file_name: str) -> str:
+    """read_file with simulated I/O latency."""
+    time.sleep(TOOL_LATENCY)
+    return agentWithLoops.read_file(file_name)
+
+
+def run_benchmark(parallel_tool_calls: bool) -> Dict:
+    start = time.perf_counter()
+    summary = agentWithLoops.run_agent(
+        "Read every file in the directory.",
+        llm=scripted_llm,
+        max_iterations=FILE_COUNT + 5,
+        parallel_tool_calls=parallel_tool_calls
+    )
+    return {"iterations": summary["iterations"], "seconds": time.perf_counter() - start}
+
+
+if __name__ == "__main__":
+    agentWithLoops.tool_functions["read_file"] = slow_read_file
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for idx in range(FILE_COUNT):
+            with open(os.path.join(workdir, f"file_{idx}.txt"), "w") as file:
+                file.write(f"Contents of file {idx}\n")
+
+        original_dir = os.getcwd()
+        os.chdir(workdir)
+        try:
+            results = {
+                "first tool call only": run_benchmark(parallel_tool_calls=False),
+                "all tool calls in parallel": run_benchmark(parallel_tool_calls=True),
+            }
+        finally:
+            os.chdir(original_dir)
+
+    print(f"\n{'Mode':<30}{'Iterations':>12}{'Wall time (s)':>16}")
+    for mode, stats in results.items():
+        print(f"{mode:<30}{stats['iterations']:>12}{stats['seconds']:>16.2f}")
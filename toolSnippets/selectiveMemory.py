@@ -1,3 +1,32 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLMUtils"))
+from schemaCompiler import SchemaValidationError, compile_schema
+
+# Skeema muistojen valintaa varten
+selection_schema = {
+    "type": "object",
+    "properties": {
+        "selected_memories": {
+            "type": "array",
+            "items": {
+                "type": "string",
+                "description": "Muiston tunniste, joka sisällytetään"
+            }
+        },
+        "reasoning": {
+            "type": "string",
+            "description": "Selitys, miksi nämä muistot valittiin"
+        }
+    },
+    "required": ["selected_memories", "reasoning"]
+}
+
+# Skeema käännetään kerran, ja LLM:n valinta tarkistetaan sitä vasten ennen käyttöä
+validate_selection = compile_schema(selection_schema)
+
+
 @register_tool(description="Delegate a task to another agent with selected context")
 def call_agent_with_selected_context(action_context: ActionContext,
                                    agent_name: str,
@@ -15,25 +44,6 @@ def call_agent_with_selected_context(action_context: ActionContext,
             "memory_id": f"mem_{idx}"
         })
     
-    # Luo skeema muistojen valintaa varten
-    selection_schema = {
-        "type": "object",
-        "properties": {
-            "selected_memories": {
-                "type": "array",
-                "items": {
-                    "type": "string",
-                    "description": "Muiston tunniste, joka sisällytetään"
-                }
-            },
-            "reasoning": {
-                "type": "string",
-                "description": "Selitys, miksi nämä muistot valittiin"
-            }
-        },
-        "required": ["selected_memories", "reasoning"]
-    }
-    
     # Muotoile muistot LLM:n tarkastelua varten
     memory_text = "\n".join([
         f"Muisto {m['memory_id']}: {m['content']}" 
@@ -57,6 +67,9 @@ Selitä valintaprosessisi."""
         schema=selection_schema,
         prompt=selection_prompt
     )
+    violations = validate_selection(selection)
+    if violations:
+        raise SchemaValidationError(violations)
     
     # Luo suodatetut muistot valinnan perusteella
     filtered_memory = Memory()